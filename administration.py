@@ -0,0 +1,26 @@
+import hmac
+import os
+
+import streamlit as st
+
+# --- Accès aux pages d'administration ---
+# Pages exploitation et calibrage : absentes de la barre latérale (navigation automatique
+# désactivée dans .streamlit/config.toml), accessibles par /<page>?cle=<clé>, la clé étant
+# OPTIMEYES_CLE_ADMIN ou st.secrets["admin"]["cle"].
+# Sans clé valide, la page se présente comme introuvable.
+VARIABLE_CLE = "OPTIMEYES_CLE_ADMIN"
+
+def cle_admin():
+    cle = os.environ.get(VARIABLE_CLE, "").strip()
+    if cle:
+        return cle
+    try:
+        return str(st.secrets["admin"]["cle"])
+    except Exception:
+        return ""
+
+def exiger_cle_admin():
+    cle = cle_admin()
+    if not cle or not hmac.compare_digest(str(st.query_params.get("cle", "")), cle):
+        st.error("❌ Page introuvable.")
+        st.stop()
@@ -0,0 +1,201 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from traces import trace
+
+# --- Url_ID pré-attribués et QR codes des badges ---
+# Avant l'événement : un lot d'Url_ID uniques est réservé dans la base locale,
+# leurs QR codes sont rendus en parallèle (un processus par cœur) dans un stock
+# d'images par identifiant, puis assemblés en planches de badges imprimables (PNG + PDF).
+# À l'enregistrement, l'application prend un identifiant du lot (ou celui du badge
+# remis au participant) et réutilise l'image déjà rendue : plus de qrcode.make
+# dans le parcours interactif.
+# Usage (depuis la racine du dépôt) :
+#   python -m badges --nombre 300 --processus 4
+
+URL_BASE = "https://optimeyes-resultats.streamlit.app"
+MOTIF_URL_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+DOSSIER_QR = "qr_codes"
+DOSSIER_PLANCHES = "planches_badges"
+QR_PAR_TACHE = 50
+TENTATIVES_RESERVATION = 5  # tirages successifs pour compléter un lot (collisions d'Url_ID)
+
+# Planche A4 à 150 dpi
+DPI_PLANCHE = 150
+TAILLE_PLANCHE = (1240, 1754)
+MARGE_PLANCHE = 60
+COLONNES_PLANCHE = 3
+LIGNES_PLANCHE = 4
+
+def generer_url_id():
+    return str(uuid.uuid4())[:12]
+
+def url_valide(url_id):
+    return isinstance(url_id, str) and MOTIF_URL_ID.fullmatch(url_id) is not None
+
+def url_passeport(url_id):
+    return f"{URL_BASE}?id={url_id}"
+
+def image_qr(url_id):
+    import qrcode
+
+    buffer = BytesIO()
+    qrcode.make(url_passeport(url_id)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+# --- Stock d'images QR (un PNG par Url_ID) ---
+class StockQR:
+    def __init__(self, dossier=DOSSIER_QR):
+        self.dossier = dossier
+
+    def chemin(self, url_id):
+        if not url_valide(url_id):
+            raise ValueError(f"Url_ID invalide : {url_id!r}")
+        return os.path.join(self.dossier, f"{url_id}.png")
+
+    def contient(self, url_id):
+        return os.path.exists(self.chemin(url_id))
+
+    def ecrire(self, url_id, contenu):
+        chemin = self.chemin(url_id)
+        os.makedirs(self.dossier, exist_ok=True)
+        temporaire = os.path.join(self.dossier, f".{url_id}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temporaire, "wb") as f:
+            f.write(contenu)
+        os.replace(temporaire, chemin)
+
+    @trace("qr.contenu")
+    def contenu(self, url_id):
+        # Image déjà rendue, sinon rendue tout de suite et conservée
+        try:
+            with open(self.chemin(url_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            contenu = image_qr(url_id)
+            self.ecrire(url_id, contenu)
+            return contenu
+
+def _rendre_lot(dossier, url_ids):
+    # Exécuté dans un processus de rendu
+    stock = StockQR(dossier)
+    rendus = 0
+    for url_id in url_ids:
+        if not stock.contient(url_id):
+            stock.ecrire(url_id, image_qr(url_id))
+            rendus += 1
+    return rendus
+
+def rendre_qr(url_ids, dossier=DOSSIER_QR, processus=None):
+    # Rendu en parallèle des QR codes absents du stock ; renvoie le nombre d'images rendues
+    url_ids = [url_id for url_id in url_ids if url_valide(url_id)]
+    lots = [url_ids[debut:debut + QR_PAR_TACHE] for debut in range(0, len(url_ids), QR_PAR_TACHE)]
+    processus = processus or os.cpu_count() or 1
+    if processus == 1 or len(lots) <= 1:
+        return sum(_rendre_lot(dossier, lot) for lot in lots)
+    contexte_spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(processus, len(lots)), mp_context=contexte_spawn) as executeur:
+        return sum(executeur.map(_rendre_lot, [dossier] * len(lots), lots))
+
+# --- Planches de badges ---
+def _police(taille):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=taille)
+    except TypeError:
+        return ImageFont.load_default()
+
+def planches(url_ids, stock):
+    # Une image par page : grille de badges (QR + Url_ID)
+    from PIL import Image, ImageDraw
+
+    largeur, hauteur = TAILLE_PLANCHE
+    largeur_case = (largeur - 2 * MARGE_PLANCHE) // COLONNES_PLANCHE
+    hauteur_case = (hauteur - 2 * MARGE_PLANCHE) // LIGNES_PLANCHE
+    cote_qr = min(largeur_case, hauteur_case - 60) - 20
+    police = _police(28)
+    par_page = COLONNES_PLANCHE * LIGNES_PLANCHE
+    pages = []
+    for debut in range(0, len(url_ids), par_page):
+        page = Image.new("RGB", TAILLE_PLANCHE, "white")
+        dessin = ImageDraw.Draw(page)
+        for position, url_id in enumerate(url_ids[debut:debut + par_page]):
+            x = MARGE_PLANCHE + (position % COLONNES_PLANCHE) * largeur_case
+            y = MARGE_PLANCHE + (position // COLONNES_PLANCHE) * hauteur_case
+            dessin.rectangle([x + 4, y + 4, x + largeur_case - 4, y + hauteur_case - 4], outline="#cccccc", width=2)
+            qr = Image.open(BytesIO(stock.contenu(url_id))).convert("RGB").resize((cote_qr, cote_qr), Image.NEAREST)
+            page.paste(qr, (x + (largeur_case - cote_qr) // 2, y + 10))
+            dessin.text((x + largeur_case // 2, y + cote_qr + 30), url_id, fill="black", font=police, anchor="mt")
+        pages.append(page)
+    return pages
+
+def ecrire_planches(url_ids, stock, dossier=DOSSIER_PLANCHES, nom="badges"):
+    # planches_badges/<nom>_NNN.png + <nom>.pdf ; renvoie la liste des fichiers écrits
+    pages = planches(list(url_ids), stock)
+    if not pages:
+        return []
+    os.makedirs(dossier, exist_ok=True)
+    fichiers = []
+    for numero, page in enumerate(pages, start=1):
+        chemin = os.path.join(dossier, f"{nom}_{numero:03d}.png")
+        page.save(chemin, dpi=(DPI_PLANCHE, DPI_PLANCHE))
+        fichiers.append(chemin)
+    chemin_pdf = os.path.join(dossier, f"{nom}.pdf")
+    pages[0].save(chemin_pdf, save_all=True, append_images=pages[1:], resolution=DPI_PLANCHE)
+    fichiers.append(chemin_pdf)
+    return fichiers
+
+# --- Préparation d'un événement ---
+def preparer(base, nombre, dossier_qr=DOSSIER_QR, dossier_planches=DOSSIER_PLANCHES, processus=None):
+    url_ids = []
+    for _ in range(TENTATIVES_RESERVATION):
+        if len(url_ids) >= nombre:
+            break
+        url_ids += base.reserver_url_ids([generer_url_id() for _ in range(nombre - len(url_ids))])
+    if len(url_ids) < nombre:
+        # Les identifiants déjà réservés restent libres dans la base (repris par --rerendre)
+        raise RuntimeError(
+            f"Réservation incomplète : {len(url_ids)} / {nombre} Url_ID après {TENTATIVES_RESERVATION} tentatives"
+        )
+    if not url_ids:
+        return {"url_ids": [], "qr_rendus": 0, "fichiers": []}
+    rendus = rendre_qr(url_ids, dossier_qr, processus)
+    fichiers = ecrire_planches(url_ids, StockQR(dossier_qr), dossier_planches, nom=f"badges_{url_ids[0]}")
+    return {"url_ids": url_ids, "qr_rendus": rendus, "fichiers": fichiers}
+
+def main(arguments=None):
+    from base_donnees import BaseDonnees, FICHIER_BASE
+
+    parser = argparse.ArgumentParser(description="Réserve des Url_ID et imprime leurs badges QR")
+    parser.add_argument("--nombre", type=int, default=120, help="identifiants à réserver")
+    parser.add_argument("--processus", type=int, default=None, help="processus de rendu (défaut : un par cœur)")
+    parser.add_argument("--base", default=FICHIER_BASE)
+    parser.add_argument("--qr", default=DOSSIER_QR)
+    parser.add_argument("--planches", default=DOSSIER_PLANCHES)
+    parser.add_argument("--rerendre", action="store_true", help="rend seulement les QR manquants des identifiants libres")
+    args = parser.parse_args(arguments)
+
+    base = BaseDonnees(args.base)
+    if args.rerendre:
+        rendus = rendre_qr(base.url_ids_libres(), args.qr, args.processus)
+        print(f"🔁 {rendus} QR codes rendus")
+        return 0
+    try:
+        rapport = preparer(base, args.nombre, args.qr, args.planches, args.processus)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {len(rapport['url_ids'])} Url_ID réservés, {rapport['qr_rendus']} QR codes rendus")
+    for fichier in rapport["fichiers"]:
+        print(f"   {fichier}")
+    print(f"📦 Identifiants libres dans la base : {base.nombre_url_ids_libres()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
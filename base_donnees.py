@@ -0,0 +1,583 @@
+import json
+import math
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from configuration import FICHIER_ITEMS, lire_config_items
+from profilage import POIDS_PROFILS, COLONNES_RADAR, COLONNE_RADAR_HISTORIQUE, migrer_radar, radar_depuis_cellule
+from quantiles import (
+    EFFECTIF_MIN_COHORTE, INDICATEURS_COHORTE, COLONNE_TRANCHE,
+    EsquisseQuantiles, cle_esquisse, valeurs_par_cle
+)
+from traces import trace
+
+# --- BASE LOCALE (SQLite) ---
+# Système de référence local des enregistrements : une ligne insérée par sauvegarde,
+# lectures concurrentes en mode WAL. Excel n'est plus qu'un format d'export.
+# Le schéma suit la configuration des items (Vivatech_Optimeyes.csv) et les colonnes
+# calculées par la page 2 ; une clé inconnue est conservée dans la colonne JSON "Autres".
+# Les esquisses de quantiles de la cohorte (quantiles.py) sont tenues à jour dans la
+# même transaction que chaque ajout, et reconstruites après une suppression.
+
+TABLE = "enregistrements"
+FICHIER_BASE = "donnees_patients.sqlite"
+COLONNE_ID = "Id_Enregistrement"
+COLONNE_HORODATAGE = "Horodatage"
+COLONNE_AUTRES = "Autres"
+DELAI_VERROU_MS = 5000
+LIGNES_PAR_LOT = 2000
+IDS_PAR_REQUETE = 500
+
+COLONNES_CALCULEES = [
+    ("Profil", "TEXT"),
+    ("Score_Profil_Dominant", "REAL"),
+    ("Indice_Subjectif", "REAL"),
+    ("indice_Performance", "REAL"),
+    ("Score_Global", "REAL"),
+    ("Coherence", "TEXT"),
+] + [(colonne, "REAL") for colonne in COLONNES_RADAR] + [
+    ("Alerte_Discordance", "BOOLEAN"),
+    ("Stereopsie_activee", "BOOLEAN"),
+    ("Subjectif_Seul", "BOOLEAN"),
+] + [(f"Score_{profil}", "REAL") for profil in POIDS_PROFILS] + [
+    ("Url_ID", "TEXT"),
+    ("Version_Modele", "TEXT"),
+]
+# Colonnes recalculées par une renotation (renotation.py)
+COLONNES_NOTATION = [
+    "Profil", "Score_Profil_Dominant", "Indice_Subjectif", "indice_Performance", "Score_Global", "Coherence",
+    "Alerte_Discordance",
+] + [f"Score_{profil}" for profil in POIDS_PROFILS] + COLONNES_RADAR
+TABLE_RENOTATION = "renotation"
+INDEX = {
+    "idx_code_sujet": "Code_Sujet",
+    "idx_url_id": "Url_ID",
+    "idx_horodatage": COLONNE_HORODATAGE,
+    "idx_profil": "Profil",
+    "idx_age": "Age",
+    "idx_coherence": "Coherence",
+    "idx_version_modele": "Version_Modele",
+}
+
+TYPES_ITEMS = {"num": "REAL", "slider": "REAL", "bool": "BOOLEAN", "checkbox": "BOOLEAN", "multiselect": "JSON"}
+
+def schema(fichier_items=FICHIER_ITEMS):
+    # [(colonne, type)] : identifiants, items du formulaire, colonnes calculées
+    colonnes = [(COLONNE_ID, "TEXT"), (COLONNE_HORODATAGE, "TEXT")]
+    for _, ligne in lire_config_items(fichier_items).iterrows():
+        colonnes.append((ligne["Item"].strip(), TYPES_ITEMS.get(str(ligne["Type"]).strip().lower(), "TEXT")))
+    vues = {nom for nom, _ in colonnes}
+    colonnes += [(nom, type_sql) for nom, type_sql in COLONNES_CALCULEES if nom not in vues]
+    return colonnes + [(COLONNE_AUTRES, "JSON")]
+
+def _type_sqlite(type_colonne):
+    return {"REAL": "REAL", "BOOLEAN": "INTEGER"}.get(type_colonne, "TEXT")
+
+def _absent(valeur):
+    return valeur is None or (isinstance(valeur, float) and math.isnan(valeur)) or valeur is pd.NA
+
+def _convertir(valeur, type_colonne):
+    if _absent(valeur):
+        return None
+    if type_colonne == "REAL":
+        try:
+            return float(valeur)
+        except (TypeError, ValueError):
+            return None
+    if type_colonne == "BOOLEAN":
+        if isinstance(valeur, str):
+            return int(valeur.strip().lower() in ("true", "vrai", "1", "oui"))
+        return int(bool(valeur))
+    if type_colonne == "JSON":
+        return json.dumps(valeur, ensure_ascii=False, default=str)
+    if isinstance(valeur, (np.integer, np.floating)):
+        valeur = valeur.item()
+    return str(valeur)
+
+def _guillemets(nom):
+    return '"' + nom.replace('"', '""') + '"'
+
+class BaseDonnees:
+    def __init__(self, fichier, fichier_items=FICHIER_ITEMS):
+        self.fichier = fichier
+        self.colonnes = schema(fichier_items)
+        self.types = dict(self.colonnes)
+        self._local = threading.local()
+        self._esquisses = None
+        self._creer_schema()
+
+    # --- Connexions (une par thread) ---
+    def connexion(self):
+        connexion = getattr(self._local, "connexion", None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.fichier, timeout=DELAI_VERROU_MS / 1000)
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            connexion.execute(f"PRAGMA busy_timeout={DELAI_VERROU_MS}")
+            self._local.connexion = connexion
+        return connexion
+
+    def _creer_schema(self):
+        connexion = self.connexion()
+        with connexion:
+            definitions = ", ".join(
+                f"{_guillemets(nom)} {_type_sqlite(type_colonne)}" + (" PRIMARY KEY" if nom == COLONNE_ID else "")
+                for nom, type_colonne in self.colonnes
+            )
+            connexion.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({definitions})")
+            connexion.execute("CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur TEXT)")
+            connexion.execute("INSERT OR IGNORE INTO meta (cle, valeur) VALUES ('version', 0)")
+            connexion.execute("CREATE TABLE IF NOT EXISTS esquisses (cle TEXT PRIMARY KEY, donnees TEXT)")
+            connexion.execute("CREATE TABLE IF NOT EXISTS url_ids (url_id TEXT PRIMARY KEY, reserve_le TEXT, attribue_le TEXT)")
+            colonnes_renotation = ", ".join(
+                f"{_guillemets(nom)} {_type_sqlite(self.types.get(nom, 'TEXT'))}" for nom in COLONNES_NOTATION
+            )
+            connexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_RENOTATION} ({COLONNE_ID} TEXT PRIMARY KEY, "
+                f"Version_Modele TEXT, applique INTEGER DEFAULT 0, {colonnes_renotation})"
+            )
+            # Nouvel item dans la configuration : colonne ajoutée à la table existante
+            existantes = {ligne[1] for ligne in connexion.execute(f"PRAGMA table_info({TABLE})")}
+            for nom, type_colonne in self.colonnes:
+                if nom not in existantes:
+                    connexion.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_guillemets(nom)} {_type_sqlite(type_colonne)}")
+            if COLONNE_RADAR_HISTORIQUE in existantes:
+                self._migrer_radar(connexion)
+            for nom_index, colonne in INDEX.items():
+                if colonne not in self.types:
+                    continue
+                connexion.execute(f"CREATE INDEX IF NOT EXISTS {nom_index} ON {TABLE} ({_guillemets(colonne)})")
+            # Base antérieure aux esquisses : construction initiale
+            if (connexion.execute("SELECT 1 FROM esquisses LIMIT 1").fetchone() is None
+                    and connexion.execute(f"SELECT 1 FROM {TABLE} LIMIT 1").fetchone() is not None):
+                self._reconstruire_esquisses(connexion)
+
+    def _migrer_radar(self, connexion):
+        # Ancienne colonne texte (dict Python) -> colonnes Radar_<axe> typées, puis suppression
+        df = pd.read_sql_query(
+            f"SELECT rowid, {_guillemets(COLONNE_RADAR_HISTORIQUE)} FROM {TABLE} "
+            f"WHERE {_guillemets(COLONNE_RADAR_HISTORIQUE)} IS NOT NULL", connexion
+        )
+        if not df.empty:
+            df = migrer_radar(df)
+            df = df.astype(object).where(df.notna(), None)
+            affectations = ", ".join(f"{_guillemets(colonne)} = COALESCE({_guillemets(colonne)}, ?)" for colonne in COLONNES_RADAR)
+            connexion.executemany(
+                f"UPDATE {TABLE} SET {affectations} WHERE rowid = ?",
+                df[COLONNES_RADAR + ["rowid"]].itertuples(index=False, name=None)
+            )
+        connexion.execute(f"ALTER TABLE {TABLE} DROP COLUMN {_guillemets(COLONNE_RADAR_HISTORIQUE)}")
+
+    # --- Écriture ---
+    def _incrementer_version(self, connexion):
+        # Dans la même transaction que la modification
+        connexion.execute("UPDATE meta SET valeur = valeur + 1 WHERE cle = 'version'")
+
+    def _ligne_sql(self, ligne):
+        ligne = dict(ligne)
+        radar = ligne.pop(COLONNE_RADAR_HISTORIQUE, None)
+        if radar is not None and not _absent(radar):
+            for colonne, valeur in radar_depuis_cellule(radar).items():
+                if _absent(ligne.get(colonne)):
+                    ligne[colonne] = valeur
+        ligne.setdefault(COLONNE_HORODATAGE, datetime.now().isoformat(timespec="seconds"))
+        autres = {cle: valeur for cle, valeur in ligne.items() if cle not in self.types and not _absent(valeur)}
+        valeurs = [_convertir(ligne.get(nom), type_colonne) for nom, type_colonne in self.colonnes[:-1]]
+        return valeurs + [json.dumps(autres, ensure_ascii=False, default=str) if autres else None]
+
+    def _ids_existants(self, connexion, ids):
+        ids = [str(i) for i in ids if i is not None]
+        existants = set()
+        for debut in range(0, len(ids), IDS_PAR_REQUETE):
+            lot = ids[debut:debut + IDS_PAR_REQUETE]
+            existants.update(ligne[0] for ligne in connexion.execute(
+                f"SELECT {COLONNE_ID} FROM {TABLE} WHERE {COLONNE_ID} IN ({', '.join('?' for _ in lot)})", lot
+            ))
+        return existants
+
+    @trace("base.ajouter")
+    def ajouter(self, lignes):
+        # Une insertion par ligne ; un Id_Enregistrement déjà présent est ignoré
+        lignes = list(lignes)
+        noms = ", ".join(_guillemets(nom) for nom, _ in self.colonnes)
+        marques = ", ".join("?" for _ in self.colonnes)
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            vus = self._ids_existants(connexion, [ligne.get(COLONNE_ID) for ligne in lignes])
+            nouvelles = []
+            for ligne in lignes:
+                id_ligne = ligne.get(COLONNE_ID)
+                if id_ligne is None or str(id_ligne) not in vus:
+                    nouvelles.append(ligne)
+                    if id_ligne is not None:
+                        vus.add(str(id_ligne))
+            connexion.executemany(
+                f"INSERT OR IGNORE INTO {TABLE} ({noms}) VALUES ({marques})",
+                [self._ligne_sql(ligne) for ligne in lignes]
+            )
+            self._mettre_a_jour_esquisses(connexion, nouvelles)
+            self._incrementer_version(connexion)
+
+    @trace("base.supprimer")
+    def supprimer(self, ids):
+        connexion = self.connexion()
+        with connexion:
+            connexion.executemany(f"DELETE FROM {TABLE} WHERE {COLONNE_ID} = ?", [(i,) for i in ids])
+            # Une esquisse ne sait pas retirer une valeur : reconstruction depuis la table
+            self._reconstruire_esquisses(connexion)
+            self._incrementer_version(connexion)
+
+    # --- Esquisses de quantiles (percentiles de la cohorte) ---
+    def _mettre_a_jour_esquisses(self, connexion, lignes):
+        valeurs = valeurs_par_cle(lignes)
+        if not valeurs:
+            return
+        cles = list(valeurs)
+        existantes = dict(connexion.execute(
+            f"SELECT cle, donnees FROM esquisses WHERE cle IN ({', '.join('?' for _ in cles)})", cles
+        ))
+        mises_a_jour = []
+        for cle, liste in valeurs.items():
+            esquisse = EsquisseQuantiles.depuis_json(existantes[cle]) if cle in existantes else EsquisseQuantiles()
+            mises_a_jour.append((cle, esquisse.ajouter(liste).en_json()))
+        connexion.executemany("INSERT OR REPLACE INTO esquisses (cle, donnees) VALUES (?, ?)", mises_a_jour)
+
+    def _reconstruire_esquisses(self, connexion):
+        colonnes = [nom for nom in INDICATEURS_COHORTE + [COLONNE_TRANCHE, "Stereopsie_activee"] if nom in self.types]
+        df = pd.read_sql_query(f"SELECT {', '.join(_guillemets(nom) for nom in colonnes)} FROM {TABLE}", connexion)
+        connexion.execute("DELETE FROM esquisses")
+        self._mettre_a_jour_esquisses(connexion, df.astype(object).where(df.notna(), None).to_dict("records"))
+
+    def esquisses(self):
+        # {cle: EsquisseQuantiles}, relues seulement quand la base a changé
+        version = self.version()
+        cache = self._esquisses
+        if cache is None or cache[0] != version:
+            esquisses = {
+                cle: EsquisseQuantiles.depuis_json(donnees)
+                for cle, donnees in self.connexion().execute("SELECT cle, donnees FROM esquisses")
+            }
+            self._esquisses = cache = (version, esquisses)
+        return cache[1]
+
+    @trace("base.percentile")
+    def percentile(self, indicateur, valeur, tranche=None):
+        # (percentile 0-100, effectif) de valeur dans la cohorte, ou None si cohorte trop petite
+        esquisse = self.esquisses().get(cle_esquisse(indicateur, tranche))
+        if esquisse is None or esquisse.effectif < EFFECTIF_MIN_COHORTE:
+            return None
+        try:
+            valeur = float(valeur)
+        except (TypeError, ValueError):
+            return None
+        if np.isnan(valeur):
+            return None
+        return round(100 * esquisse.rang(valeur)), int(esquisse.effectif)
+
+    # --- Lecture ---
+    def _vers_dataframe(self, df):
+        for nom, type_colonne in self.colonnes:
+            if nom not in df.columns:
+                continue
+            if type_colonne == "BOOLEAN":
+                # NULL -> NaN, comme une cellule vide relue depuis Excel
+                valeurs = pd.to_numeric(df[nom], errors="coerce").to_numpy(dtype=float)
+                booleens = (valeurs != 0).astype(object)
+                booleens[np.isnan(valeurs)] = np.nan
+                df[nom] = booleens
+            elif type_colonne == "JSON" and nom != COLONNE_AUTRES:
+                df[nom] = df[nom].map(lambda v: None if v is None else json.loads(v))
+        if COLONNE_AUTRES in df.columns:
+            autres = df.pop(COLONNE_AUTRES)
+            if autres.notna().any():
+                df = df.join(pd.DataFrame([json.loads(v) if v else {} for v in autres], index=df.index))
+        return df
+
+    def lire_tout(self, colonnes=None):
+        # colonnes : sous-ensemble à lire (colonnes absentes du schéma ignorées)
+        selection = "*" if colonnes is None else ", ".join(_guillemets(c) for c in colonnes if c in self.types)
+        df = pd.read_sql_query(f"SELECT {selection} FROM {TABLE} ORDER BY rowid", self.connexion())
+        return self._vers_dataframe(df)
+
+    def lire(self, colonne, valeur):
+        # Recherche indexée (Code_Sujet, Url_ID, Horodatage)
+        df = pd.read_sql_query(
+            f"SELECT * FROM {TABLE} WHERE {_guillemets(colonne)} = ? ORDER BY rowid",
+            self.connexion(), params=(valeur,)
+        )
+        return self._vers_dataframe(df)
+
+    # --- Recherche paginée (page 3) ---
+    # filtres : {colonne: valeur} avec liste -> IN, tuple (min, max) -> intervalle
+    # (bornes None ignorées), texte -> contient (insensible à la casse)
+    def _clause_filtres(self, filtres):
+        conditions, parametres = [], []
+        for colonne, valeur in (filtres or {}).items():
+            if colonne not in self.types:
+                raise KeyError(f"Colonne inconnue : {colonne}")
+            nom = _guillemets(colonne)
+            if isinstance(valeur, list):
+                if not valeur:
+                    continue
+                conditions.append(f"{nom} IN ({', '.join('?' for _ in valeur)})")
+                parametres += valeur
+            elif isinstance(valeur, tuple):
+                minimum, maximum = valeur
+                if minimum is not None:
+                    conditions.append(f"{nom} >= ?")
+                    parametres.append(minimum)
+                if maximum is not None:
+                    conditions.append(f"{nom} < ?")
+                    parametres.append(maximum)
+            elif valeur:
+                conditions.append(f"{nom} LIKE ? ESCAPE '\\'")
+                echappe = str(valeur).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                parametres.append(f"%{echappe}%")
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parametres
+
+    @trace("base.compter")
+    def compter(self, filtres=None):
+        clause, parametres = self._clause_filtres(filtres)
+        return self.connexion().execute(f"SELECT COUNT(*) FROM {TABLE}{clause}", parametres).fetchone()[0]
+
+    @trace("base.lire_page")
+    def lire_page(self, filtres=None, tri=COLONNE_HORODATAGE, decroissant=True, page=0, taille_page=50):
+        if tri not in self.types:
+            raise KeyError(f"Colonne inconnue : {tri}")
+        clause, parametres = self._clause_filtres(filtres)
+        sens = "DESC" if decroissant else "ASC"
+        df = pd.read_sql_query(
+            f"SELECT * FROM {TABLE}{clause} ORDER BY {_guillemets(tri)} {sens}, rowid {sens} LIMIT ? OFFSET ?",
+            self.connexion(), params=parametres + [taille_page, page * taille_page]
+        )
+        return self._vers_dataframe(df)
+
+    def ids(self, filtres=None):
+        clause, parametres = self._clause_filtres(filtres)
+        return [ligne[0] for ligne in self.connexion().execute(f"SELECT {COLONNE_ID} FROM {TABLE}{clause}", parametres)]
+
+    def lire_ids(self, ids, colonnes=None):
+        if colonnes is None:
+            selection = f"{TABLE}.*"
+        else:
+            inconnues = [c for c in colonnes if c not in self.types]
+            if inconnues:
+                raise KeyError(f"Colonne inconnue : {inconnues[0]}")
+            selection = ", ".join(f"{TABLE}.{_guillemets(c)}" for c in colonnes)
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute("CREATE TEMP TABLE IF NOT EXISTS selection_lecture (id TEXT PRIMARY KEY)")
+            connexion.execute("DELETE FROM selection_lecture")
+            connexion.executemany("INSERT OR IGNORE INTO selection_lecture (id) VALUES (?)", [(str(i),) for i in ids])
+            df = pd.read_sql_query(
+                f"SELECT {selection} FROM {TABLE} JOIN selection_lecture ON {TABLE}.{COLONNE_ID} = selection_lecture.id "
+                f"ORDER BY {TABLE}.rowid", connexion
+            )
+        return self._vers_dataframe(df)
+
+    def valeurs_distinctes(self, colonne):
+        if colonne not in self.types:
+            raise KeyError(f"Colonne inconnue : {colonne}")
+        nom = _guillemets(colonne)
+        return [ligne[0] for ligne in self.connexion().execute(
+            f"SELECT DISTINCT {nom} FROM {TABLE} WHERE {nom} IS NOT NULL ORDER BY {nom}"
+        )]
+
+    def nombre(self):
+        return self.connexion().execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+    def version(self):
+        # Incrémentée à chaque ajout / suppression, quel que soit le processus
+        return int(self.connexion().execute("SELECT valeur FROM meta WHERE cle = 'version'").fetchone()[0])
+
+    # --- Url_ID pré-attribués (badges.py) ---
+    def reserver_url_ids(self, url_ids):
+        # Ajoute au lot les identifiants encore inconnus ; renvoie ceux retenus
+        maintenant = datetime.now().isoformat(timespec="seconds")
+        retenus = []
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            for url_id in dict.fromkeys(url_ids):
+                if connexion.execute(f"SELECT 1 FROM {TABLE} WHERE Url_ID = ? LIMIT 1", (url_id,)).fetchone():
+                    continue
+                curseur = connexion.execute(
+                    "INSERT OR IGNORE INTO url_ids (url_id, reserve_le) VALUES (?, ?)", (url_id, maintenant)
+                )
+                if curseur.rowcount:
+                    retenus.append(url_id)
+        return retenus
+
+    def attribuer_url_id(self, url_id=None):
+        # Prend l'identifiant demandé (badge remis) ou le plus ancien libre ; None si aucun
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            if url_id is None:
+                ligne = connexion.execute(
+                    "SELECT url_id FROM url_ids WHERE attribue_le IS NULL ORDER BY rowid LIMIT 1"
+                ).fetchone()
+            else:
+                ligne = connexion.execute(
+                    "SELECT url_id FROM url_ids WHERE url_id = ? AND attribue_le IS NULL", (url_id,)
+                ).fetchone()
+            if ligne is None:
+                return None
+            connexion.execute(
+                "UPDATE url_ids SET attribue_le = ? WHERE url_id = ?",
+                (datetime.now().isoformat(timespec="seconds"), ligne[0])
+            )
+            return ligne[0]
+
+    def url_ids_libres(self):
+        return [ligne[0] for ligne in self.connexion().execute(
+            "SELECT url_id FROM url_ids WHERE attribue_le IS NULL ORDER BY rowid"
+        )]
+
+    def nombre_url_ids_libres(self):
+        return self.connexion().execute("SELECT COUNT(*) FROM url_ids WHERE attribue_le IS NULL").fetchone()[0]
+
+    # --- Renotation (renotation.py) ---
+    # Les résultats de chaque lot sont d'abord rangés dans la table renotation (reprise
+    # après interruption), puis appliqués à la table principale par une seule requête.
+    def ids_a_renoter(self, version):
+        # Enregistrements notés par une autre version, hors lots déjà calculés pour celle-ci
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute(f"DELETE FROM {TABLE_RENOTATION} WHERE Version_Modele IS NOT ? AND applique = 0", (version,))
+        return [ligne[0] for ligne in connexion.execute(
+            f"SELECT {COLONNE_ID} FROM {TABLE} WHERE Version_Modele IS NOT ? "
+            f"AND {COLONNE_ID} NOT IN (SELECT {COLONNE_ID} FROM {TABLE_RENOTATION}) ORDER BY rowid", (version,)
+        )]
+
+    def ranger_renotation(self, version, df):
+        # df : Id_Enregistrement + COLONNES_NOTATION (un lot) ; une transaction par lot
+        colonnes = [COLONNE_ID, "Version_Modele"] + COLONNES_NOTATION
+        lignes = [
+            [str(ligne[COLONNE_ID]), version] + [_convertir(ligne.get(nom), self.types[nom]) for nom in COLONNES_NOTATION]
+            for ligne in df.to_dict("records")
+        ]
+        connexion = self.connexion()
+        with connexion:
+            connexion.executemany(
+                f"INSERT OR REPLACE INTO {TABLE_RENOTATION} ({', '.join(_guillemets(nom) for nom in colonnes)}) "
+                f"VALUES ({', '.join('?' for _ in colonnes)})", lignes
+            )
+        return len(lignes)
+
+    def nombre_renotes(self, version):
+        return self.connexion().execute(
+            f"SELECT COUNT(*) FROM {TABLE_RENOTATION} WHERE Version_Modele = ? AND applique = 0", (version,)
+        ).fetchone()[0]
+
+    @trace("base.appliquer_renotation")
+    def appliquer_renotation(self, version):
+        # Une seule écriture sur la table principale (UPDATE ... FROM), esquisses reconstruites
+        # dans la même transaction ; les lignes appliquées restent marquées jusqu'à terminer_renotation()
+        affectations = ", ".join(f"{_guillemets(nom)} = r.{_guillemets(nom)}" for nom in ["Version_Modele"] + COLONNES_NOTATION)
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            modifiees = connexion.execute(
+                f"UPDATE {TABLE} SET {affectations} FROM {TABLE_RENOTATION} AS r "
+                f"WHERE {TABLE}.{COLONNE_ID} = r.{COLONNE_ID} AND r.Version_Modele = ? AND r.applique = 0", (version,)
+            ).rowcount
+            connexion.execute(f"UPDATE {TABLE_RENOTATION} SET applique = 1 WHERE Version_Modele = ?", (version,))
+            if modifiees:
+                self._reconstruire_esquisses(connexion)
+                self._incrementer_version(connexion)
+        return modifiees
+
+    def ids_appliques(self):
+        return [ligne[0] for ligne in self.connexion().execute(
+            f"SELECT {COLONNE_ID} FROM {TABLE_RENOTATION} WHERE applique = 1"
+        )]
+
+    def terminer_renotation(self):
+        connexion = self.connexion()
+        with connexion:
+            connexion.execute(f"DELETE FROM {TABLE_RENOTATION} WHERE applique = 1")
+
+    # --- Export ---
+    def _lignes_export(self, connexion, ids=None):
+        # Curseur sur les lignes à exporter, dans l'ordre d'enregistrement
+        if ids is None:
+            return connexion.execute(f"SELECT * FROM {TABLE} ORDER BY rowid")
+        connexion.execute("CREATE TEMP TABLE IF NOT EXISTS selection_export (id TEXT PRIMARY KEY)")
+        connexion.execute("DELETE FROM selection_export")
+        connexion.executemany("INSERT OR IGNORE INTO selection_export (id) VALUES (?)", [(str(i),) for i in ids])
+        return connexion.execute(
+            f"SELECT {TABLE}.* FROM {TABLE} JOIN selection_export ON {TABLE}.{COLONNE_ID} = selection_export.id "
+            f"ORDER BY {TABLE}.rowid"
+        )
+
+    @trace("base.ecrire_excel")
+    def ecrire_excel(self, destination, ids=None, feuille="Données"):
+        # Écriture en flux (constant_memory) : une ligne SQLite -> une ligne Excel,
+        # sans DataFrame ni classeur complet en mémoire
+        import xlsxwriter
+
+        connexion = self.connexion()
+        with connexion:
+            curseur = self._lignes_export(connexion, ids)
+            noms = [description[0] for description in curseur.description]
+            position_autres = noms.index(COLONNE_AUTRES)
+            types = [self.types.get(nom, "TEXT") for nom in noms]
+            # Clés de la colonne "Autres" : une colonne Excel chacune, comme lire_tout()
+            cles_autres = [
+                ligne[0] for ligne in connexion.execute(
+                    f"SELECT DISTINCT j.key FROM {TABLE}, json_each({TABLE}.{COLONNE_AUTRES}) AS j "
+                    f"WHERE {TABLE}.{COLONNE_AUTRES} IS NOT NULL ORDER BY j.key"
+                )
+            ]
+            entetes = [nom for nom in noms if nom != COLONNE_AUTRES] + cles_autres
+
+            classeur = xlsxwriter.Workbook(destination, {"constant_memory": True, "nan_inf_to_errors": True})
+            try:
+                onglet = classeur.add_worksheet(feuille[:31])
+                gras = classeur.add_format({"bold": True})
+                onglet.write_row(0, 0, entetes, gras)
+                rang = 1
+                while True:
+                    lot = curseur.fetchmany(LIGNES_PAR_LOT)
+                    if not lot:
+                        break
+                    for ligne in lot:
+                        valeurs = [
+                            bool(valeur) if type_colonne == "BOOLEAN" and valeur is not None else valeur
+                            for valeur, type_colonne in zip(ligne, types)
+                        ]
+                        autres = json.loads(valeurs.pop(position_autres) or "{}")
+                        valeurs += [autres.get(cle) for cle in cles_autres]
+                        onglet.write_row(rang, 0, [
+                            v if v is None or isinstance(v, (str, int, float, bool)) else json.dumps(v, ensure_ascii=False)
+                            for v in valeurs
+                        ])
+                        rang += 1
+            finally:
+                classeur.close()
+        return rang - 1
+
+    # --- Reprise de l'ancien stockage (classeur + segments), une seule fois ---
+    @trace("base.importer")
+    def importer(self, journal, cle="import_classeur"):
+        connexion = self.connexion()
+        if connexion.execute("SELECT valeur FROM meta WHERE cle = ?", (cle,)).fetchone():
+            return 0
+        df = migrer_radar(journal.lire_tout())
+        if not df.empty:
+            if COLONNE_HORODATAGE not in df.columns:
+                df[COLONNE_HORODATAGE] = None  # date d'enregistrement inconnue
+            df = df.astype(object).where(df.notna(), None)
+            self.ajouter(df.to_dict("records"))
+        with connexion:
+            connexion.execute(
+                "INSERT OR REPLACE INTO meta (cle, valeur) VALUES (?, ?)",
+                (cle, datetime.now().isoformat(timespec="seconds"))
+            )
+        return len(df)
@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import drive
+import graphiques
+from base_donnees import BaseDonnees
+from configuration import FICHIER_ITEMS, lire_config_items, regles_notation
+from drive_local import DriveLocal
+from profilage import COLONNES_RADAR, migrer_radar, noter, scorer_profil, scorer_profil_batch, INDICATEURS_SUBJECTIFS, INDICATEURS_PERFORMANCE
+from benchmarks.generateur import generer_participants, radar_historique
+
+# --- Suite de benchmarks ---
+# Usage (depuis la racine du dépôt) :
+#   python -m benchmarks.bench                          -> benchmarks/resultats/bench_<commit>.json
+#   python -m benchmarks.bench --tailles 1000,100000 --seulement noter,scorer
+#   python -m benchmarks.bench --comparer avant.json apres.json
+# Chaque mesure donne min / médiane / moyenne / p95 en secondes (par appel ou par ligne).
+
+TAILLES = [1_000, 100_000, 1_000_000]
+TAILLE_EXCEL_MAX = 100_000  # au-delà, l'aller-retour Excel prend plusieurs minutes
+DUREE_MIN_S = 0.5
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultats")
+SEUIL_REGRESSION = 1.10
+
+ITEMS_NOTES = INDICATEURS_SUBJECTIFS + INDICATEURS_PERFORMANCE + ["Stereopsie", "GO", "NOGO"]
+JAUGE_EXEMPLE = ("Vitesse_Horizontale", 612.0, 0, 1000, [450, 500, 700, 850], ["#ff9c8a", "#ffd580", "#66ccaa", "#ffd580", "#ff9c8a"])
+RADAR_EXEMPLE = {"Athlète": 62.5, "Pilote": 48.1, "E-sportif": 71.0, "Performer cognitif": 55.3}
+
+# --- Mesure ---
+def statistiques(durees, unites=1):
+    durees = np.asarray(durees, dtype=float) / unites
+    return {
+        "n": int(len(durees)),
+        "min_s": float(durees.min()),
+        "mediane_s": float(np.median(durees)),
+        "moyenne_s": float(durees.mean()),
+        "p95_s": float(np.percentile(durees, 95)),
+    }
+
+def mesurer(fonction, unites=1, repetitions_min=3, duree_min=DUREE_MIN_S, preparer=None):
+    # Répète fonction() jusqu'à repetitions_min appels et duree_min secondes ;
+    # preparer() est appelé avant chaque mesure, hors chronomètre.
+    durees = []
+    debut = time.perf_counter()
+    while len(durees) < repetitions_min or time.perf_counter() - debut < duree_min:
+        if preparer is not None:
+            preparer()
+        t0 = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - t0)
+    return statistiques(durees, unites)
+
+# --- Cas mesurés ---
+def bench_noter(echantillon):
+    resultats = {}
+    for item in ITEMS_NOTES:
+        valeurs = echantillon[item].tolist()
+        resultats[f"noter.{item}"] = mesurer(
+            lambda: [noter(item, v) for v in valeurs], unites=len(valeurs)
+        )
+    return resultats
+
+def bench_scorer(echantillon, participants):
+    lignes = echantillon.to_dict("records")
+    resultats = {
+        "scorer_profil.par_ligne": mesurer(lambda: [scorer_profil(l) for l in lignes], unites=len(lignes)),
+    }
+    for n, df in participants.items():
+        resultats[f"scorer_profil_batch.{n}"] = mesurer(lambda: scorer_profil_batch(df), repetitions_min=1)
+    return resultats
+
+def bench_rendu():
+    nom, valeur, min_val, max_val, bornes, couleurs = JAUGE_EXEMPLE
+    resultats = {
+        "rendu.matplotlib.jauge.froid": mesurer(
+            lambda: graphiques.figure_en_png(graphiques.plot_jauge_multizone(nom, valeur, min_val, max_val, bornes, couleurs))
+        ),
+        "rendu.matplotlib.radar.froid": mesurer(
+            lambda: graphiques.figure_en_png(graphiques.figure_radar(RADAR_EXEMPLE))
+        ),
+    }
+    graphiques.image_jauge(nom, valeur, min_val, max_val, bornes, couleurs)
+    graphiques.image_radar(RADAR_EXEMPLE)
+    resultats["rendu.matplotlib.jauge.cache"] = mesurer(
+        lambda: graphiques.image_jauge(nom, valeur, min_val, max_val, bornes, couleurs)
+    )
+    resultats["rendu.matplotlib.radar.cache"] = mesurer(lambda: graphiques.image_radar(RADAR_EXEMPLE))
+    for nom_rendu in ("svg", "plotly"):
+        rendu = graphiques.backend_rendu(nom_rendu)
+        resultats[f"rendu.{nom_rendu}.jauge"] = mesurer(
+            lambda: rendu.jauge(nom, valeur, min_val, max_val, bornes, couleurs)
+        )
+        resultats[f"rendu.{nom_rendu}.radar"] = mesurer(lambda: rendu.radar(RADAR_EXEMPLE))
+    return resultats
+
+def bench_config():
+    # charger_config_formulaire() (demo_vivatech) = lire_config_items() derrière st.cache_data
+    return {
+        "config.lire_config_items": mesurer(lambda: lire_config_items(FICHIER_ITEMS)),
+        "config.regles_notation": mesurer(
+            lambda: regles_notation(FICHIER_ITEMS), preparer=regles_notation.cache_clear
+        ),
+    }
+
+def bench_excel(participants, dossier):
+    resultats = {}
+    for n, df in participants.items():
+        if n > TAILLE_EXCEL_MAX:
+            resultats[f"excel.to_excel.{n}"] = {"ignore": f"taille > {TAILLE_EXCEL_MAX}"}
+            continue
+        chemin = os.path.join(dossier, "donnees_patients.xlsx")
+        resultats[f"excel.to_excel.{n}"] = mesurer(lambda: df.to_excel(chemin, index=False), repetitions_min=1)
+        resultats[f"excel.to_excel.{n}"]["octets"] = os.path.getsize(chemin)
+        resultats[f"excel.read_excel.{n}"] = mesurer(lambda: pd.read_excel(chemin), repetitions_min=1)
+    return resultats
+
+def bench_base(participants, dossier):
+    # Base SQLite : insertion d'une ligne (sauvegarde page 2), lecture complète (page 3),
+    # page filtrée et triée (page 3), percentile de cohorte, recherche indexée par Url_ID, export Excel à la demande
+    resultats = {}
+    for n, df in participants.items():
+        base = BaseDonnees(os.path.join(dossier, f"base_{n}.sqlite"))
+        lignes = df.astype(object).where(df.notna(), None).to_dict("records")
+        debut = time.perf_counter()
+        base.ajouter(lignes)
+        resultats[f"base.import.{n}"] = statistiques([time.perf_counter() - debut])
+        nouvelles = iter(generer_participants(200, seed=n).to_dict("records"))
+        resultats[f"base.ajouter_ligne.{n}"] = mesurer(lambda: base.ajouter([next(nouvelles)]), duree_min=0, repetitions_min=200)
+        resultats[f"base.lire_tout.{n}"] = mesurer(base.lire_tout, repetitions_min=1)
+        historique = df.drop(columns=COLONNES_RADAR).assign(Radar_Analytique=radar_historique(df))
+        resultats[f"base.migrer_radar.{n}"] = mesurer(lambda: migrer_radar(historique), repetitions_min=1)
+        resultats[f"base.lire_page.{n}"] = mesurer(lambda: base.lire_page({"Profil": [lignes[0]["Profil"]]}, "Score_Global", page=10))
+        resultats[f"base.percentile.{n}"] = mesurer(lambda: base.percentile("GO", 300.0, "Adulte"))
+        url_id = lignes[len(lignes) // 2]["Url_ID"]
+        resultats[f"base.lire_url_id.{n}"] = mesurer(lambda: base.lire("Url_ID", url_id))
+        if n <= TAILLE_EXCEL_MAX:
+            chemin_export = os.path.join(dossier, f"export_{n}.xlsx")
+            resultats[f"base.ecrire_excel.{n}"] = mesurer(lambda: base.ecrire_excel(chemin_export), repetitions_min=1)
+    return resultats
+
+def bench_drive(participants, dossier, latence_s=0.0):
+    # Cycle ecraser_fichier_excel / telecharger_fichier_excel sur le Drive local
+    resultats = {}
+    client = DriveLocal(os.path.join(dossier, "drive"), latence_s=latence_s)
+    client.initialiser_fichier(drive.FICHIER_ID_DRIVE)
+    drive.definir_client_drive(client)
+    try:
+        for n, df in participants.items():
+            if n > TAILLE_EXCEL_MAX:
+                resultats[f"drive.cycle.{n}"] = {"ignore": f"taille > {TAILLE_EXCEL_MAX}"}
+                continue
+            resultats[f"drive.ecraser_fichier_excel.{n}"] = mesurer(
+                lambda: drive.ecraser_fichier_excel(df), repetitions_min=1
+            )
+            resultats[f"drive.telecharger_fichier_excel.{n}"] = mesurer(
+                lambda: drive.telecharger_fichier_excel(), repetitions_min=1
+            )
+        resultats["drive.appels"] = dict(client.appels)
+        resultats["drive.octets"] = {"recus": client.octets_recus, "envoyes": client.octets_envoyes}
+    finally:
+        drive.definir_client_drive(None)
+    return resultats
+
+# --- Contexte et sortie JSON ---
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def contexte():
+    import matplotlib
+    import streamlit
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "modifications_locales": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "processeurs": os.cpu_count(),
+        "versions": {
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "streamlit": streamlit.__version__,
+        },
+    }
+
+def executer(tailles=TAILLES, seulement=None, latence_drive=0.0):
+    groupes = seulement or ["generateur", "noter", "scorer", "rendu", "config", "excel", "base", "drive"]
+    resultats = {}
+
+    participants = {}
+    for n in tailles:
+        debut = time.perf_counter()
+        participants[n] = generer_participants(n)
+        if "generateur" in groupes:
+            resultats[f"generateur.{n}"] = statistiques([time.perf_counter() - debut])
+    echantillon = participants[min(tailles)].head(1000)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        etapes = {
+            "noter": lambda: bench_noter(echantillon),
+            "scorer": lambda: bench_scorer(echantillon, participants),
+            "rendu": bench_rendu,
+            "config": bench_config,
+            "excel": lambda: bench_excel(participants, dossier),
+            "base": lambda: bench_base(participants, dossier),
+            "drive": lambda: bench_drive(participants, dossier, latence_drive),
+        }
+        for groupe, etape in etapes.items():
+            if groupe in groupes:
+                print(f"⏱️ {groupe}…", file=sys.stderr)
+                resultats.update(etape())
+
+    return {"contexte": contexte(), "tailles": list(tailles), "resultats": resultats}
+
+# --- Comparaison de deux exécutions ---
+def comparer(avant, apres, seuil=SEUIL_REGRESSION):
+    lignes = []
+    for nom, mesure in apres["resultats"].items():
+        reference = avant["resultats"].get(nom, {})
+        if "mediane_s" not in mesure or "mediane_s" not in reference:
+            continue
+        rapport = mesure["mediane_s"] / reference["mediane_s"] if reference["mediane_s"] else float("inf")
+        lignes.append((nom, reference["mediane_s"], mesure["mediane_s"], rapport, rapport > seuil))
+    return lignes
+
+def afficher_comparaison(lignes):
+    for nom, avant, apres, rapport, regression in lignes:
+        marque = "⚠️ " if regression else "   "
+        print(f"{marque}{nom:<45} {avant:>12.6g} s -> {apres:>12.6g} s  x{rapport:.2f}")
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks Optimeyes")
+    parser.add_argument("--tailles", default=",".join(str(n) for n in TAILLES))
+    parser.add_argument("--seulement", default="", help="groupes séparés par des virgules (noter,scorer,rendu,config,excel,base,drive,generateur)")
+    parser.add_argument("--latence-drive", type=float, default=0.0, help="latence simulée par appel Drive (s)")
+    parser.add_argument("--sortie", default=None)
+    parser.add_argument("--comparer", nargs=2, metavar=("AVANT", "APRES"))
+    args = parser.parse_args(arguments)
+
+    if args.comparer:
+        with open(args.comparer[0], encoding="utf-8") as f:
+            avant = json.load(f)
+        with open(args.comparer[1], encoding="utf-8") as f:
+            apres = json.load(f)
+        lignes = comparer(avant, apres)
+        afficher_comparaison(lignes)
+        return 1 if any(regression for *_, regression in lignes) else 0
+
+    tailles = [int(n) for n in args.tailles.split(",") if n.strip()]
+    seulement = [g.strip() for g in args.seulement.split(",") if g.strip()] or None
+    rapport = executer(tailles, seulement, args.latence_drive)
+
+    sortie = args.sortie or os.path.join(DOSSIER_RESULTATS, f"bench_{rapport['contexte']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"✅ Résultats écrits dans {sortie}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
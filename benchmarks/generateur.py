@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+from configuration import FICHIER_ITEMS, lire_config_items
+from profilage import POIDS_PROFILS, AXES_RADAR, scorer_profil_batch
+
+# --- Générateur de participants synthétiques ---
+# Les réponses suivent la configuration des items (Vivatech_Optimeyes.csv) :
+# options pour les items à choix, Min / Max / Default / Step pour les items numériques.
+# Les colonnes calculées sont celles enregistrées par la page 2 du formulaire.
+
+PROPORTION_STEREOPSIE = 0.4
+PROPORTION_SUBJECTIF_SEUL = 0.1
+PROPORTION_EMAIL = 0.2
+
+def _nombre(texte, defaut):
+    try:
+        return float(str(texte).replace(",", "."))
+    except ValueError:
+        return defaut
+
+def _hex(rng, n, chiffres):
+    texte = rng.bytes(n * chiffres).hex()[::2]
+    return np.array([texte[i:i + chiffres] for i in range(0, n * chiffres, chiffres)], dtype=object)
+
+def _textes(valeurs):
+    # str() de chaque valeur, calculé une seule fois par valeur distincte
+    codes, uniques = pd.factorize(np.asarray(valeurs, dtype=float))
+    return np.array([str(float(u)) for u in uniques], dtype=object)[codes]
+
+def radar_historique(df):
+    # Ancien format (avant les colonnes Radar_<axe>) : dict Python dans une cellule
+    radar = np.full(len(df), "{", dtype=object)
+    for i, axe in enumerate(AXES_RADAR):
+        separateur = "" if i == 0 else ", "
+        radar = radar + f"{separateur}'{axe}': " + _textes(df[f"Radar_{axe}"])
+    return radar + "}"
+
+def _valeurs_numeriques(rng, n, ligne):
+    # Loi normale centrée sur la valeur par défaut, bornée à [Min ; Max] et arrondie au pas
+    min_val = _nombre(ligne["Min"], 0.0)
+    max_val = _nombre(ligne["Max"], 100.0)
+    defaut = min(max(_nombre(ligne["Default"], (min_val + max_val) / 2), min_val), max_val)
+    pas = _nombre(ligne["Step"], 1.0) or 1.0
+    valeurs = rng.normal(defaut, (max_val - min_val) / 6, size=n).clip(min_val, max_val)
+    valeurs = np.round(valeurs / pas) * pas
+    return np.round(valeurs.clip(min_val, max_val), 6)
+
+def generer_reponses(n, seed=0, fichier=FICHIER_ITEMS):
+    rng = np.random.default_rng(seed)
+    df_config = lire_config_items(fichier)
+    colonnes = {}
+
+    subjectif_seul = rng.random(n) < PROPORTION_SUBJECTIF_SEUL
+    for _, ligne in df_config.iterrows():
+        item = ligne["Item"].strip()
+        type_champ = str(ligne["Type"]).strip().lower()
+        options = [opt.strip() for opt in str(ligne["Options"]).split(";") if opt.strip()]
+
+        if item == "Code_Sujet":
+            colonnes[item] = _hex(rng, n, 8)
+        elif item == "Email":
+            avec_email = rng.random(n) < PROPORTION_EMAIL
+            colonnes[item] = np.where(avec_email, "participant" + _hex(rng, n, 8) + "@example.org", "")
+        elif options:
+            colonnes[item] = np.asarray(options, dtype=object)[rng.integers(0, len(options), size=n)]
+        elif type_champ in ("num", "slider"):
+            valeurs = _valeurs_numeriques(rng, n, ligne)
+            if ligne["Page"] == 2:
+                # Tests cliniques non passés en mode subjectif seul
+                valeurs = np.where(subjectif_seul, np.nan, valeurs)
+            colonnes[item] = valeurs
+
+    df = pd.DataFrame(colonnes)
+    df["Stereopsie_activee"] = rng.random(n) < PROPORTION_STEREOPSIE
+    df["Subjectif_Seul"] = subjectif_seul
+    return df
+
+def generer_participants(n, seed=0, fichier=FICHIER_ITEMS, format_historique=False):
+    # Lignes complètes, telles qu'enregistrées par la page 2
+    # (format_historique : radar en une seule colonne texte, comme les anciens classeurs)
+    rng = np.random.default_rng(seed + 1)
+    df = generer_reponses(n, seed, fichier)
+    scores = scorer_profil_batch(df)
+
+    df["Profil"] = scores["Profil"]
+    for colonne in ["Score_Profil_Dominant", "Indice_Subjectif", "indice_Performance", "Score_Global", "Coherence"]:
+        df[colonne] = scores[colonne]
+
+    if format_historique:
+        df["Radar_Analytique"] = radar_historique(scores)
+    else:
+        for axe in AXES_RADAR:
+            df[f"Radar_{axe}"] = scores[f"Radar_{axe}"]
+
+    df["Alerte_Discordance"] = scores["Alerte_Discordance"]
+    for profil in POIDS_PROFILS:
+        df[f"Score_{profil}"] = scores[f"Score_{profil}"]
+    df["Url_ID"] = _hex(rng, n, 8) + "-" + _hex(rng, n, 3)
+    df["Id_Enregistrement"] = _hex(rng, n, 15) + _hex(rng, n, 15) + _hex(rng, n, 2)
+    return df
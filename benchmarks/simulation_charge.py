@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+
+from benchmarks.bench import DOSSIER_RESULTATS, contexte
+from benchmarks.generateur import generer_participants, generer_reponses
+
+# --- Simulation de charge : plusieurs tablettes sur un même déploiement ---
+# Chaque kiosque est un thread qui enchaîne des sessions complètes avec AppTest
+# (accueil -> page 0.3 questionnaire -> 0.5 -> page 1 tests cliniques -> page 2 enregistrement).
+# Drive est remplacé par drive_local.DriveLocal. Chaque taille de jeu de données
+# stocké est simulée dans un processus neuf (caches Streamlit et file d'envoi vierges).
+# AppTest modifie un état global (Runtime, config) à chaque exécution : les exécutions
+# de script sont donc sérialisées, comme sur un serveur Streamlit limité par le GIL ;
+# l'attente de ce verrou est comptée dans la latence. L'envoi Drive (thread de fond)
+# reste concurrent.
+# Usage (depuis la racine du dépôt) :
+#   python -m benchmarks.simulation_charge --kiosques 4 --sessions 10 --tailles-stockees 0,1000,10000
+
+DOSSIER_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_APP = os.path.join(DOSSIER_APP, "demo_vivatech.py")
+LOGO = "optimeyes_logo_black.png"
+# Chemins relatifs utilisés par demo_vivatech.py (le script ne peut pas être importé)
+FICHIER_BASE = "donnees_patients.sqlite"
+DOSSIER_FILE_DRIVE = "file_attente_drive"
+ETAPES = ["accueil", "saisie", "questionnaire", "intermediaire", "tests_cliniques", "enregistrement"]
+PERCENTILES = [50, 95, 99]
+DELAI_VIDAGE_MAX_S = 120.0
+
+_verrou_execution = threading.Lock()
+
+def _bouton(at, libelle):
+    for bouton in at.button:
+        if bouton.label == libelle:
+            return bouton
+    raise LookupError(f"Bouton introuvable : {libelle}")
+
+def _chronometrer(latences, etape, action):
+    debut = time.perf_counter()
+    with _verrou_execution:
+        at = action()
+    latences[etape] = time.perf_counter() - debut
+    if len(at.exception):
+        raise RuntimeError(f"{etape} : {at.exception[0].message}")
+    return at
+
+# --- Une session participant ---
+def parcours_session(reponse, pause_s=0.0):
+    from streamlit.testing.v1 import AppTest
+
+    latences = {}
+    at = AppTest.from_file(SCRIPT_APP, default_timeout=120)
+    _chronometrer(latences, "accueil", at.run)
+    _chronometrer(latences, "saisie", lambda: _bouton(at, "📝 Saisie").click().run())
+
+    # Page 0.3 : questionnaire subjectif
+    time.sleep(pause_s)
+    for radio in at.radio:
+        radio.set_value(reponse[radio.key])
+    for slider in at.slider:
+        slider.set_value(float(reponse[slider.key]))
+    at.text_input(key="Code_Sujet").set_value(reponse["Code_Sujet"])
+    at.checkbox[0].set_value(bool(reponse["Subjectif_Seul"]))
+    _chronometrer(latences, "questionnaire", lambda: _bouton(at, "Page suivante").click().run())
+
+    # Page 0.5 : résultats intermédiaires
+    time.sleep(pause_s)
+    _chronometrer(latences, "intermediaire", lambda: _bouton(at, "Poursuivre").click().run())
+
+    # Page 1 : tests cliniques (sautée en mode subjectif seul)
+    if not reponse["Subjectif_Seul"]:
+        time.sleep(pause_s)
+        for champ in at.number_input:
+            champ.set_value(float(reponse[champ.key]))
+        for case in at.checkbox:
+            if case.label == "Inclure la stéréopsie":
+                case.set_value(bool(reponse["Stereopsie_activee"]))
+        _chronometrer(latences, "tests_cliniques", lambda: _bouton(at, "Afficher les résultats").click().run())
+
+    # Page 2 : enregistrement
+    time.sleep(pause_s)
+    _chronometrer(latences, "enregistrement", lambda: _bouton(at, "Valider et enregistrer").click().run())
+    if not any("enregistré" in message.value for message in at.success):
+        raise RuntimeError("enregistrement : pas de confirmation")
+    latences["session"] = sum(latences.values())
+    return latences
+
+def _kiosque(reponses, pause_s, mesures, erreurs, verrou):
+    for reponse in reponses:
+        try:
+            latences = parcours_session(reponse, pause_s)
+        except Exception as e:
+            with verrou:
+                erreurs.append(repr(e))
+            continue
+        with verrou:
+            mesures.append(latences)
+
+def _attendre_vidage(dossier_file, delai_max=DELAI_VIDAGE_MAX_S):
+    debut = time.perf_counter()
+    while time.perf_counter() - debut < delai_max:
+        if not any(nom.endswith(".json") for nom in os.listdir(dossier_file)):
+            return time.perf_counter() - debut
+        time.sleep(0.1)
+    return None
+
+def _percentiles(valeurs):
+    if not valeurs:
+        return {}
+    return {f"p{p}_s": float(np.percentile(valeurs, p)) for p in PERCENTILES} | {"n": len(valeurs)}
+
+# --- Un palier (taille du jeu de données stocké), exécuté dans un processus dédié ---
+def simuler_palier(taille_stockee, kiosques, sessions, pause_s=0.0, latence_drive=0.0, seed=0):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, DOSSIER_APP)
+    import drive
+    from base_donnees import BaseDonnees
+    from drive_local import DriveLocal
+
+    with tempfile.TemporaryDirectory() as dossier:
+        os.chdir(dossier)
+        os.symlink(os.path.join(DOSSIER_APP, LOGO), LOGO)
+
+        # Jeu de données existant, identique en local (SQLite) et sur le Drive simulé
+        client = DriveLocal(os.path.join(dossier, "drive"), latence_s=latence_drive)
+        if taille_stockee:
+            participants = generer_participants(taille_stockee, seed=seed)
+            BaseDonnees(FICHIER_BASE).ajouter(participants.astype(object).where(participants.notna(), None).to_dict("records"))
+            buffer = BytesIO()
+            participants.to_excel(buffer, index=False)
+            client.initialiser_fichier(drive.FICHIER_ID_DRIVE, buffer.getvalue())
+        else:
+            client.initialiser_fichier(drive.FICHIER_ID_DRIVE)
+        drive.definir_client_drive(client)
+
+        reponses = generer_reponses(kiosques * sessions, seed=seed + 1).to_dict("records")
+        mesures, erreurs, verrou = [], [], threading.Lock()
+        threads = [
+            threading.Thread(target=_kiosque, args=(reponses[k::kiosques], pause_s, mesures, erreurs, verrou))
+            for k in range(kiosques)
+        ]
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duree = time.perf_counter() - debut
+        vidage = _attendre_vidage(os.path.join(dossier, DOSSIER_FILE_DRIVE))
+
+        return {
+            "taille_stockee": taille_stockee,
+            "kiosques": kiosques,
+            "sessions": len(mesures),
+            "erreurs": erreurs,
+            "duree_s": duree,
+            "sessions_par_minute": len(mesures) / duree * 60 if duree else 0.0,
+            "latences": {
+                etape: _percentiles([m[etape] for m in mesures if etape in m])
+                for etape in ETAPES + ["session"]
+            },
+            "vidage_file_drive_s": vidage,
+            "appels_drive": dict(client.appels),
+        }
+
+def simuler(tailles_stockees, kiosques, sessions, pause_s=0.0, latence_drive=0.0):
+    paliers = []
+    contexte_spawn = multiprocessing.get_context("spawn")
+    for taille in tailles_stockees:
+        print(f"⏱️ {kiosques} kiosques x {sessions} sessions, {taille} lignes stockées…", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=contexte_spawn) as executeur:
+            paliers.append(executeur.submit(
+                simuler_palier, taille, kiosques, sessions, pause_s, latence_drive
+            ).result())
+    return {"contexte": contexte(), "paliers": paliers}
+
+def afficher_rapport(rapport):
+    for palier in rapport["paliers"]:
+        print(
+            f"\n📦 {palier['taille_stockee']} lignes stockées — {palier['sessions']} sessions, "
+            f"{palier['sessions_par_minute']:.1f} sessions/min, {len(palier['erreurs'])} erreur(s), "
+            f"vidage Drive : {palier['vidage_file_drive_s']} s"
+        )
+        for etape, stats in palier["latences"].items():
+            if stats:
+                valeurs = "  ".join(f"p{p} {stats[f'p{p}_s'] * 1000:8.0f} ms" for p in PERCENTILES)
+                print(f"   {etape:<16} {valeurs}")
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Simulation de charge Optimeyes (kiosques concurrents)")
+    parser.add_argument("--kiosques", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=5, help="sessions par kiosque")
+    parser.add_argument("--tailles-stockees", default="0,1000,10000")
+    parser.add_argument("--pause", type=float, default=0.0, help="temps de saisie simulé entre deux pages (s)")
+    parser.add_argument("--latence-drive", type=float, default=0.0, help="latence simulée par appel Drive (s)")
+    parser.add_argument("--sortie", default=None)
+    args = parser.parse_args(arguments)
+
+    tailles = [int(n) for n in args.tailles_stockees.split(",") if n.strip()]
+    rapport = simuler(tailles, args.kiosques, args.sessions, args.pause, args.latence_drive)
+    afficher_rapport(rapport)
+
+    sortie = args.sortie or os.path.join(DOSSIER_RESULTATS, f"charge_{rapport['contexte']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Résultats écrits dans {sortie}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
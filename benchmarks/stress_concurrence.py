@@ -0,0 +1,152 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Test de charge des écritures concurrentes (mises à jour perdues) ---
+# Plusieurs processus « kiosques » ajoutent des lignes au même stockage (base SQLite,
+# classeur local ou Drive simulé partagé), avec un seuil de compaction bas pour
+# multiplier les réécritures concurrentes du classeur ; un processus « opérateur » supprime des lignes
+# pendant ce temps. À la fin, chaque ligne ajoutée et non supprimée doit être présente
+# exactement une fois.
+# Usage (depuis la racine du dépôt) :
+#   python -m benchmarks.stress_concurrence --kiosques 6 --lignes 40 --backend sqlite,local,drive
+
+FICHIER_CLASSEUR = "donnees_patients.xlsx"
+FICHIER_BASE = "donnees_patients.sqlite"
+DOSSIER_SEGMENTS = "segments_patients"
+DOSSIER_DRIVE = "drive"
+
+class JournalSQLite:
+    # La base SQLite présentée comme un journal : pas de segments, donc rien à compacter
+    def __init__(self, fichier):
+        from base_donnees import BaseDonnees
+        self.base = BaseDonnees(fichier)
+
+    def ajouter(self, lignes):
+        return self.base.ajouter(lignes)
+
+    def lire_tout(self):
+        return self.base.lire_tout()
+
+    def supprimer(self, ids):
+        return self.base.supprimer(ids)
+
+    def compacter(self, force=False):
+        return 0
+
+def _journal(type_backend, dossier, seuil, latence_drive=0.0):
+    from stockage import BackendLocal, BackendDrive, JournalSegments
+    if type_backend == "sqlite":
+        return JournalSQLite(os.path.join(dossier, FICHIER_BASE))
+    if type_backend == "local":
+        backend = BackendLocal(os.path.join(dossier, FICHIER_CLASSEUR), os.path.join(dossier, DOSSIER_SEGMENTS))
+    else:
+        import drive
+        from drive_local import DriveLocal
+        drive.definir_client_drive(DriveLocal(os.path.join(dossier, DOSSIER_DRIVE), latence_s=latence_drive))
+        backend = BackendDrive(drive.FICHIER_ID_DRIVE)
+    return JournalSegments(backend, seuil_compaction=seuil)
+
+def _kiosque(type_backend, dossier, numero, lignes, seuil, latence_drive):
+    from stockage import COLONNE_ID, compteurs_ecriture
+    journal = _journal(type_backend, dossier, seuil, latence_drive)
+    ids = []
+    debut = time.perf_counter()
+    for i in range(lignes):
+        id_ligne = uuid.uuid4().hex
+        journal.ajouter([{COLONNE_ID: id_ligne, "Code_Sujet": f"k{numero}-{i}", "Score_Global": random.random() * 100}])
+        ids.append(id_ligne)
+    return {"ids": ids, "duree_s": time.perf_counter() - debut, "compteurs": compteurs_ecriture()}
+
+def _operateur(type_backend, dossier, suppressions, seuil, latence_drive):
+    # Supprime quelques lignes déjà enregistrées, comme depuis la page « Données »
+    from stockage import COLONNE_ID, compteurs_ecriture
+    journal = _journal(type_backend, dossier, seuil, latence_drive)
+    supprimes = []
+    for _ in range(suppressions):
+        time.sleep(random.uniform(0.05, 0.2))
+        df = journal.lire_tout()
+        if df.empty:
+            continue
+        cibles = df[COLONNE_ID].sample(min(2, len(df))).tolist()
+        journal.supprimer(cibles)
+        supprimes.extend(cibles)
+    return {"ids": supprimes, "compteurs": compteurs_ecriture()}
+
+def stresser(type_backend, kiosques, lignes, seuil, suppressions, latence_drive=0.0):
+    from stockage import COLONNE_ID
+    with tempfile.TemporaryDirectory() as dossier:
+        if type_backend == "drive":
+            import drive
+            from drive_local import DriveLocal
+            DriveLocal(os.path.join(dossier, DOSSIER_DRIVE)).initialiser_fichier(drive.FICHIER_ID_DRIVE)
+
+        contexte_spawn = multiprocessing.get_context("spawn")
+        debut = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=kiosques + 1, mp_context=contexte_spawn) as executeur:
+            futurs = [
+                executeur.submit(_kiosque, type_backend, dossier, k, lignes, seuil, latence_drive)
+                for k in range(kiosques)
+            ]
+            futur_operateur = executeur.submit(_operateur, type_backend, dossier, suppressions, seuil, latence_drive)
+            resultats = [f.result() for f in futurs]
+            operateur = futur_operateur.result()
+        duree = time.perf_counter() - debut
+
+        # Deux compactions forcées : fusion puis retrait des segments confirmés
+        journal = _journal(type_backend, dossier, seuil)
+        journal.compacter(force=True)
+        journal.compacter(force=True)
+        df = journal.lire_tout()
+
+    ajoutes = {id_ligne for r in resultats for id_ligne in r["ids"]}
+    supprimes = set(operateur["ids"])
+    trouves = df[COLONNE_ID].tolist() if COLONNE_ID in df.columns else []
+    attendus = ajoutes - supprimes
+    return {
+        "backend": type_backend,
+        "kiosques": kiosques,
+        "lignes_ajoutees": len(ajoutes),
+        "lignes_supprimees": len(supprimes),
+        "lignes_trouvees": len(trouves),
+        "perdues": len(attendus - set(trouves)),
+        "ressuscitees": len(supprimes & set(trouves)),
+        "doublons": len(trouves) - len(set(trouves)),
+        "ecritures_classeur": sum(r["compteurs"]["ecritures"] for r in resultats + [operateur]),
+        "conflits": sum(r["compteurs"]["conflits"] for r in resultats + [operateur]),
+        "duree_s": duree,
+        "lignes_par_seconde": len(ajoutes) / duree if duree else 0.0,
+    }
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Test de charge des écritures concurrentes")
+    parser.add_argument("--kiosques", type=int, default=6)
+    parser.add_argument("--lignes", type=int, default=40, help="lignes ajoutées par kiosque")
+    parser.add_argument("--seuil", type=int, default=5, help="seuil de compaction (bas = plus de conflits)")
+    parser.add_argument("--suppressions", type=int, default=5)
+    parser.add_argument("--backend", default="sqlite,local,drive")
+    parser.add_argument("--latence-drive", type=float, default=0.01)
+    args = parser.parse_args(arguments)
+
+    echec = False
+    for type_backend in [b.strip() for b in args.backend.split(",") if b.strip()]:
+        rapport = stresser(type_backend, args.kiosques, args.lignes, args.seuil, args.suppressions, args.latence_drive)
+        ok = not (rapport["perdues"] or rapport["ressuscitees"] or rapport["doublons"])
+        echec = echec or not ok
+        print(
+            f"{'✅' if ok else '❌'} {type_backend} : {rapport['lignes_ajoutees']} ajoutées, "
+            f"{rapport['lignes_supprimees']} supprimées, {rapport['lignes_trouvees']} trouvées — "
+            f"perdues {rapport['perdues']}, ressuscitées {rapport['ressuscitees']}, doublons {rapport['doublons']} — "
+            f"{rapport['ecritures_classeur']} réécritures, {rapport['conflits']} conflits, "
+            f"{rapport['lignes_par_seconde']:.1f} lignes/s"
+        )
+    return 1 if echec else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
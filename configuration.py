@@ -0,0 +1,292 @@
+import os
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from traces import trace
+
+DOSSIER_APP = os.path.dirname(os.path.abspath(__file__))
+FICHIER_ITEMS = os.path.join(DOSSIER_APP, "Vivatech_Optimeyes.csv")
+
+COLONNES_ATTENDUES = ["Item", "Description", "Type", "Décimales", "Unité", "Options", "Min", "Max", "Default", "Step", "Borne1", "Borne2", "Borne3", "Borne4", "Bulle1", "Bulle2", "Question", "Seuils", "Notes", "Cible", "Page"]
+
+# --- Lecture du fichier de configuration des items ---
+def lire_config_items(fichier=FICHIER_ITEMS):
+    df_items = pd.read_csv(fichier, sep=";", encoding="utf-8")
+    df_items.columns = [str(col).strip().capitalize() for col in df_items.columns]
+
+    df_items["Page"] = pd.to_numeric(df_items["Page"], errors="coerce").fillna(0).astype(int)
+
+    for col in COLONNES_ATTENDUES:
+        if col not in df_items.columns:
+            df_items[col] = ""
+    df_items = df_items[COLONNES_ATTENDUES].fillna("")
+    df_items = df_items[df_items["Item"].str.strip() != ""]
+    return df_items
+
+# --- Schéma compilé du formulaire ---
+# Le CSV est lu et validé une seule fois (puis à chaque modification du fichier) :
+# chaque ligne devient un ChampFormulaire typé, regroupé par page. Un rerun de la
+# page formulaire ne fait plus que les appels de widgets.
+
+TYPES_CHAMPS = {"text", "radio", "select", "multiselect", "slider", "num", "bool", "checkbox"}
+TYPES_A_OPTIONS = {"radio", "select", "multiselect"}
+TYPES_NUMERIQUES = {"slider", "num"}
+
+@dataclass(frozen=True, slots=True)
+class ChampFormulaire:
+    item: str
+    type: str
+    page: int
+    label: str
+    unite: str
+    options: tuple
+    decimales: int
+    step: float
+    min: float
+    max: float
+    defaut: float
+    bornes: tuple
+    bulles: tuple
+
+    @property
+    def format(self):
+        return f"%.{self.decimales}f"
+
+@dataclass(frozen=True, slots=True)
+class SchemaFormulaire:
+    champs: tuple
+    _pages: MappingProxyType = field(repr=False, compare=False)
+    _items: MappingProxyType = field(repr=False, compare=False)
+
+    def page(self, numero):
+        return self._pages.get(numero, ())
+
+    def champ(self, item):
+        return self._items.get(item)
+
+def _texte(valeur):
+    return str(valeur).strip()
+
+def _nombre_config(ligne, colonne, defaut, numero, item):
+    # Cellule vide -> valeur par défaut ; virgule décimale acceptée (export Excel)
+    texte = _texte(ligne[colonne]).replace(",", ".")
+    if texte == "":
+        return defaut
+    try:
+        return float(texte)
+    except ValueError:
+        raise ValueError(f"Configuration des items, ligne {numero} ({item}) : {colonne} non numérique : {ligne[colonne]!r}")
+
+def compiler_champ(ligne, numero):
+    item = _texte(ligne["Item"])
+    type_champ = _texte(ligne["Type"]).lower()
+    if type_champ not in TYPES_CHAMPS:
+        raise ValueError(f"Configuration des items, ligne {numero} ({item}) : type inconnu {ligne['Type']!r} (attendu : {', '.join(sorted(TYPES_CHAMPS))})")
+
+    options = tuple(opt.strip() for opt in _texte(ligne["Options"]).split(";") if opt.strip())
+    if type_champ in TYPES_A_OPTIONS and not options:
+        raise ValueError(f"Configuration des items, ligne {numero} ({item}) : aucune option pour un champ {type_champ}")
+
+    decimales = _nombre_config(ligne, "Décimales", 1, numero, item)
+    if decimales != int(decimales) or decimales < 0:
+        raise ValueError(f"Configuration des items, ligne {numero} ({item}) : Décimales doit être un entier positif : {ligne['Décimales']!r}")
+    min_val = _nombre_config(ligne, "Min", 0.0, numero, item)
+    max_val = _nombre_config(ligne, "Max", 100.0, numero, item)
+    step = _nombre_config(ligne, "Step", 1.0, numero, item)
+    defaut = _nombre_config(ligne, "Default", 0.0, numero, item)
+    bornes = tuple(
+        borne for borne in (_nombre_config(ligne, f"Borne{i}", None, numero, item) for i in range(1, 5))
+        if borne is not None
+    )
+    if type_champ in TYPES_NUMERIQUES:
+        if min_val > max_val:
+            raise ValueError(f"Configuration des items, ligne {numero} ({item}) : Min ({min_val}) supérieur à Max ({max_val})")
+        if step <= 0:
+            raise ValueError(f"Configuration des items, ligne {numero} ({item}) : Step doit être positif ({step})")
+
+    description = _texte(ligne["Description"])
+    question = _texte(ligne["Question"])
+    return ChampFormulaire(
+        item=item,
+        type=type_champ,
+        page=int(ligne["Page"]),
+        label=f"{description}\n\n**{question}**" if question else description,
+        unite=_texte(ligne["Unité"]),
+        options=options,
+        decimales=int(decimales),
+        step=step,
+        min=min_val,
+        max=max_val,
+        defaut=min(max(defaut, min_val), max_val),
+        bornes=bornes,
+        bulles=(_texte(ligne["Bulle1"]), _texte(ligne["Bulle2"])),
+    )
+
+@lru_cache(maxsize=4)
+def _compiler_formulaire(fichier, _mtime):
+    df_items = lire_config_items(fichier)
+    champs, items = [], {}
+    for index, ligne in df_items.iterrows():
+        champ = compiler_champ(ligne, numero=index + 2)  # numéro de ligne dans le CSV (en-tête = 1)
+        if champ.item in items:
+            raise ValueError(f"Configuration des items, ligne {index + 2} : item {champ.item} déjà défini")
+        champs.append(champ)
+        items[champ.item] = champ
+    pages = {}
+    for champ in champs:
+        pages.setdefault(champ.page, []).append(champ)
+    return SchemaFormulaire(
+        tuple(champs),
+        MappingProxyType({page: tuple(liste) for page, liste in pages.items()}),
+        MappingProxyType(items),
+    )
+
+@trace("config.schema_formulaire")
+def schema_formulaire(fichier=FICHIER_ITEMS):
+    # Recompilé seulement si le fichier a été modifié
+    return _compiler_formulaire(fichier, os.stat(fichier).st_mtime_ns)
+
+# --- REGLES DE NOTATION ---
+# Colonnes "Seuils", "Notes" et "Cible" du CSV (indépendantes des bornes d'affichage Borne1..Borne4) :
+# - item numérique : "Seuils" liste les limites des zones, croissantes ; « x » range la
+#   valeur x dans la zone inférieure, « <x » dans la zone supérieure. La première et la
+#   dernière zone sont ouvertes. Une note par zone, soit une note de plus que de seuils.
+# - item à choix : une note par option, dans l'ordre de la colonne "Options".
+# - "Cible" (GO, NOGO) : limite haute de la zone visée pour le score combiné GO/NOGO,
+#   prise parmi les seuils de l'item, donc tracée sur sa jauge.
+# Une valeur absente, non numérique ou inconnue vaut 0.
+# Les jauges tracent leurs zones avec ces mêmes seuils et notes.
+
+COMPOSANTES_GO_NOGO = ("GO", "NOGO")
+NOTES_GO_NOGO = (1, 2, 3)  # note selon le nombre de composantes dans leur cible
+
+def est_nombre(valeur):
+    return isinstance(valeur, (int, float, np.integer, np.floating)) and not pd.isna(valeur)
+
+def lire_seuils(texte, item=""):
+    # "<30;60;120" -> (bornes, textes) ; « <x » devient la borne incluse juste sous x
+    textes = tuple(seuil.strip() for seuil in str(texte).split(";") if seuil.strip())
+    bornes = []
+    for seuil in textes:
+        strict = seuil.startswith("<")
+        try:
+            valeur = float(seuil.lstrip("<").strip().replace(",", "."))
+        except ValueError:
+            raise ValueError(f"Configuration des items : seuil non numérique pour l'item {item} : {seuil!r}")
+        bornes.append(float(np.nextafter(valeur, -np.inf)) if strict else valeur)
+    if any(b <= a for a, b in zip(bornes, bornes[1:])):
+        raise ValueError(f"Configuration des items : seuils non croissants pour l'item {item} : {texte!r}")
+    return tuple(bornes), textes
+
+@dataclass(frozen=True, slots=True)
+class RegleNumerique:
+    item: str
+    bornes: tuple
+    notes: tuple
+    seuils: tuple  # textes de la colonne Seuils (affichage, calibrage)
+    _bornes_np: np.ndarray = field(repr=False, compare=False)
+    _notes_np: np.ndarray = field(repr=False, compare=False)
+
+    def noter(self, valeur):
+        if not est_nombre(valeur):
+            return 0
+        return self.notes[bisect_left(self.bornes, valeur)]
+
+    def noter_tableau(self, valeurs, est_valide):
+        # valeurs : tableau float (NaN = absent), est_valide : masque des valeurs numériques
+        valides = est_valide & ~np.isnan(valeurs)
+        zones = np.searchsorted(self._bornes_np, np.where(valides, valeurs, 0.0), side="left")
+        return np.where(valides, self._notes_np[zones], 0)
+
+def regle_numerique(item, bornes, notes, seuils):
+    return RegleNumerique(
+        item, tuple(bornes), tuple(notes), tuple(seuils),
+        np.array(bornes, dtype=float), np.array(notes, dtype=np.int64)
+    )
+
+@dataclass(frozen=True, slots=True)
+class RegleCategorielle:
+    item: str
+    table: dict
+
+    def noter(self, valeur):
+        try:
+            return self.table.get(valeur, 0)
+        except TypeError:
+            return 0
+
+    def noter_serie(self, serie):
+        return serie.map(self.table).fillna(0).to_numpy(dtype=np.int64)
+
+@dataclass(frozen=True, slots=True)
+class RegleCombinee:
+    # Score combiné GO/NOGO : note lue selon le nombre de composantes dans leur cible
+    item: str
+    composantes: tuple
+    cibles: tuple
+    notes: tuple
+
+    def noter(self, *valeurs):
+        if not all(est_nombre(valeur) for valeur in valeurs):
+            return 0
+        return self.notes[sum(valeur <= cible for valeur, cible in zip(valeurs, self.cibles))]
+
+    def noter_tableaux(self, colonnes):
+        # colonnes : [(valeurs, est_valide)] dans l'ordre des composantes
+        presents = np.ones(len(colonnes[0][0]), dtype=bool)
+        dans_cible = np.zeros(len(colonnes[0][0]), dtype=np.int64)
+        for (valeurs, est_valide), cible in zip(colonnes, self.cibles):
+            presents &= est_valide & ~np.isnan(valeurs)
+            dans_cible += np.where(presents, valeurs, np.inf) <= cible
+        return np.where(presents, np.array(self.notes, dtype=np.int64)[dans_cible], 0)
+
+def _entiers(texte, item, colonne):
+    try:
+        return [int(x) for x in str(texte).split(";") if x.strip() != ""]
+    except ValueError:
+        raise ValueError(f"Configuration des items : colonne {colonne} invalide pour l'item {item} : {texte!r}")
+
+def compiler_regle(ligne):
+    item = ligne["Item"].strip()
+    notes = _entiers(ligne["Notes"], item, "Notes")
+    if not notes:
+        return None
+
+    options = [opt.strip() for opt in str(ligne["Options"]).split(";") if opt.strip()]
+    if options:
+        if len(options) != len(notes):
+            raise ValueError(f"Configuration des items : {item} a {len(options)} options mais {len(notes)} notes")
+        return RegleCategorielle(item, dict(zip(options, notes)))
+
+    bornes, seuils = lire_seuils(ligne["Seuils"], item)
+    if len(notes) != len(bornes) + 1:
+        raise ValueError(f"Configuration des items : {item} a {len(bornes)} seuils, {len(bornes) + 1} notes attendues (trouvé {len(notes)})")
+    return regle_numerique(item, bornes, notes, seuils)
+
+@lru_cache(maxsize=4)
+def regles_notation(fichier=FICHIER_ITEMS):
+    regles = {}
+    for _, ligne in lire_config_items(fichier).iterrows():
+        regle = compiler_regle(ligne)
+        if regle is not None:
+            regles[regle.item] = regle
+    return regles
+
+@lru_cache(maxsize=4)
+def regle_go_nogo(fichier=FICHIER_ITEMS):
+    lignes = lire_config_items(fichier).set_index("Item")
+    regles = regles_notation(fichier)
+    cibles = []
+    for item in COMPOSANTES_GO_NOGO:
+        regle = regles.get(item)
+        texte = str(lignes["Cible"].get(item, "")).strip() if item in lignes.index else ""
+        cible = lire_seuils(texte, item)[0]
+        if not isinstance(regle, RegleNumerique) or len(cible) != 1 or cible[0] not in regle.bornes:
+            raise ValueError(f"Configuration des items : la cible GO/NOGO de {item} doit être un de ses seuils (trouvé {texte!r})")
+        cibles.append(cible[0])
+    return RegleCombinee("GO_NOGO", COMPOSANTES_GO_NOGO, tuple(cibles), NOTES_GO_NOGO)
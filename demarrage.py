@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# --- Démarrage à froid ---
+# Les modules lourds (matplotlib, pile Google, xlsxwriter, qrcode) ne sont importés
+# que par les chemins qui s'en servent. Au premier rendu, un thread de fond les
+# charge quand même, avec les caches (schéma du formulaire, base locale, polices),
+# pour que la première sauvegarde ou la page « Données » ne paie pas ce coût.
+# Profilage : OPTIMEYES_PROFIL_DEMARRAGE=1 streamlit run demo_vivatech.py
+# (durées des imports, du premier rendu et du préchauffage, dans la console et la barre latérale),
+# ou, hors Streamlit : python -m demarrage (import à froid de chaque module, un processus chacun).
+
+VARIABLE_PROFIL = "OPTIMEYES_PROFIL_DEMARRAGE"
+MODULES_APPLICATION = [
+    "streamlit", "pandas", "numpy", "configuration", "profilage", "quantiles", "graphiques",
+    "drive", "stockage", "base_donnees", "exports", "file_ecriture", "passeports", "badges",
+]
+MODULES_DIFFERES = ["matplotlib.figure", "googleapiclient.discovery", "xlsxwriter", "qrcode", "PIL.Image"]
+
+_mesures = {}
+_verrou = threading.Lock()
+_thread = None
+
+def profil_actif():
+    return os.environ.get(VARIABLE_PROFIL, "").strip() not in ("", "0")
+
+def mesurer(etape, debut):
+    # Première mesure seulement : les reruns suivants ne la remplacent pas
+    with _verrou:
+        _mesures.setdefault(etape, time.perf_counter() - debut)
+
+def mesures():
+    with _verrou:
+        return dict(_mesures)
+
+def rapport():
+    return "\n".join(f"{etape:<40} {duree * 1000:8.1f} ms" for etape, duree in mesures().items())
+
+def _prechauffer(taches):
+    for nom, tache in taches:
+        debut = time.perf_counter()
+        try:
+            tache()
+        except Exception as e:
+            print(f"⚠️ Préchauffage {nom} échoué : {e}")
+            continue
+        mesurer(f"préchauffage : {nom}", debut)
+    if profil_actif():
+        print(f"⏱️ Démarrage\n{rapport()}")
+
+def prechauffer(taches):
+    # taches : [(nom, fonction)] ; un seul thread par processus
+    global _thread
+    with _verrou:
+        if _thread is None:
+            _thread = threading.Thread(target=_prechauffer, args=(list(taches),), name="prechauffage", daemon=True)
+            _thread.start()
+        return _thread
+
+# --- Import à froid de chaque module (processus neuf, python -X importtime) ---
+def duree_import(module):
+    sortie = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if sortie.returncode:
+        return None
+    for ligne in reversed(sortie.stderr.splitlines()):
+        colonnes = ligne.split("|")
+        if len(colonnes) == 3 and colonnes[2].strip() == module:
+            return int(colonnes[1]) / 1e6
+    return None
+
+def main():
+    for module in MODULES_APPLICATION + MODULES_DIFFERES:
+        duree = duree_import(module)
+        print(f"{module:<30} {'échec' if duree is None else f'{duree * 1000:8.1f} ms'}"
+              + ("  (différé)" if module in MODULES_DIFFERES else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
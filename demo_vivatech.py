@@ -1,27 +1,39 @@
+import time
+DEBUT_SCRIPT = time.perf_counter()
+
+import importlib
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import qrcode
-import numpy as np
-from io import BytesIO
-import plotly.graph_objects as go
 import uuid
-import os
-import json
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-
-credentials_dict = st.secrets["google"]
-creds = service_account.Credentials.from_service_account_info(credentials_dict)
-FICHIER_ID_DRIVE = "162CoThxy9GcuJIWLB_jcpGxXBWsUz7UD"
-NOM_TEMP = "data_optimeyes_temp.xlsx"
-URL_BASE = "https://optimeyes-resultats.streamlit.app"
+from datetime import datetime, timedelta
+from configuration import FICHIER_ITEMS, regles_notation, schema_formulaire
+from profilage import noter, scorer_profil, scorer_profil_batch, resultat_depuis_batch, version_modele
+from graphiques import afficher_radar, afficher_jauge, prerendre, prechauffer_matplotlib
+from drive import FICHIER_ID_DRIVE, prechauffer_google
+from stockage import BackendLocal, BackendDrive, creer_journal, COLONNE_ID
+from base_donnees import BaseDonnees, FICHIER_BASE
+from exports import CacheExports
+from file_ecriture import FileEcriture
+from passeports import DepotPasseports, DOSSIER_PASSEPORTS
+from badges import StockQR, generer_url_id, url_passeport
+from traces import etape, trace
+from demarrage import MODULES_DIFFERES, mesurer, prechauffer, profil_actif, rapport
+from memoire import controler_session
+from quantiles import lire_position
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+mesurer("imports", DEBUT_SCRIPT)
 
-FICHIER_ITEMS = "Vivatech_Optimeyes.csv"
-FICHIER_SORTIE = "donnees_patients.xlsx"
+NOM_TEMP = "data_optimeyes_temp.xlsx"
+FICHIER_LOGO = "optimeyes_logo_black.png"
+
+FICHIER_SORTIE = "donnees_patients.xlsx"  # ancien stockage, repris une fois dans la base
+DOSSIER_EXPORTS = "exports_excel"
+TAILLES_PAGE = [25, 50, 100, 200]
+COLONNE_SELECTION = "✅ Sélectionner"
+ANALYSES_PAR_LOT = 10
+DOSSIER_SEGMENTS = "segments_patients"
+DOSSIER_FILE_DRIVE = "file_attente_drive"
 FEUILLE_ITEMS = "Sheet1"
-COLONNE_ITEMS = "Item"
 
 def afficher_footer_optimeyes():
     st.markdown("""
@@ -38,241 +50,120 @@ def afficher_footer_optimeyes():
     </div>
     """, unsafe_allow_html=True)
 
-# --- Connexion Drive via secrets Streamlit ---
-def connect_drive():
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["google"],
-        scopes=["https://www.googleapis.com/auth/drive"]
-    )
-    return build("drive", "v3", credentials=creds)
-
-# --- Télécharger fichier Excel depuis Drive ---
-def telecharger_fichier_excel():
-    service = connect_drive()
-    request = service.files().get_media(fileId=FICHIER_ID_DRIVE)
-    buffer = BytesIO()
-    downloader = MediaIoBaseDownload(buffer, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    buffer.seek(0)
-    return pd.read_excel(buffer)
-
-# --- Sauvegarder fichier Excel vers Drive ---
-def ecraser_fichier_excel(df):
-    service = connect_drive()
-
-    chemin_temp = "/tmp/data_optimeyes_temp.xlsx"
-    df.to_excel(chemin_temp, index=False)
-
-    media = MediaFileUpload(
-        chemin_temp,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        resumable=True
-    )
+@st.cache_resource
+def logo():
+    with open(FICHIER_LOGO, "rb") as f:
+        return f.read()
+
+# --- Base locale (SQLite) + journal Drive ---
+@st.cache_resource
+def base_locale():
+    base = BaseDonnees(FICHIER_BASE)
+    base.importer(creer_journal(BackendLocal(FICHIER_SORTIE, DOSSIER_SEGMENTS)))
+    return base
+
+@st.cache_resource
+def cache_exports():
+    return CacheExports(DOSSIER_EXPORTS)
+
+@st.cache_resource
+def journal_drive():
+    return creer_journal(BackendDrive(FICHIER_ID_DRIVE))
+
+# --- Passeports pré-calculés (local à l'enregistrement, Drive en différé) ---
+@st.cache_resource
+def depot_passeports():
+    return DepotPasseports(DOSSIER_PASSEPORTS, [BackendDrive(FICHIER_ID_DRIVE)], base_locale().percentile)
+
+@trace("drive.envoi")
+def envoyer_drive(lignes):
+    depot_passeports().publier(lignes)
+    journal_drive().ajouter(lignes)
+
+# --- File d'envoi différé vers Drive (journal disque + thread de fond) ---
+@st.cache_resource
+def file_drive():
+    return FileEcriture(DOSSIER_FILE_DRIVE, envoyer_drive).demarrer()
+
+# --- QR codes : images pré-rendues des badges (python -m badges), sinon rendues à la volée ---
+@st.cache_resource
+def stock_qr():
+    return StockQR()
+
+def attribuer_url_id(badge=""):
+    # Badge pré-imprimé remis au participant, sinon premier identifiant libre du lot
+    badge = badge.strip()
+    url_id = base_locale().attribuer_url_id(badge) if badge else None
+    if badge and url_id is None:
+        st.warning(f"Badge `{badge}` inconnu ou déjà utilisé : un autre identifiant est attribué.")
+    return url_id or base_locale().attribuer_url_id() or generer_url_id()
 
-    try:
-        service.files().update(
-            fileId=FICHIER_ID_DRIVE,
-            media_body=media
-        ).execute()
-        print("✅ Fichier mis à jour sur Google Drive.")
-    except Exception as e:
-        st.error("❌ Échec de la mise à jour du fichier sur Drive.")
-        st.exception(e)
-
-
-# --- Générer un QR code vers le lien personnalisé ---
-def generer_qr_code(code_sujet):
-    url = f"{URL_BASE}?id={code_sujet}"
-    qr = qrcode.make(url)
-    buffer = BytesIO()
-    qr.save(buffer, format="PNG")
-    buffer.seek(0)
-    return buffer, url
-
-# --- Ajout de ligne + génération URL ---
-def enregistrer_et_partager(donnees):
-    code_sujet = str(uuid.uuid4())[:8]
-    donnees["Code_Sujet"] = code_sujet
-
-    try:
-        df = telecharger_fichier_excel()
-    except:
-        df = pd.DataFrame()
-
-    df_new = pd.concat([df, pd.DataFrame([donnees])], ignore_index=True)
-    ecraser_fichier_excel(df_new)
-    return code_sujet
-
-# --- PARAMETRES ---
-
-commentaires_indicateurs = {
-    "Decision_Visuelle": {
-        3: "Décision très rapide, excellente réactivité.",
-        2: "Décision de vitesse moyenne, correcte dans l’ensemble.",
-        1: "Décision lente, réactivité diminuée.",
-        0: "Donnée absente ou non interprétable sur la capacité décisionnelle.",
-    },
-    "Fatigue_Visuelle": {
-        3: "Très faible fatigue visuelle ressentie.",
-        2: "Fatigue visuelle modérée.",
-        1: "Fatigue visuelle importante signalée.",
-        0: "Fatigue visuelle non renseignée ou incohérente.",
-    },
-    "Sensibilite_Lumineuse": {
-        3: "Aucune sensibilité à la lumière signalée.",
-        2: "Sensibilité occasionnelle à la lumière.",
-        1: "Sensibilité marquée à la lumière.",
-        0: "Aucune donnée disponible sur la sensibilité lumineuse.",
-    },
-    "Vision_Peri": {
-        3: "Vision périphérique jugée bonne.",
-        2: "Vision périphérique moyenne.",
-        1: "Vision périphérique faible.",
-        0: "Évaluation périphérique non renseignée ou invalide.",
-    },
-    "Confort_Visuel": {
-        3: "Très bon confort visuel perçu.",
-        2: "Confort visuel acceptable.",
-        1: "Confort visuel faible ou inconfort.",
-        0: "Absence de réponse sur le confort visuel.",
-    },
-    "Vitesse_Horizontale": {
-        3: "Excellente vitesse visuelle horizontale.",
-        2: "Vitesse correcte avec marge de progression.",
-        1: "Vitesse visuelle lente ou perturbée.",
-        0: "Mesure horizontale non disponible ou inexploitée.",
-    },
-    "Vitesse_Verticale": {
-        3: "Très bonne vitesse visuelle verticale.",
-        2: "Vitesse verticale modérée.",
-        1: "Réduction marquée de la vitesse verticale.",
-        0: "Vitesse verticale non mesurée ou invalide.",
-    },
-    "Vision_Faible_Contraste": {
-        3: "Aucune difficulté détectée en faible contraste.",
-        2: "Légère difficulté avec les contrastes faibles.",
-        1: "Difficulté importante à détecter les faibles contrastes.",
-        0: "Aucune donnée exploitable sur la vision en faible contraste.",
-    },
-    "Stereopsie": {
-        3: "Excellente perception 3D (stéréopsie).",
-        2: "Perception 3D correcte.",
-        1: "Perception 3D altérée ou lente.",
-        0: "Données aberrantes ou interprétation non fiable.",
-    },
-    "GO_NOGO": {
-        3: "Très bon contrôle décisionnel (go/no-go).",
-        2: "Contrôle correct avec vigilance.",
-        1: "Décisions impulsives ou lenteur observée.",
-        0: "Go/No-Go non calculable (valeurs manquantes).",
-    },
-    "GO": {
-        3: "Temps de réaction très rapide.",
-        2: "Temps de réaction correct, mais améliorable.",
-        1: "Temps de réaction lent ou erratique.",
-        0: "Temps de réaction non mesuré.",
-    },
-    "NOGO": {
-        3: "Très bon contrôle inhibiteur (très peu d'erreurs).",
-        2: "Contrôle correct avec quelques erreurs.",
-        1: "Impulsivité marquée ou erreurs fréquentes.",
-        0: "Donnée inhibitrice absente ou invalide.",
-    }
-}
+# --- AFFICHAGE DES RESULTATS --- #
 
-def commenter_indicateur(variable, score):
-    return commentaires_indicateurs.get(variable, {}).get(score, "")
+# Couleurs des zones de jauge selon la note obtenue dans la zone
+COULEURS_NOTES = {
+    3: "#66ccaa",   # vert doux
+    2: "#ffd580",   # beige doré
+    1: "#ff9c8a",   # corail
+    0: "#ff9c8a",
+}
 
-# --- RADARS --- #
+# Position dans la cohorte, lue dans les esquisses de quantiles de la base locale
+def texte_percentile(indicateur, valeur, tranche=None):
+    base = base_locale()
+    cohorte = base.percentile(indicateur, valeur)
+    if cohorte is None:
+        return ""
+    texte = f"📊 {lire_position(indicateur, cohorte[0])} des {cohorte[1]} participants testés"
+    par_tranche = base.percentile(indicateur, valeur, tranche) if isinstance(tranche, str) and tranche else None
+    if par_tranche is not None:
+        texte += f" — {lire_position(indicateur, par_tranche[0])} dans la tranche « {tranche} »"
+    return texte
+
+# Jauges d'un individu : [(indicateur, valeur, min, max, bornes, couleurs)] dans l'ordre d'affichage
+def jauges_individu(formulaire, form_data):
+    indicateurs_jauge = [
+        "Vitesse_Horizontale",
+        "Vitesse_Verticale",
+        "GO",
+        "NOGO",
+        "Stereopsie",
+        "Vision_Faible_Contraste"
+    ]
 
-def afficher_radar(valeurs, taille=(4, 4), titre=None, sauvegarder=False, nom_fichier="radar.png"):
-    couleurs_profils = {
-        "Athlète": "#90CBC1",
-        "Pilote": "#A5B4DC",
-        "E-sportif": "#D8A5B8",
-        "Performer cognitif": "#B6A49C"
+    donnees_individu = {
+        item: float(form_data[item])
+        for item in indicateurs_jauge
+        if item in form_data and str(form_data[item]).strip() != ""
     }
 
-    labels = list(valeurs.keys())
-    donnees = list(valeurs.values())
-    donnees += donnees[:1]  
-
-    angles = [n / float(len(labels)) * 2 * np.pi for n in range(len(labels))]
-    angles += angles[:1]
-
-    fig, ax = plt.subplots(figsize=taille, subplot_kw=dict(polar=True))
-    fig.patch.set_facecolor('#cccaca')  # fond gris clair
-
-    # Courbe principale
-    ax.plot(angles, donnees, linewidth=2, color='#444')
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels(labels)
-
-    # Colorier chaque secteur selon sa couleur de profil
-    for i in range(len(labels)):
-        angle0 = angles[i]
-        angle1 = angles[i + 1]
-        r = [0, donnees[i], donnees[i+1], 0]
-        theta = [angle0, angle0, angle1, angle1]
-
-        ax.fill(theta, r, color=couleurs_profils.get(labels[i], "#999"), alpha=0.25, linewidth=0)
-
-    # Ajouter le titre si fourni
-    if titre:
-        ax.set_title(titre, fontsize=12, pad=20)
-
-    st.pyplot(fig)
-
-# --- GENERATION HTML --- #
-
-
-# --- GRAPHIQUES INDIVIDUELS --- #
-
-def plot_jauge_multizone(nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None):
-    # Couleurs par défaut (si aucune spécifique n’est fournie)
-    default_colors = ["#ff4d4d", "#ff944d", "#ffd633", "#4caf50", "#2196f3", "#9c27b0"]
-    couleurs = custom_colors if custom_colors else default_colors
-
-    try:
-        bornes = sorted([float(b) for b in bornes_abs if str(b).strip() != ""])
-    except:
-        bornes = []
-
-    bornes = [min_val] + bornes + [max_val]
-    zones = list(zip(bornes[:-1], bornes[1:]))
-
-    fig, ax = plt.subplots(figsize=(5, 0.6))
-    fig.patch.set_facecolor('#cccaca')  # Fond global du graphique
-    ax.set_facecolor('#e0e0e0')         # Fond de la jauge (zone d’affichage)
-
-    for i, (start, end) in enumerate(zones):
-        color = couleurs[i] if i < len(couleurs) else "#cccccc"
-        ax.barh(0, end - start, left=start, color=color, edgecolor="white")
-
-    ax.axvline(valeur, color="#004080", linewidth=1)
-    ax.text(
-        valeur, -0.6,  # position (x, y), y en dessous de la barre horizontale
-        f"{valeur:.0f}",  # texte affiché (arrondi entier)
-        ha='center',
-        va='top',
-        fontsize=11,
-        color="#004080",
-        fontweight='bold'
-    )
-    ax.set_xlim(min_val, max_val)
-    ax.set_yticks([])
-    ax.set_xticks([min_val, max_val])
-    ax.set_title(nom, fontsize=13, loc='left')
-    for spine in ax.spines.values():
-        spine.set_visible(False)
-
-    return fig
-    
-# --- AFFICHAGE DES RESULTATS --- #
-
-def afficher_resultats_complets(resultat, df_config, form_data):
+    jauges = []
+    for indicateur, valeur in donnees_individu.items():
+        if indicateur == "Stereopsie" and not form_data.get("Stereopsie_activee", True):
+            continue
+        champ = formulaire.champ(indicateur)
+        min_val, max_val = (champ.min, champ.max) if champ is not None else (0, 100)
+        bornes = list(champ.bornes) if champ is not None else []
+
+        # Zones et couleurs issues de la même table que la notation
+        regle = regles_notation().get(indicateur)
+        if regle is not None and hasattr(regle, "bornes"):
+            bornes = list(regle.bornes)
+            couleurs = [COULEURS_NOTES.get(note, "#cccccc") for note in regle.notes]
+        else:
+            couleurs = None
+        jauges.append((indicateur, valeur, min_val, max_val, bornes, couleurs))
+    return jauges
+
+# Figures d'un individu, pour le pré-rendu parallèle (graphiques.prerendre)
+def demandes_figures(resultat, formulaire, form_data):
+    demandes = [("radar", (resultat["scores"], (4, 4), "")), ("radar", (resultat["radar_analytique"], (4, 4), ""))]
+    for indicateur, valeur, min_val, max_val, bornes, couleurs in jauges_individu(formulaire, form_data):
+        if indicateur != "Vision_Faible_Contraste":
+            demandes.append(("jauge", (indicateur, valeur, min_val, max_val, bornes, couleurs, (5, 0.6))))
+    return demandes
+
+def afficher_resultats_complets(resultat, formulaire, form_data):
     with st.container():
         col1, col2 = st.columns(2)
 
@@ -298,6 +189,10 @@ def afficher_resultats_complets(resultat, df_config, form_data):
                 unsafe_allow_html=True
             )
 
+    cohorte = texte_percentile("Score_Global", resultat["score_global"], form_data.get("Age"))
+    if cohorte:
+        st.caption(f"Score global : {cohorte}")
+
     # Bloc de cohérence
     couleur_coherence = {
         "Très bonne": "#66ff99",
@@ -395,64 +290,12 @@ def afficher_resultats_complets(resultat, df_config, form_data):
     
     st.subheader("📏 Jauges de performance")
 
-    indicateurs_jauge = [
-        "Vitesse_Horizontale",
-        "Vitesse_Verticale",
-        "GO",
-        "NOGO",
-        "Stereopsie",
-        "Vision_Faible_Contraste"
-    ]
-
-    donnees_individu = {
-        item: float(form_data[item])
-        for item in indicateurs_jauge
-        if item in form_data and str(form_data[item]).strip() != ""
-    }
-
-    seuils_reference = {
-        row["Item"]: {
-            "min": float(row["Min"]),
-            "max": float(row["Max"]),
-            "borne1": row["Borne1"],
-            "borne2": row["Borne2"],
-            "borne3": row["Borne3"],
-            "borne4": row["Borne4"]
-        }
-        for _, row in df_config.iterrows()
-        if row["Item"] in indicateurs_jauge and str(row["Min"]).strip() and str(row["Max"]).strip()
-    }
-
     col1, col2 = st.columns(2)
     compteur_affiches = 0  # compteur pour alterner proprement les colonnes
     
-    for indicateur in donnees_individu:
-        if indicateur == "Stereopsie" and not form_data.get("Stereopsie_activee", True):
-            continue
-    
-        valeur = donnees_individu[indicateur]
-        seuils = seuils_reference.get(indicateur, {"min": 0, "max": 100})
-        bornes = [seuils.get(f"borne{i}") for i in range(1, 5)]
-    
-        # Couleurs adaptées
-        great = "#66ccaa"     # vert doux
-        good = "#b5d991"      # vert-jaune doux
-        average = "#ffd580"   # beige doré
-        bad = "#ff9c8a"       # corail
-        worst = "#d66a6a"     # rouge doux
-    
-        if indicateur == "Stereopsie":
-            couleurs = [bad, great, average, bad]
-        elif indicateur == "Vitesse_Horizontale":
-            couleurs = [bad, average, great, average, bad]
-        elif indicateur == "Vitesse_Verticale":
-            couleurs = [bad, average, great]
-        elif indicateur == "GO":
-            couleurs = [great, average, bad]
-        elif indicateur == "NOGO":
-            couleurs = [great, bad]
-        elif indicateur == "Vision_Faible_Contraste":
-            if valeur == 0:
+    for indicateur, valeur, min_val, max_val, bornes, couleurs in jauges_individu(formulaire, form_data):
+        if indicateur == "Vision_Faible_Contraste":
+            if noter(indicateur, valeur) == 3:
                 badge = "🟢 Bonne vision faible contraste"
                 message = "Aucune difficulté détectée en faible contraste."
                 couleur_fond = "#1e5631"
@@ -474,24 +317,23 @@ def afficher_resultats_complets(resultat, df_config, form_data):
                 )
             compteur_affiches += 1
             continue
-        else:
-            couleurs = None
-    
-        fig = plot_jauge_multizone(
-            nom=indicateur,
-            valeur=valeur,
-            min_val=seuils["min"],
-            max_val=seuils["max"],
-            bornes_abs=bornes,
-            custom_colors=couleurs
-        )
-    
+
         col = col1 if compteur_affiches % 2 == 0 else col2
         with col:
-            st.pyplot(fig)
+            afficher_jauge(
+                nom=indicateur,
+                valeur=valeur,
+                min_val=min_val,
+                max_val=max_val,
+                bornes_abs=bornes,
+                custom_colors=couleurs
+            )
             commentaire = resultat["commentaires"].get(indicateur, "")
             if commentaire:
                 st.markdown(f"<span style='font-size: 0.9em; color: grey;'>{commentaire}</span>", unsafe_allow_html=True)
+            cohorte = texte_percentile(indicateur, valeur, form_data.get("Age"))
+            if cohorte:
+                st.caption(cohorte)
         compteur_affiches += 1
         
         # --- Résumé des données saisies ---
@@ -515,183 +357,8 @@ def afficher_resultats_complets(resultat, df_config, form_data):
         st.info("Aucune donnée saisie à afficher.")
 
 # --- DEMARRAGE --- #
-@st.cache_data
-def charger_config_formulaire():
-    df_items = pd.read_csv(FICHIER_ITEMS, sep=";",  encoding="utf-8", engine="python")
-    df_items.columns = [str(col).strip().capitalize() for col in df_items.columns]
-
-    df_items["Page"] = pd.to_numeric(df_items["Page"], errors="coerce").fillna(0).astype(int)
-
-    colonnes_attendues = ["Item", "Description", "Type", "Décimales", "Unité", "Options", "Min", "Max", "Default", "Step", "Borne1", "Borne2", "Borne3", "Borne4", "Bulle1", "Bulle2", "Question", "Page"]
-    for col in colonnes_attendues:
-        if col not in df_items.columns:
-            df_items[col] = ""
-    df_items = df_items[colonnes_attendues].fillna("")
-    df_items = df_items[df_items["Item"].str.strip() != ""]
-    return df_items
-
-# Fonction de notation selon les valeurs observées
-def noter(variable, valeur):
-    if variable == "Decision_Visuelle":
-        return 3 if valeur == "Rapide" else 2 if valeur == "Moyenne" else 1 if valeur == "Lente" else 0
-    if variable == "Sensibilite_Lumineuse":
-        return 3 if valeur == "Non" else 2 if valeur == "Parfois" else 1 if valeur == "Oui" else 0
-    if variable == "Vision_Peri":
-        return 3 if valeur == "Bon" else 2 if valeur == "Moyen" else 1 if valeur == "Faible" else 0
-    if variable == "Vitesse_Horizontale" and isinstance(valeur, (int, float)):
-        return 3 if 501 <= valeur <= 700 else 2 if (451 <= valeur <= 500 or 701 <= valeur <= 850) else 1 if valeur <= 450 or valeur > 850 else 0
-    if variable == "Vitesse_Verticale" and isinstance(valeur, (int, float)):
-        return 1 if valeur <= 300 else 2 if valeur <= 399 else 3 if valeur <= 9999 else 0
-    if variable == "Vision_Faible_Contraste" and isinstance(valeur, (int, float)):
-        return 3 if valeur == 0 else 1 if valeur > 0 else 0
-    if variable == "Fatigue_Visuelle" and isinstance(valeur, (int, float)):
-        return 1 if 8 <= valeur <= 10 else 2 if 4 <= valeur <= 7 else 3 if 1 <= valeur <= 3 else 0
-    if variable == "Confort_Visuel" and isinstance(valeur, (int, float)):
-        return 3 if 8 <= valeur <= 10 else 2 if 4 <= valeur <= 7 else 1 if 1 <= valeur <= 3 else 0
-    if variable == "GO" and isinstance(valeur, (int, float)):
-        return 3 if valeur <= 500 else 2 if valeur <= 700 else 1
-    if variable == "NOGO" and isinstance(valeur, (int, float)):
-        return 3 if valeur <= 5 else 2 if valeur <= 15 else 1
-    if variable == "Stereopsie" and isinstance(valeur, (int, float)):
-        return 3 if 30 <= valeur <= 60 else 2 if 61<= valeur <= 120 else 1 if valeur >= 121 else 0
-    return 0
-    
-# --- DIVERS --- #
-
-def noter_go_nogo(go, nogo):
-    if go <= 500 and nogo <= 10:
-        return 3
-    elif go <= 500 and nogo > 10:
-        return 2
-    elif go > 500 and nogo <= 10:
-        return 2
-    else:
-        return 1
-        
-# --- PROFILING PONDÉRÉ ---
-def scorer_profil(d):
-    
-    # --- Partie 1 : Scores objectifs (avec pondération de GO_NOGO) ---
-    go = d.get("GO")
-    nogo = d.get("NOGO")
-    go_nogo_score = noter_go_nogo(go, nogo) if go is not None and nogo is not None else 0
-
-    stereopsie_activee = d.get("Stereopsie_activee", True)
-
-    indicateurs_subjectifs = [
-        "Decision_Visuelle", "Fatigue_Visuelle",
-        "Sensibilite_Lumineuse", "Vision_Peri", "Confort_Visuel"
-    ]
-    score_subjectif_total = sum([noter(var, d.get(var, 0)) for var in indicateurs_subjectifs])
-    indice_subjectif = round((score_subjectif_total / (3 * len(indicateurs_subjectifs))) * 100, 1)
-
-    indicateurs_perf = ["Vitesse_Horizontale", "Vitesse_Verticale", "Vision_Faible_Contraste"]
-    if stereopsie_activee:
-        indicateurs_perf.append("Stereopsie")
-
-    score_perf_total = sum([noter(var, d.get(var, 0)) for var in indicateurs_perf]) + (2 * go_nogo_score)
-    total_points_theoriques = (len(indicateurs_perf) + 2) * 3
-    indice_performance = round((score_perf_total / total_points_theoriques) * 100, 1)
-
-    poids_subjectif = 0.4
-    amplification = min(abs(indice_subjectif - indice_performance) / 100, 0.6)
-    poids_performance = 1.0 - poids_subjectif + amplification
-    poids_total = poids_subjectif + poids_performance
-    poids_subjectif /= poids_total
-    poids_performance /= poids_total
-    score_global = round(poids_subjectif * indice_subjectif + poids_performance * indice_performance, 1)
-
-    poids = {
-        "Athlète": {
-            "GO_NOGO": 2,
-            "Vitesse_Horizontale": 2,
-            "Vitesse_Verticale": 2,
-            "Vision_Faible_Contraste": 1,
-            "Stereopsie": 3,
-        },
-        "Pilote": {
-            "GO_NOGO": 2,
-            "Vitesse_Horizontale": 1,
-            "Vitesse_Verticale": 1,
-            "Vision_Faible_Contraste": 1,
-            "Stereopsie": 2
-        },
-        "E-sportif": {
-            "GO_NOGO": 2,
-            "Vitesse_Horizontale": 4,
-            "Vitesse_Verticale": 4,
-            "Vision_Faible_Contraste": 1,
-            "Stereopsie": 2
-        },
-        "Performer cognitif": {
-            "GO_NOGO": 2,
-            "Vitesse_Horizontale": 1,
-            "Vitesse_Verticale": 1,
-            "Vision_Faible_Contraste": 4,
-            "Stereopsie": 1
-        }
-    }
-
-    scores = {}
-
-    for profil, variables in poids.items():
-        score = 0
-        total_poids = 0
-        for var, p in variables.items():
-            if var == "Stereopsie" and not stereopsie_activee:
-                continue
-            valeur = go_nogo_score if var == "GO_NOGO" else d.get(var, 0)
-            score += noter(var, valeur) * p
-            total_poids += p
-        scores[profil] = round((score / (3 * total_poids)) * 100, 1) if total_poids else 0
-
-    profil_dominant = max(scores, key=scores.get)
-    score_profil_dominant = scores[profil_dominant]
-
-    ecart = abs(indice_subjectif - indice_performance)
-    coherence = (
-        "Très bonne" if ecart < 10 else
-        "Moyenne" if ecart < 25 else
-        "Faible"
-    )
-    alerte_discordance = ecart >= 25
-    
-    # --- Partie 4 : Score radar analytique (5 axes) ---
-    radar_analytique = {
-        "Vitesse visuelle": round((noter("Vitesse_Horizontale", d.get("Vitesse_Horizontale", 0)) + noter("Vitesse_Verticale", d.get("Vitesse_Verticale", 0))) / 2 * 33.33, 1),
-        "Résolution spatiale": round((noter("Vision_Faible_Contraste", d.get("Vision_Faible_Contraste", 0)) + (noter("Stereopsie", d.get("Stereopsie", 0)) if stereopsie_activee else 0)) / (2 if stereopsie_activee else 1) * 33.33, 1),
-        "Attention périphérique": round(noter("Vision_Peri", d.get("Vision_Peri", 0)) * 33.33, 1),
-        "Engagement décisionnel": round((go_nogo_score + noter("Decision_Visuelle", d.get("Decision_Visuelle", 0))) / 2 * 33.33, 1),
-        "Surcharge visuelle perçue": round((noter("Fatigue_Visuelle", d.get("Fatigue_Visuelle", 0)) + noter("Sensibilite_Lumineuse", d.get("Sensibilite_Lumineuse", 0))) / 2 * 33.33, 1)
-    }
-    
-    # --- Partie 5 : Commentaires par indicateur ---
-    commentaires = {}
-    for var in indicateurs_subjectifs + indicateurs_perf:
-        if var == "Stereopsie" and not stereopsie_activee:
-            continue
-        score = noter(var, d.get(var, 0))
-        commentaires[var] = commentaires_indicateurs.get(var, {}).get(score, "Interprétation non disponible.")
-    commentaires["GO_NOGO"] = commentaires_indicateurs.get("GO_NOGO", {}).get(go_nogo_score, "Interprétation non disponible.")
-    commentaires["GO"] = commentaires_indicateurs.get("GO", {}).get(noter("GO", go), "Interprétation non disponible.")
-    commentaires["NOGO"] = commentaires_indicateurs.get("NOGO", {}).get(noter("NOGO", nogo), "Interprétation non disponible.")
-    # GO/NOGO séparément car combiné
-
-    return {
-        "profil": profil_dominant,
-        "scores": scores,
-        "score_profil_dominant": score_profil_dominant,
-        "indice_subjectif": indice_subjectif,
-        "indice_performance": indice_performance,
-        "score_global": score_global,
-        "coherence": coherence,
-        "radar_analytique": radar_analytique,
-        "alerte_discordance": alerte_discordance,
-        "commentaires": commentaires
-    }
-
 def afficher_page_formulaire():
-    df_config = charger_config_formulaire()
+    formulaire = schema_formulaire(FICHIER_ITEMS)
 
     if "page" not in st.session_state:
         st.session_state.page = 0
@@ -700,7 +367,7 @@ def afficher_page_formulaire():
 
     page = st.session_state.page
 
-    st.image("optimeyes_logo_black.png", width=600)
+    st.image(logo(), width=600)
     st.subheader("Évaluation Visuo-Cognitive")
     
     with st.container():
@@ -775,81 +442,40 @@ def afficher_page_formulaire():
     
         with st.form("formulaire_saisie"):
             saisie = {}
-            page_config = df_config[df_config["Page"] == (1 if page == 0.3 else 2)]
+            for champ in formulaire.page(1 if page == 0.3 else 2):
+                item = champ.item
+                label = champ.label
 
-            for _, row in page_config.iterrows():
-                description = row.get("Description").strip()
-                if row.get("Question", "").strip():
-                    question = f"**{row['Question'].strip()}**"
-                    label = f"{description}\n\n{question}"
-                else:
-                    label = description
-
-                item = row[COLONNE_ITEMS]
-                type_champ = str(row["Type"]).strip().lower()
-                unite = str(row.get("Unité", "")).strip()
-                options_raw = str(row["Options"]).strip()
-
-                try:
-                    decimales = int(row["Décimales"])
-                except:
-                    decimales = 1
-                try:
-                    step = float(row["Step"])
-                except:
-                    step = 1.0
-                try:
-                    min_val = float(row["Min"])
-                except:
-                    min_val = 0.0
-                try:
-                    default = float(row["Default"])
-                except:
-                    default = 0.0
-                try:
-                    max_val = float(row["Max"])
-                except:
-                    max_val = 100.0
-
-                if default < min_val:
-                    default = min_val
-                elif default > max_val:
-                    default = max_val
-
-                options = [opt.strip() for opt in options_raw.split(";") if opt.strip()]
-
-                if type_champ == "text":
+                if champ.type == "text":
                     valeur = st.text_input(label, key=item)
 
-                elif type_champ == "slider":
-                    valeur = st.slider(label, min_value=min_val, max_value=max_val, value=default, step=step, key=item)
-                    bulle1 = str(row["Bulle1"]).strip()
-                    bulle2 = str(row["Bulle2"]).strip()
+                elif champ.type == "slider":
+                    valeur = st.slider(label, min_value=champ.min, max_value=champ.max, value=champ.defaut, step=champ.step, key=item)
+                    bulle1, bulle2 = champ.bulles
                     col_g, col_c, col_d = st.columns([2, 6, 2])
                     with col_g:
                         st.markdown(f"<span style='font-size: 0.8em;'>{bulle1}</span>", unsafe_allow_html=True)
                     with col_d:
                         st.markdown(f"<span style='font-size: 0.8em; float: right;'>{bulle2}</span>", unsafe_allow_html=True)
 
-                elif type_champ == "radio":
-                    valeur = st.radio(label, options, key=item)
+                elif champ.type == "radio":
+                    valeur = st.radio(label, champ.options, key=item)
 
-                elif type_champ == "select":
-                    valeur = st.selectbox(label, options, key=item)
+                elif champ.type == "select":
+                    valeur = st.selectbox(label, champ.options, key=item)
 
-                elif type_champ == "multiselect":
-                    valeur = st.multiselect(label, options, key=item)
+                elif champ.type == "multiselect":
+                    valeur = st.multiselect(label, champ.options, key=item)
 
-                elif type_champ in ["bool", "checkbox"]:
+                elif champ.type in ["bool", "checkbox"]:
                     valeur = st.checkbox(label, key=item)
 
                 else:
-                    format_str = f"%.{decimales}f"
                     col1, col2 = st.columns([4, 1])
                     with col1:
-                        valeur = st.number_input(label, value=default, format=format_str, step=step, min_value=min_val, max_value=max_val, key=item)
+                        valeur = st.number_input(label, value=champ.defaut, format=champ.format, step=champ.step, min_value=champ.min, max_value=champ.max, key=item)
                     with col2:
-                        st.markdown(f"<div style='margin-top: 2em;'>{unite}</div>", unsafe_allow_html=True)
+                        st.markdown(f"<div style='margin-top: 2em;'>{champ.unite}</div>", unsafe_allow_html=True)
 
                 if item == "Stereopsie":
                     st.markdown("Souhaitez-vous inclure la stéréopsie dans l'analyse ?")
@@ -913,11 +539,12 @@ def afficher_page_formulaire():
 
         if not st.session_state.get("subjectif_seul", False):
             afficher_resultats_complets(
-                st.session_state["resultat"], df_config, st.session_state.form_data
+                st.session_state["resultat"], formulaire, st.session_state.form_data
             )
             st.markdown("---")            
 
         email = st.text_input("Souhaitez-vous recevoir un récapitulatif ou donner votre avis ? (e-mail facultatif)")
+        badge = st.text_input("N° du badge QR remis (facultatif)")
 
         # Enregistrer avec clique sur un bouton
         if st.button("Valider et enregistrer"):
@@ -929,14 +556,16 @@ def afficher_page_formulaire():
                 "indice_Performance": st.session_state.resultat["indice_performance"],
                 "Score_Global": st.session_state.resultat["score_global"],
                 "Coherence": st.session_state.resultat["coherence"],
-                "Radar_Analytique": st.session_state.resultat["radar_analytique"],
                 "Alerte_Discordance": st.session_state.resultat["alerte_discordance"],
                 "Subjectif_Seul" : st.session_state.get("subjectif_seul", False),
+                "Version_Modele": version_modele(),
                 "Email": email
             })
         
             for k, v in st.session_state.resultat["scores"].items():
                 donnee_complete[f"Score_{k}"] = v
+            for axe, v in st.session_state.resultat["radar_analytique"].items():
+                donnee_complete[f"Radar_{axe}"] = v
         
             # Code_Sujet : récupéré ou généré
             code_sujet = donnee_complete.get("Code_Sujet", "").strip()
@@ -945,149 +574,186 @@ def afficher_page_formulaire():
                 st.warning(f"🆕 Aucun code sujet fourni, identifiant généré automatiquement : `{code_sujet}`")
             donnee_complete["Code_Sujet"] = code_sujet
         
-            # 🔗 ID unique pour l’URL
-            url_id = str(uuid.uuid4())[:12]
+            # 🔗 ID unique pour l’URL (lot pré-attribué)
+            url_id = attribuer_url_id(badge)
             donnee_complete["Url_ID"] = url_id
         
             # Construction de l’URL personnalisée
-            url_qr = f"{URL_BASE}?id={url_id}"
-        
-            df_ligne = pd.DataFrame([donnee_complete])
+            url_qr = url_passeport(url_id)
         
-            # --- Enregistrement local ---
-            try:
-                df_exist = pd.read_excel(FICHIER_SORTIE)
-                df_new_local = pd.concat([df_exist, df_ligne], ignore_index=True)
-            except FileNotFoundError:
-                df_new_local = df_ligne
-            df_new_local.to_excel(FICHIER_SORTIE, index=False)
-        
-            # --- Enregistrement Drive ---
-            try:
-                df_drive = telecharger_fichier_excel()
-            except:
-                df_drive = pd.DataFrame()
-            df_new_drive = pd.concat([df_drive, df_ligne], ignore_index=True)
-            ecraser_fichier_excel(df_new_drive)
+            # --- Enregistrement local (une insertion SQLite), Drive en différé ---
+            donnee_complete["Id_Enregistrement"] = uuid.uuid4().hex
+            donnee_complete["Horodatage"] = datetime.now().isoformat(timespec="seconds")
+            with etape("sauvegarde"):
+                base_locale().ajouter([donnee_complete])
+                depot_passeports().ecrire(donnee_complete)
+                file_drive().ajouter(donnee_complete)
         
             # --- QR Code ---
-            qr_buffer, _ = generer_qr_code(url_id)
+            qr_png = stock_qr().contenu(url_id)
         
-            st.success("✅ Résultat enregistré (local + Drive).")
+            st.success("✅ Résultat enregistré (local, envoi Drive en cours).")
             st.markdown(f"**Lien d’accès direct aux résultats :** [🔗 {url_qr}]({url_qr})")
-            st.image(qr_buffer.getvalue(), caption="📲 Scannez ce QR code pour accéder au passeport visuel", width=200)
+            st.image(qr_png, caption="📲 Scannez ce QR code pour accéder au passeport visuel", width=200)
 
     elif page == 3:
         st.subheader("📊 Données enregistrées")
 
-        try:
-            df = pd.read_excel(FICHIER_SORTIE)
-            df.reset_index(drop=True, inplace=True)
-
-            # Ajout d'une colonne de sélection
-            df_affichage = df.copy()
-            df_affichage["✅ Sélectionner"] = False
-            
-            cols = ["✅ Sélectionner"] + [col for col in df_affichage.columns if col != "✅ Sélectionner"]
-            df_affichage = df_affichage[cols]
-
-            # Initialisation des cases si non déjà fait
-            if "select_all" not in st.session_state:
-                st.session_state.select_all = False
-            if "deselect_all" not in st.session_state:
-                st.session_state.deselect_all = False
+        etat_file = file_drive().etat()
+        st.caption(
+            f"📤 Envois Drive en attente : {etat_file['profondeur']} "
+            f"(plus ancien : {etat_file['age_s']} s, tentatives : {etat_file['tentatives']}, "
+            f"mises à l'écart : {etat_file['rejets']})"
+        )
 
-            # Boutons d'action
+        base = base_locale()
+        exports = cache_exports()
+
+        if base.nombre():
+            if "selection_ids" not in st.session_state:
+                st.session_state.selection_ids = set()
+                st.session_state.version_selection = 0
+            selection = st.session_state.selection_ids
+
+            # Filtres et tri appliqués par la base (SQL) ; seule la page affichée est lue
+            with st.expander("🔎 Filtres et tri", expanded=False):
+                col_f1, col_f2 = st.columns(2)
+                with col_f1:
+                    periode = st.date_input("Période d'enregistrement", value=(), key="filtre_periode")
+                    code_sujet = st.text_input("Code_Sujet contient", key="filtre_code_sujet")
+                    ages = st.multiselect("Tranche d'âge", base.valeurs_distinctes("Age"), key="filtre_age")
+                with col_f2:
+                    profils = st.multiselect("Profil", base.valeurs_distinctes("Profil"), key="filtre_profil")
+                    coherences = st.multiselect("Cohérence", base.valeurs_distinctes("Coherence"), key="filtre_coherence")
+                    colonnes_tri = [nom for nom, _ in base.colonnes if nom != "Autres"]
+                    tri = st.selectbox("Trier par", colonnes_tri, index=colonnes_tri.index("Horodatage"), key="tri_colonne")
+                    decroissant = st.toggle("Ordre décroissant", value=True, key="tri_decroissant")
+
+            filtres = {"Code_Sujet": code_sujet.strip(), "Age": ages, "Profil": profils, "Coherence": coherences}
+            if len(periode) == 2:
+                filtres["Horodatage"] = (periode[0].isoformat(), (periode[1] + timedelta(days=1)).isoformat())
+            elif len(periode) == 1:
+                filtres["Horodatage"] = (periode[0].isoformat(), (periode[0] + timedelta(days=1)).isoformat())
+
+            total = base.compter(filtres)
+            col_p1, col_p2, col_p3 = st.columns([1, 1, 2])
+            with col_p1:
+                taille_page = st.selectbox("Lignes par page", TAILLES_PAGE, index=1, key="taille_page")
+            nombre_pages = max(1, -(-total // taille_page))
+            if st.session_state.get("numero_page", 1) > nombre_pages:
+                st.session_state.numero_page = nombre_pages
+            with col_p2:
+                numero_page = st.number_input("Page", min_value=1, max_value=nombre_pages, step=1, key="numero_page")
+            with col_p3:
+                st.caption(f"{total} ligne(s) correspondant aux filtres — page {numero_page} / {nombre_pages}")
+
+            # Boutons d'action (sélection conservée par Id_Enregistrement d'une page à l'autre)
             col_b1, col_b2 = st.columns(2)
             with col_b1:
-                if st.button("✅ Tout sélectionner"):
-                    st.session_state.select_all = True
-                    st.session_state.deselect_all = False
+                if st.button("✅ Tout sélectionner (filtres actifs)"):
+                    selection.update(base.ids(filtres))
+                    st.session_state.version_selection += 1
             with col_b2:
                 if st.button("❌ Tout désélectionner"):
-                    st.session_state.select_all = False
-                    st.session_state.deselect_all = True
-
-            # Mise à jour des cases à cocher
-            if st.session_state.select_all:
-                df_affichage["✅ Sélectionner"] = True
-            elif st.session_state.deselect_all:
-                df_affichage["✅ Sélectionner"] = False
+                    selection.clear()
+                    st.session_state.version_selection += 1
 
+            df_page = base.lire_page(filtres, tri, decroissant, numero_page - 1, taille_page)
+            df_page.insert(0, COLONNE_SELECTION, df_page[COLONNE_ID].isin(selection))
 
+            # Clé propre à la page affichée : les cases cochées ne glissent pas d'une page à l'autre
+            empreinte_page = hash((repr(filtres), tri, decroissant, numero_page, taille_page, st.session_state.version_selection))
             edited_df = st.data_editor(
-                df_affichage,
-                use_container_width=True,
+                df_page,
+                width="stretch",
                 num_rows="fixed",
                 hide_index=True,
-                key="table_donnees",
+                disabled=[col for col in df_page.columns if col != COLONNE_SELECTION],
+                key=f"table_donnees_{empreinte_page}",
             )
+            selection.difference_update(edited_df[COLONNE_ID])
+            selection.update(edited_df.loc[edited_df[COLONNE_SELECTION] == True, COLONNE_ID])
 
-            # Extraction des lignes sélectionnées
-            lignes_selectionnees = edited_df[edited_df["✅ Sélectionner"] == True]
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name="Données")
-                output.seek(0)
             st.download_button(
                     label="📥 Télécharger toutes les données (Excel)",
-                    data=output,
+                    data=lambda: exports.contenu(base),
                     file_name="donnees_patients.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
                     
             # ✅ Affichage du message dynamique de sélection
-            if not lignes_selectionnees.empty:
-                st.success(f"{len(lignes_selectionnees)} ligne(s) sélectionnée(s)")
+            if selection:
+                st.success(f"{len(selection)} ligne(s) sélectionnée(s)")
             else:
                 st.info("Sélectionnez une ou plusieurs lignes à analyser ou exporter.")
     
             # Suite des actions si des lignes sont sélectionnées
-            if not lignes_selectionnees.empty:
-                # Fichier Excel des lignes sélectionnées
-                buffer = BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    lignes_selectionnees.to_excel(writer, index=False, sheet_name="Sélection")
-                    buffer.seek(0)
-    
+            if selection:
+                ids_selection = sorted(selection)
                 col1, col2 = st.columns(2)
     
                 with col1:
                     if st.button("🗑️ Supprimer les lignes sélectionnées"):
-                        indices_a_supprimer = lignes_selectionnees.index
-                        df_new = df.drop(index=indices_a_supprimer).reset_index(drop=True)
-                        df_new.to_excel(FICHIER_SORTIE, index=False)
+                        url_ids = base.lire_ids(ids_selection, ["Url_ID"])["Url_ID"].dropna().tolist()
+                        base.supprimer(ids_selection)
+                        depot_passeports().supprimer(url_ids)
+                        selection.clear()
+                        st.session_state.version_selection += 1
                         st.success("Lignes supprimées. Recharge en cours...")
                         st.rerun()
     
                     st.download_button(
                         label="📥 Télécharger les lignes sélectionnées (Excel)",
-                        data=buffer,
+                        data=lambda: exports.contenu(base, ids_selection, feuille="Sélection"),
                         file_name="donnees_selectionnees.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
     
                 # ✅ Bouton activé seulement si au moins une ligne
                 if st.button("📈 Voir l’analyse des lignes sélectionnées"):
-                    tabs = st.tabs([
+                    st.session_state.analyse_active = True
+                    st.session_state.analyses_chargees = ANALYSES_PAR_LOT
+
+                # Analyse à la demande : seuls les sujets chargés (par lots) sont notés,
+                # et seul le sujet choisi est affiché ; ses voisins sont pré-rendus en parallèle
+                if st.session_state.get("analyse_active"):
+                    ids_analyse = ids_selection[:st.session_state.analyses_chargees]
+                    lignes_selectionnees = base.lire_ids(ids_analyse).reset_index(drop=True)
+                    resultats_lot = scorer_profil_batch(lignes_selectionnees)
+                    libelles = [
                         f"[ {ligne.get('Code_Sujet', f'Sujet {i+1}')} ]"
                         for i, (_, ligne) in enumerate(lignes_selectionnees.iterrows())
-                    ])
-                    for i, (tab, (_, ligne_row)) in enumerate(zip(tabs, lignes_selectionnees.iterrows())):
-                        with tab:
-                            ligne = ligne_row.to_dict()
-                            radar = ligne.get("Radar_Analytique", {})
-                            if isinstance(radar, str):
-                                try:
-                                    radar = eval(radar)
-                                except:
-                                    radar = {}
-                            resultat = scorer_profil(ligne)
-                            code_sujet = ligne.get("Code_Sujet", f"Sujet {i+1}")
-                            st.markdown(f"## Résultats pour le sujet : {code_sujet}")
-                            afficher_resultats_complets(resultat, df_config, ligne)
-
-        except FileNotFoundError:
+                    ]
+                    # Générateur : rien n'est construit si le moteur actif ne pré-rend pas
+                    prerendre(
+                        demande
+                        for idx, ligne_row in lignes_selectionnees.iterrows()
+                        for demande in demandes_figures(resultat_depuis_batch(resultats_lot.loc[idx]), formulaire, ligne_row.to_dict())
+                    )
+
+                    col_a1, col_a2 = st.columns([3, 1])
+                    with col_a1:
+                        if len(ids_selection) > len(ids_analyse):
+                            if st.button(f"➕ Charger {ANALYSES_PAR_LOT} sujets de plus ({len(ids_analyse)} / {len(ids_selection)})"):
+                                st.session_state.analyses_chargees += ANALYSES_PAR_LOT
+                                st.rerun()
+                    with col_a2:
+                        if st.button("✖️ Fermer l’analyse"):
+                            st.session_state.analyse_active = False
+                            st.rerun()
+
+                    if not lignes_selectionnees.empty:
+                        i = st.radio(
+                            "Sujet analysé", range(len(libelles)), format_func=lambda i: libelles[i],
+                            horizontal=True, key="sujet_analyse"
+                        )
+                        ligne = lignes_selectionnees.loc[i].to_dict()
+                        resultat = resultat_depuis_batch(resultats_lot.loc[i])
+                        code_sujet = ligne.get("Code_Sujet", f"Sujet {i+1}")
+                        st.markdown(f"## Résultats pour le sujet : {code_sujet}")
+                        afficher_resultats_complets(resultat, formulaire, ligne)
+
+        else:
             st.warning("Aucune donnée trouvée.")
             
 #PASSWORD = "demooptimeyes"
@@ -1107,5 +773,29 @@ def afficher_page_formulaire():
            # st.error("❌ Mot de passe incorrect.")
 #else:
     # ✅ On n’affiche plus rien du tout une fois connecté
-afficher_page_formulaire()
-afficher_footer_optimeyes()
+with etape("rerun", page=st.session_state.get("page", 0)):
+    afficher_page_formulaire()
+    afficher_footer_optimeyes()
+
+# --- Mémoire de la session (budget, registre lu par la page d'exploitation) ---
+# Rien à retirer : la seule clé lourde est selection_ids (≈ 0,2 Ko par ligne cochée),
+# un choix de l'utilisateur ; les données vivent dans les caches du processus.
+# Le budget sert d'alerte, la mesure est espacée (memoire.INTERVALLE_MESURE).
+contexte = get_script_run_ctx()
+if contexte is not None:
+    controler_session(contexte.session_id, st.session_state, page=st.session_state.get("page", 0))
+
+# --- Préchauffage en tâche de fond, une fois par processus, après le premier rendu ---
+prechauffer([
+    ("schéma du formulaire", lambda: (schema_formulaire(FICHIER_ITEMS), regles_notation())),
+    ("logo", logo),
+    ("base locale", base_locale),
+    ("file Drive", file_drive),
+    ("polices matplotlib", prechauffer_matplotlib),
+    ("pile Google", prechauffer_google),
+    ("modules différés", lambda: [importlib.import_module(module) for module in MODULES_DIFFERES]),
+])
+if profil_actif():
+    mesurer("premier rendu", DEBUT_SCRIPT)
+    with st.sidebar.expander("⏱️ Démarrage"):
+        st.code(rapport())
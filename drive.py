@@ -0,0 +1,185 @@
+import threading
+import time
+from io import BytesIO
+
+import streamlit as st
+import pandas as pd
+
+from traces import trace
+
+FICHIER_ID_DRIVE = "162CoThxy9GcuJIWLB_jcpGxXBWsUz7UD"
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SCOPES_DRIVE = ["https://www.googleapis.com/auth/drive"]
+
+# --- Compteurs : création du client vs réutilisation ---
+COMPTEURS_CLIENT = {
+    "creations": 0,
+    "duree_creations_s": 0.0,
+    "reutilisations": 0,
+    "duree_reutilisations_s": 0.0,
+}
+_verrou_compteurs = threading.Lock()
+
+def _compter(cle, debut):
+    with _verrou_compteurs:
+        COMPTEURS_CLIENT[cle] += 1
+        COMPTEURS_CLIENT[f"duree_{cle}_s"] += time.perf_counter() - debut
+
+def compteurs_client():
+    with _verrou_compteurs:
+        return dict(COMPTEURS_CLIENT)
+
+# --- Client Drive partagé par le processus ---
+# Les identifiants sont construits une seule fois ; chaque thread garde son propre
+# service (httplib2 n'est pas thread-safe) avec une connexion HTTP maintenue ouverte.
+# Le document de découverte est celui embarqué dans googleapiclient (aucun appel réseau).
+# La pile Google n'est importée que par le client réel (démarrage plus rapide,
+# inutile avec un client injecté).
+def prechauffer_google():
+    import google_auth_httplib2, googleapiclient.discovery, googleapiclient.http
+    from google.oauth2 import service_account
+
+class ClientDrive:
+    def __init__(self, infos_compte, scopes=SCOPES_DRIVE, timeout=60):
+        from google.oauth2 import service_account
+
+        self.creds = service_account.Credentials.from_service_account_info(infos_compte, scopes=scopes)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def service(self):
+        debut = time.perf_counter()
+        service = getattr(self._local, "service", None)
+        if service is not None:
+            _compter("reutilisations", debut)
+            return service
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build
+
+        http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=self.timeout))
+        service = build("drive", "v3", http=http, static_discovery=True, cache_discovery=False)
+        self._local.service = service
+        _compter("creations", debut)
+        return service
+
+    def telecharger(self, fichier_id):
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaIoBaseDownload
+
+        request = self.service().files().get_media(fileId=fichier_id)
+        buffer = BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request)
+        done = False
+        try:
+            while not done:
+                status, done = downloader.next_chunk()
+        except HttpError as e:
+            # Même exception que drive_local.DriveLocal (segment retiré par un autre écrivain)
+            if e.resp.status == 404:
+                raise FileNotFoundError(f"Fichier Drive introuvable : {fichier_id}") from e
+            raise
+        return buffer.getvalue()
+
+    def mettre_a_jour(self, fichier_id, contenu, mimetype=MIME_XLSX):
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(BytesIO(contenu), mimetype=mimetype, resumable=True)
+        self.service().files().update(fileId=fichier_id, media_body=media).execute()
+
+    def metadonnees(self, fichier_id, champs="parents"):
+        return self.service().files().get(fileId=fichier_id, fields=champs).execute()
+
+    def lister(self, dossier_id, prefixe):
+        requete = f"'{dossier_id}' in parents and name contains '{prefixe}' and trashed = false"
+        fichiers = []
+        page_token = None
+        while True:
+            reponse = self.service().files().list(
+                q=requete,
+                fields="nextPageToken, files(id, name)",
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            fichiers.extend(reponse.get("files", []))
+            page_token = reponse.get("nextPageToken")
+            if not page_token:
+                return fichiers
+
+    def creer(self, nom, contenu, dossier_id, mimetype="application/json"):
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(BytesIO(contenu), mimetype=mimetype)
+        meta = self.service().files().create(
+            body={"name": nom, "parents": [dossier_id]},
+            media_body=media,
+            fields="id"
+        ).execute()
+        return meta["id"]
+
+    def supprimer(self, fichier_id):
+        self.service().files().delete(fileId=fichier_id).execute()
+
+# --- Fabrique (injectable pour les tests / benchmarks, ex. drive_local.DriveLocal) ---
+_client_injecte = None
+
+def definir_client_drive(client):
+    global _client_injecte
+    _client_injecte = client
+
+@st.cache_resource
+def _client_par_defaut():
+    return ClientDrive(st.secrets["google"])
+
+def client_drive():
+    if _client_injecte is not None:
+        return _client_injecte
+    return _client_par_defaut()
+
+# --- Connexion Drive via secrets Streamlit ---
+def connect_drive():
+    return client_drive().service()
+
+# --- Télécharger un fichier brut depuis Drive ---
+@trace("drive.telecharger")
+def telecharger_octets(fichier_id):
+    return client_drive().telecharger(fichier_id)
+
+# --- Télécharger fichier Excel depuis Drive ---
+@trace("drive.telecharger_fichier_excel")
+def telecharger_fichier_excel(fichier_id=FICHIER_ID_DRIVE):
+    return pd.read_excel(BytesIO(telecharger_octets(fichier_id)))
+
+# --- Sauvegarder fichier Excel vers Drive ---
+@trace("drive.ecraser_fichier_excel")
+def ecraser_fichier_excel(df, fichier_id=FICHIER_ID_DRIVE):
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+
+    try:
+        client_drive().mettre_a_jour(fichier_id, buffer.getvalue(), MIME_XLSX)
+        print("✅ Fichier mis à jour sur Google Drive.")
+    except Exception as e:
+        # L'appelant (file d'envoi différé) gère la reprise
+        print(f"❌ Échec de la mise à jour du fichier sur Drive : {e}")
+        raise
+
+# --- Version du fichier (incrémentée par Drive à chaque modification) ---
+def version_fichier(fichier_id=FICHIER_ID_DRIVE):
+    return client_drive().metadonnees(fichier_id, "version").get("version")
+
+# --- Petits fichiers (segments, passeports) dans le dossier du classeur ---
+def dossier_parent(fichier_id=FICHIER_ID_DRIVE):
+    return client_drive().metadonnees(fichier_id, "parents")["parents"][0]
+
+def lister_fichiers(dossier_id, prefixe):
+    return client_drive().lister(dossier_id, prefixe)
+
+def creer_fichier(nom, contenu, dossier_id, mimetype="application/json"):
+    return client_drive().creer(nom, contenu, dossier_id, mimetype)
+
+def remplacer_fichier(fichier_id, contenu, mimetype="application/json"):
+    client_drive().mettre_a_jour(fichier_id, contenu, mimetype)
+
+def supprimer_fichier(fichier_id):
+    client_drive().supprimer(fichier_id)
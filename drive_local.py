@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from stockage import verrou_fichier
+
+# --- Drive local (stand-in pour tests, benchmarks et simulation de charge) ---
+# Même interface que drive.ClientDrive, fichiers stockés dans un dossier local.
+# Installation : drive.definir_client_drive(DriveLocal("/tmp/drive_local"))
+# Chaque opération est atomique, y compris entre processus partageant le dossier.
+
+DOSSIER_RACINE_ID = "dossier_racine"
+
+class DriveLocal:
+    def __init__(self, dossier, latence_s=0.0):
+        self.dossier = dossier
+        self.latence_s = latence_s
+        self._verrou = threading.Lock()
+        self.appels = {"telecharger": 0, "mettre_a_jour": 0, "metadonnees": 0, "lister": 0, "creer": 0, "supprimer": 0}
+        self.octets_recus = 0
+        self.octets_envoyes = 0
+        os.makedirs(self.dossier, exist_ok=True)
+
+    def _chemin(self, fichier_id):
+        return os.path.join(self.dossier, fichier_id)
+
+    def _lire_meta(self, fichier_id):
+        try:
+            with open(self._chemin(fichier_id) + ".meta.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Fichier Drive introuvable : {fichier_id}")
+
+    def _ecrire(self, fichier_id, contenu, meta):
+        for chemin, donnees in ((self._chemin(fichier_id), contenu),
+                                (self._chemin(fichier_id) + ".meta.json", json.dumps(meta).encode("utf-8"))):
+            with open(chemin + ".tmp", "wb") as f:
+                f.write(donnees)
+            os.replace(chemin + ".tmp", chemin)
+
+    def _exclusif(self):
+        return verrou_fichier(os.path.join(self.dossier, ".verrou"))
+
+    def _appel(self, nom):
+        self.appels[nom] += 1
+        if self.latence_s:
+            time.sleep(self.latence_s)
+
+    def initialiser_fichier(self, fichier_id, contenu=b"", nom="donnees.xlsx"):
+        with self._verrou, self._exclusif():
+            self._ecrire(fichier_id, contenu, {"name": nom, "parents": [DOSSIER_RACINE_ID], "version": 1})
+
+    def telecharger(self, fichier_id):
+        self._appel("telecharger")
+        with self._verrou, self._exclusif():
+            self._lire_meta(fichier_id)
+            with open(self._chemin(fichier_id), "rb") as f:
+                contenu = f.read()
+        self.octets_envoyes += len(contenu)
+        return contenu
+
+    def mettre_a_jour(self, fichier_id, contenu, mimetype=None):
+        self._appel("mettre_a_jour")
+        with self._verrou, self._exclusif():
+            meta = self._lire_meta(fichier_id)
+            meta["version"] += 1
+            self._ecrire(fichier_id, contenu, meta)
+        self.octets_recus += len(contenu)
+
+    def metadonnees(self, fichier_id, champs="parents"):
+        self._appel("metadonnees")
+        with self._verrou, self._exclusif():
+            meta = self._lire_meta(fichier_id)
+        return {cle.strip(): meta.get(cle.strip()) for cle in champs.split(",")}
+
+    def lister(self, dossier_id, prefixe):
+        self._appel("lister")
+        fichiers = []
+        with self._verrou, self._exclusif():
+            for nom_fichier in os.listdir(self.dossier):
+                if not nom_fichier.endswith(".meta.json"):
+                    continue
+                fichier_id = nom_fichier[:-len(".meta.json")]
+                meta = self._lire_meta(fichier_id)
+                if dossier_id in meta["parents"] and prefixe in meta["name"]:
+                    fichiers.append({"id": fichier_id, "name": meta["name"]})
+        return fichiers
+
+    def creer(self, nom, contenu, dossier_id, mimetype=None):
+        self._appel("creer")
+        fichier_id = uuid.uuid4().hex
+        with self._verrou, self._exclusif():
+            self._ecrire(fichier_id, contenu, {"name": nom, "parents": [dossier_id], "version": 1})
+        self.octets_recus += len(contenu)
+        return fichier_id
+
+    def supprimer(self, fichier_id):
+        self._appel("supprimer")
+        with self._verrou, self._exclusif():
+            for suffixe in ("", ".meta.json"):
+                try:
+                    os.remove(self._chemin(fichier_id) + suffixe)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+import uuid
+
+from traces import trace
+
+# --- Exports Excel à la demande ---
+# Les classeurs ne sont générés qu'au clic sur « Télécharger » (st.download_button
+# accepte une fonction), écrits en flux sur disque par BaseDonnees.ecrire_excel,
+# puis réutilisés tant que la base (version) et la sélection n'ont pas changé.
+
+FICHIERS_MAX = 8
+
+def cle_export(version, ids=None, feuille="Données"):
+    empreinte = hashlib.sha256(f"{version}\0{feuille}\0".encode("utf-8"))
+    if ids is None:
+        empreinte.update(b"*")
+    else:
+        empreinte.update("\0".join(sorted(str(i) for i in ids)).encode("utf-8"))
+    return empreinte.hexdigest()[:32]
+
+class CacheExports:
+    def __init__(self, dossier, fichiers_max=FICHIERS_MAX):
+        self.dossier = dossier
+        self.fichiers_max = fichiers_max
+        self._verrous = {}
+        self._verrou = threading.Lock()
+        os.makedirs(dossier, exist_ok=True)
+
+    def _verrou_cle(self, cle):
+        with self._verrou:
+            return self._verrous.setdefault(cle, threading.Lock())
+
+    def _purger(self):
+        # Conserve les fichiers les plus récemment utilisés
+        fichiers = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".xlsx"):
+                chemin = os.path.join(self.dossier, nom)
+                try:
+                    fichiers.append((os.stat(chemin).st_mtime, chemin))
+                except FileNotFoundError:
+                    continue
+        for _, chemin in sorted(fichiers, reverse=True)[self.fichiers_max:]:
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+
+    @trace("export.excel")
+    def chemin(self, base, ids=None, feuille="Données"):
+        cle = cle_export(base.version(), ids, feuille)
+        chemin = os.path.join(self.dossier, f"{cle}.xlsx")
+        # Un seul export par clé à la fois ; les autres attendent puis réutilisent le fichier
+        with self._verrou_cle(cle):
+            if os.path.exists(chemin):
+                os.utime(chemin)
+                return chemin
+            temporaire = os.path.join(self.dossier, f".{cle}.{uuid.uuid4().hex}.tmp")
+            try:
+                base.ecrire_excel(temporaire, ids, feuille)
+                os.replace(temporaire, chemin)
+            finally:
+                if os.path.exists(temporaire):
+                    os.remove(temporaire)
+        self._purger()
+        return chemin
+
+    def contenu(self, base, ids=None, feuille="Données"):
+        with open(self.chemin(base, ids, feuille), "rb") as f:
+            return f.read()
@@ -0,0 +1,191 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from traces import trace
+
+# --- File d'écriture différée (write-behind) ---
+# Chaque enregistrement est d'abord journalisé sur disque (un fichier par ligne,
+# écrit puis renommé), puis un thread de fond envoie les lignes en attente
+# par lots à la destination, avec reprise exponentielle en cas d'échec.
+# Lignes empoisonnées : un fichier illisible, ou une ligne que la destination refuse
+# ECHECS_MAX fois alors qu'elle accepte les lignes suivantes, est déplacé dans rejets/
+# (la base locale garde l'enregistrement) ; sans preuve que la destination répond,
+# la ligne n'est écartée qu'après ECHECS_MAX_SANS_PREUVE échecs.
+
+INTERVALLE_VIDAGE = 2.0
+TAILLE_LOT_MAX = 200
+DELAI_REPRISE_MIN = 1.0
+DELAI_REPRISE_MAX = 300.0
+ECHECS_MAX = 5
+ECHECS_MAX_SANS_PREUVE = 30
+DOSSIER_REJETS = "rejets"
+
+class FileEcriture:
+    def __init__(self, dossier, destination, intervalle=INTERVALLE_VIDAGE, taille_lot=TAILLE_LOT_MAX):
+        self.dossier = dossier
+        self.destination = destination  # fonction(lignes) qui lève une exception en cas d'échec
+        self.intervalle = intervalle
+        self.taille_lot = taille_lot
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._verrou = threading.Lock()
+        self._thread = None
+        self.tentatives = 0
+        self.prochaine_tentative = 0.0
+        self.derniere_erreur = None
+        self.lignes_envoyees = 0
+        self.lots_envoyes = 0
+        self._echecs = {}  # nom -> [échecs, refus prouvé]
+        self.dossier_rejets = os.path.join(self.dossier, DOSSIER_REJETS)
+        os.makedirs(self.dossier, exist_ok=True)
+
+    # --- Journal sur disque ---
+    @trace("file.ajouter")
+    def ajouter(self, ligne):
+        nom = f"{time.time_ns():020d}_{uuid.uuid4().hex[:8]}.json"
+        chemin = os.path.join(self.dossier, nom)
+        with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(ligne, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(chemin + ".tmp", chemin)
+        self._reveil.set()
+        return nom
+
+    def _en_attente(self):
+        return sorted(nom for nom in os.listdir(self.dossier) if nom.endswith(".json"))
+
+    def profondeur(self):
+        return len(self._en_attente())
+
+    def age(self):
+        # Âge (secondes) de la plus ancienne ligne en attente
+        noms = self._en_attente()
+        if not noms:
+            return 0.0
+        return max(0.0, time.time() - int(noms[0].split("_")[0]) / 1e9)
+
+    def etat(self):
+        return {
+            "profondeur": self.profondeur(),
+            "age_s": round(self.age(), 1),
+            "tentatives": self.tentatives,
+            "derniere_erreur": self.derniere_erreur,
+            "lignes_envoyees": self.lignes_envoyees,
+            "lots_envoyes": self.lots_envoyes,
+            "rejets": self.rejets(),
+        }
+
+    # --- Lignes empoisonnées ---
+    def rejets(self):
+        try:
+            return sum(nom.endswith(".json") for nom in os.listdir(self.dossier_rejets))
+        except FileNotFoundError:
+            return 0
+
+    def _rejeter(self, nom, raison):
+        os.makedirs(self.dossier_rejets, exist_ok=True)
+        os.replace(os.path.join(self.dossier, nom), os.path.join(self.dossier_rejets, nom))
+        self._echecs.pop(nom, None)
+        print(f"❌ Ligne en attente mise à l'écart ({raison}) : {os.path.join(self.dossier_rejets, nom)}")
+
+    def _noter_echec(self, nom, erreur, prouve):
+        echecs = self._echecs.setdefault(nom, [0, False])
+        echecs[0] += 1
+        echecs[1] = echecs[1] or prouve
+        if (echecs[1] and echecs[0] >= ECHECS_MAX) or echecs[0] >= ECHECS_MAX_SANS_PREUVE:
+            self._rejeter(nom, f"{echecs[0]} échecs, dernier : {erreur!r}")
+
+    def _lire(self, noms):
+        lus = []
+        for nom in noms:
+            try:
+                with open(os.path.join(self.dossier, nom), encoding="utf-8") as f:
+                    lus.append((nom, json.load(f)))
+            except ValueError as e:  # JSON ou UTF-8 invalide
+                self._rejeter(nom, f"illisible : {e}")
+        return lus
+
+    def _envoyer_une_a_une(self, lus, erreur):
+        # Après le refus d'un lot : lignes envoyées seules, dans l'ordre ; deux échecs
+        # de suite -> destination tenue pour indisponible, le passage s'arrête.
+        envoyes, en_echec = [], []
+        for nom, ligne in lus:
+            try:
+                self.destination([ligne])
+            except Exception as e:
+                erreur = e
+                en_echec.append((nom, e))
+                if len(en_echec) == 2:
+                    break
+                continue
+            envoyes.append(nom)
+            # La destination accepte cette ligne : l'échec précédent est un refus
+            for nom_refuse, e in en_echec:
+                self._noter_echec(nom_refuse, e, prouve=True)
+            en_echec = []
+        for nom_refuse, e in en_echec:
+            self._noter_echec(nom_refuse, e, prouve=False)
+        return envoyes, erreur
+
+    # --- Vidage ---
+    @trace("file.vider")
+    def vider(self):
+        with self._verrou:
+            noms = self._en_attente()[:self.taille_lot]
+            lus = self._lire(noms)
+            if not lus:
+                return len(noms)  # lot entièrement illisible : on passe au suivant
+            try:
+                self.destination([ligne for _, ligne in lus])
+                envoyes = [nom for nom, _ in lus]
+            except Exception as e:
+                if len(lus) == 1:
+                    self._noter_echec(lus[0][0], e, prouve=False)
+                    raise
+                envoyes, erreur = self._envoyer_une_a_une(lus, e)
+                if not envoyes:
+                    raise erreur
+            for nom in envoyes:
+                os.remove(os.path.join(self.dossier, nom))
+                self._echecs.pop(nom, None)
+            self.lignes_envoyees += len(envoyes)
+            self.lots_envoyes += 1
+            return len(envoyes)
+
+    def _boucle(self):
+        while not self._arret.is_set():
+            self._reveil.wait(self.intervalle)
+            self._reveil.clear()
+            if time.time() < self.prochaine_tentative:
+                continue
+            try:
+                while self.vider() == self.taille_lot:
+                    pass
+                self.tentatives = 0
+                self.derniere_erreur = None
+            except Exception as e:
+                self.tentatives += 1
+                self.derniere_erreur = repr(e)
+                delai = min(DELAI_REPRISE_MAX, DELAI_REPRISE_MIN * 2 ** (self.tentatives - 1))
+                self.prochaine_tentative = time.time() + delai * random.uniform(0.8, 1.2)
+                print(f"❌ Envoi différé échoué ({self.tentatives}), nouvel essai dans {delai:.0f} s : {e}")
+
+    def demarrer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name="file-ecriture", daemon=True)
+            self._thread.start()
+        return self
+
+    def arreter(self, vider=True):
+        self._arret.set()
+        self._reveil.set()
+        if self._thread is not None:
+            self._thread.join()
+        if vider:
+            self.vider()
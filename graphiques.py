@@ -0,0 +1,496 @@
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from io import BytesIO
+
+import streamlit as st
+import numpy as np
+
+from traces import trace
+
+# --- Figures matplotlib (import différé ; moteur par défaut : SVG, sans matplotlib) ---
+# Figures créées hors de pyplot : aucun registre global ne les retient, elles sont
+# libérées dès la conversion en PNG, y compris si leur construction échoue.
+def _figure(taille, **options_axes):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=taille)
+    return fig, fig.subplots(subplot_kw=options_axes or None)
+
+def figures_pyplot_ouvertes():
+    # Figures encore enregistrées auprès de pyplot (0 attendu), sans importer pyplot
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    return len(pyplot.get_fignums()) if pyplot is not None else 0
+
+def prechauffer_matplotlib():
+    # Import + cache des polices, payés hors du premier rendu
+    figure_en_png(_figure((0.5, 0.5))[0])
+
+# --- CACHE DES FIGURES (PNG) ---
+# LRU borné en octets : une jauge ou un radar déjà rendu n'est plus redessiné
+# à chaque rerun. Chaque figure est vidée dès qu'elle est convertie en PNG.
+TAILLE_CACHE_FIGURES = 32 * 1024 * 1024
+OPTIONS_PNG = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+
+def figure_en_png(fig):
+    try:
+        buffer = BytesIO()
+        fig.savefig(buffer, **OPTIONS_PNG)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+class CacheFigures:
+    def __init__(self, taille_max=TAILLE_CACHE_FIGURES):
+        self.taille_max = taille_max
+        self.taille = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, construire_figure):
+        with self._verrou:
+            image = self._entrees.get(cle)
+            if image is not None:
+                self._entrees.move_to_end(cle)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = figure_en_png(construire_figure())
+        self.inserer(cle, image)
+        return image
+
+    def contient(self, cle):
+        with self._verrou:
+            return cle in self._entrees
+
+    def inserer(self, cle, image):
+        with self._verrou:
+            if cle not in self._entrees and len(image) <= self.taille_max:
+                self._entrees[cle] = image
+                self.taille += len(image)
+                while self.taille > self.taille_max:
+                    _, ancienne = self._entrees.popitem(last=False)
+                    self.taille -= len(ancienne)
+                    self.evictions += 1
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                "entrees": len(self._entrees),
+                "octets": self.taille,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.taille = 0
+
+CACHE_FIGURES = CacheFigures()
+
+# --- RADARS --- #
+
+COULEURS_PROFILS = {
+    "Athlète": "#90CBC1",
+    "Pilote": "#A5B4DC",
+    "E-sportif": "#D8A5B8",
+    "Performer cognitif": "#B6A49C"
+}
+
+def figure_radar(valeurs, taille=(4, 4), titre=None):
+    couleurs_profils = COULEURS_PROFILS
+
+    labels = list(valeurs.keys())
+    donnees = list(valeurs.values())
+    donnees += donnees[:1]  
+
+    angles = [n / float(len(labels)) * 2 * np.pi for n in range(len(labels))]
+    angles += angles[:1]
+
+    fig, ax = _figure(taille, polar=True)
+    fig.patch.set_facecolor('#cccaca')  # fond gris clair
+
+    # Courbe principale
+    ax.plot(angles, donnees, linewidth=2, color='#444')
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(labels)
+
+    # Colorier chaque secteur selon sa couleur de profil
+    for i in range(len(labels)):
+        angle0 = angles[i]
+        angle1 = angles[i + 1]
+        r = [0, donnees[i], donnees[i+1], 0]
+        theta = [angle0, angle0, angle1, angle1]
+
+        ax.fill(theta, r, color=couleurs_profils.get(labels[i], "#999"), alpha=0.25, linewidth=0)
+
+    # Ajouter le titre si fourni
+    if titre:
+        ax.set_title(titre, fontsize=12, pad=20)
+
+    return fig
+
+def cle_radar(valeurs, taille=(4, 4), titre=None):
+    return ("radar", tuple(valeurs.items()), tuple(taille), titre)
+
+def image_radar(valeurs, taille=(4, 4), titre=None):
+    cle = cle_radar(valeurs, taille, titre)
+    PRE_RENDU.attendre(cle)
+    return CACHE_FIGURES.obtenir(cle, lambda: figure_radar(valeurs, taille, titre))
+
+@trace("rendu.radar")
+def afficher_radar(valeurs, taille=(4, 4), titre=None, sauvegarder=False, nom_fichier="radar.png"):
+    rendu = backend_rendu()
+    graphique = rendu.radar(valeurs, taille, titre)
+    if sauvegarder:
+        rendu.sauvegarder(graphique, nom_fichier)
+    rendu.afficher(graphique)
+
+# --- GRAPHIQUES INDIVIDUELS --- #
+
+# Zones colorées d'une jauge, partagées par tous les moteurs de rendu
+def calculer_zones(min_val, max_val, bornes_abs=[], custom_colors=None):
+    # Couleurs par défaut (si aucune spécifique n’est fournie)
+    default_colors = ["#ff4d4d", "#ff944d", "#ffd633", "#4caf50", "#2196f3", "#9c27b0"]
+    couleurs = custom_colors if custom_colors else default_colors
+
+    try:
+        bornes = sorted([float(b) for b in bornes_abs if str(b).strip() != ""])
+    except:
+        bornes = []
+
+    # Les bornes hors de [min_val ; max_val] sont rognées sans décaler les couleurs
+    limites = [-np.inf] + bornes + [np.inf]
+    zones = []
+    for i, (start, end) in enumerate(zip(limites[:-1], limites[1:])):
+        start, end = max(start, min_val), min(end, max_val)
+        if end > start:
+            zones.append((start, end, couleurs[i] if i < len(couleurs) else "#cccccc"))
+    return zones
+
+def plot_jauge_multizone(nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+    zones = calculer_zones(min_val, max_val, bornes_abs, custom_colors)
+
+    fig, ax = _figure(taille)
+    fig.patch.set_facecolor('#cccaca')  # Fond global du graphique
+    ax.set_facecolor('#e0e0e0')         # Fond de la jauge (zone d’affichage)
+
+    for start, end, color in zones:
+        ax.barh(0, end - start, left=start, color=color, edgecolor="white")
+
+    ax.axvline(valeur, color="#004080", linewidth=1)
+    ax.text(
+        valeur, -0.6,  # position (x, y), y en dessous de la barre horizontale
+        f"{valeur:.0f}",  # texte affiché (arrondi entier)
+        ha='center',
+        va='top',
+        fontsize=11,
+        color="#004080",
+        fontweight='bold'
+    )
+    ax.set_xlim(min_val, max_val)
+    ax.set_yticks([])
+    ax.set_xticks([min_val, max_val])
+    ax.set_title(nom, fontsize=13, loc='left')
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    return fig
+
+def cle_jauge(nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+    return (
+        "jauge", nom, float(valeur), float(min_val), float(max_val),
+        tuple(str(b) for b in bornes_abs), tuple(custom_colors or ()), tuple(taille)
+    )
+
+def image_jauge(nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+    cle = cle_jauge(nom, valeur, min_val, max_val, bornes_abs, custom_colors, taille)
+    PRE_RENDU.attendre(cle)
+    return CACHE_FIGURES.obtenir(
+        cle, lambda: plot_jauge_multizone(nom, valeur, min_val, max_val, bornes_abs, custom_colors, taille)
+    )
+
+@trace("rendu.jauge")
+def afficher_jauge(nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+    rendu = backend_rendu()
+    rendu.afficher(rendu.jauge(nom, valeur, min_val, max_val, bornes_abs, custom_colors, taille))
+
+# --- PRÉ-RENDU EN PARALLÈLE (matplotlib) --- #
+# Les figures de plusieurs sujets sont rendues dans un pool de processus et
+# versées dans CACHE_FIGURES ; l'affichage n'attend que la figure qu'il montre.
+# demandes : itérable (générateur accepté, parcouru seulement par le moteur matplotlib) de
+#            ("jauge", (nom, valeur, min_val, max_val, bornes_abs, custom_colors, taille))
+#            ou ("radar", (valeurs, taille, titre))
+PROCESSUS_RENDU = max(1, (os.cpu_count() or 1) - 1)
+CONSTRUCTEURS = {"jauge": (cle_jauge, plot_jauge_multizone), "radar": (cle_radar, figure_radar)}
+
+def _rendre_png(type_figure, arguments):
+    return figure_en_png(CONSTRUCTEURS[type_figure][1](*arguments))
+
+class PreRendu:
+    def __init__(self, processus=PROCESSUS_RENDU):
+        self.processus = processus
+        self._pool = None
+        self._en_cours = {}
+        self._verrou = threading.RLock()
+
+    def _executeur(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processus, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _terminer(self, cle, futur):
+        if not futur.cancelled() and futur.exception() is None:
+            CACHE_FIGURES.inserer(cle, futur.result())
+        with self._verrou:
+            self._en_cours.pop(cle, None)
+
+    def soumettre(self, demandes):
+        soumises = 0
+        with self._verrou:
+            for type_figure, arguments in demandes:
+                cle = CONSTRUCTEURS[type_figure][0](*arguments)
+                if cle in self._en_cours or CACHE_FIGURES.contient(cle):
+                    continue
+                futur = self._executeur().submit(_rendre_png, type_figure, arguments)
+                self._en_cours[cle] = futur
+                futur.add_done_callback(lambda f, cle=cle: self._terminer(cle, f))
+                soumises += 1
+        return soumises
+
+    def attendre(self, cle):
+        with self._verrou:
+            futur = self._en_cours.get(cle)
+        if futur is not None:
+            try:
+                CACHE_FIGURES.inserer(cle, futur.result())
+            except Exception:
+                pass  # rendu local par CACHE_FIGURES.obtenir
+
+    def arreter(self):
+        with self._verrou:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+PRE_RENDU = PreRendu()
+
+@trace("rendu.prerendre")
+def prerendre(demandes):
+    # Seul le moteur matplotlib est assez coûteux pour justifier des processus
+    if backend_rendu().nom != "matplotlib":
+        return 0
+    return PRE_RENDU.soumettre(demandes)
+
+# --- MOTEURS DE RENDU --- #
+# Trois moteurs interchangeables, mêmes zones / couleurs / libellés :
+# - "matplotlib" : PNG rendu côté serveur (mis en cache)
+# - "svg"        : chaîne SVG générée directement, sans matplotlib
+# - "plotly"     : figure Plotly dessinée par le navigateur
+# matplotlib par défaut ; un autre moteur se choisit par OPTIMEYES_RENDU=svg (ou plotly).
+VARIABLE_RENDU = "OPTIMEYES_RENDU"
+BACKEND_RENDU_DEFAUT = "matplotlib"
+BACKEND_RENDU = os.environ.get(VARIABLE_RENDU, "").strip() or BACKEND_RENDU_DEFAUT
+COULEUR_FOND = "#cccaca"
+COULEUR_JAUGE = "#e0e0e0"
+COULEUR_VALEUR = "#004080"
+PIXELS_PAR_POUCE = 100
+
+def _echapper(texte):
+    return str(texte).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def _fmt(x):
+    return f"{x:.2f}".rstrip("0").rstrip(".")
+
+def _axes_radar(valeurs):
+    labels = list(valeurs.keys())
+    donnees = [float(v) for v in valeurs.values()]
+    angles = [n / float(len(labels)) * 2 * np.pi for n in range(len(labels))]
+    return labels, donnees, angles
+
+def _rayon_max(donnees):
+    # Équivalent simple de l'échelle automatique de matplotlib
+    haut = max(donnees + [0.0])
+    if haut <= 0:
+        return 1.0
+    pas = 10 ** np.floor(np.log10(haut))
+    return float(np.ceil(haut / pas) * pas)
+
+class RenduMatplotlib:
+    nom = "matplotlib"
+
+    def jauge(self, nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+        return image_jauge(nom, valeur, min_val, max_val, bornes_abs, custom_colors, taille)
+
+    def radar(self, valeurs, taille=(4, 4), titre=None):
+        return image_radar(valeurs, taille, titre)
+
+    def afficher(self, graphique):
+        st.image(graphique, width="stretch")
+
+    def sauvegarder(self, graphique, nom_fichier):
+        with open(nom_fichier, "wb") as f:
+            f.write(graphique)
+
+class RenduSVG:
+    nom = "svg"
+
+    def jauge(self, nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+        zones = calculer_zones(min_val, max_val, bornes_abs, custom_colors)
+        largeur = taille[0] * PIXELS_PAR_POUCE
+        marge, haut_titre, haut_barre = 10, 24, taille[1] * PIXELS_PAR_POUCE * 0.5
+        hauteur = haut_titre + haut_barre + 34
+        etendue = (max_val - min_val) or 1.0
+        x = lambda v: marge + (min(max(v, min_val), max_val) - min_val) / etendue * (largeur - 2 * marge)
+        y_barre = haut_titre
+
+        parties = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_fmt(largeur)} {_fmt(hauteur)}" '
+            f'width="100%" font-family="sans-serif">',
+            f'<rect width="100%" height="100%" fill="{COULEUR_FOND}"/>',
+            f'<text x="{marge}" y="17" font-size="17">{_echapper(nom)}</text>',
+            f'<rect x="{marge}" y="{_fmt(y_barre)}" width="{_fmt(largeur - 2 * marge)}" height="{_fmt(haut_barre)}" fill="{COULEUR_JAUGE}"/>',
+        ]
+        for start, end, couleur in zones:
+            parties.append(
+                f'<rect x="{_fmt(x(start))}" y="{_fmt(y_barre)}" width="{_fmt(x(end) - x(start))}" '
+                f'height="{_fmt(haut_barre)}" fill="{couleur}" stroke="white"/>'
+            )
+        x_valeur = x(valeur)
+        bas_barre = y_barre + haut_barre
+        parties += [
+            f'<line x1="{_fmt(x_valeur)}" y1="{_fmt(y_barre - 2)}" x2="{_fmt(x_valeur)}" y2="{_fmt(bas_barre + 2)}" '
+            f'stroke="{COULEUR_VALEUR}" stroke-width="1.5"/>',
+            f'<text x="{_fmt(x_valeur)}" y="{_fmt(bas_barre + 17)}" text-anchor="middle" font-size="14" '
+            f'font-weight="bold" fill="{COULEUR_VALEUR}">{valeur:.0f}</text>',
+            f'<text x="{marge}" y="{_fmt(bas_barre + 30)}" font-size="11">{_fmt(min_val)}</text>',
+            f'<text x="{_fmt(largeur - marge)}" y="{_fmt(bas_barre + 30)}" text-anchor="end" font-size="11">{_fmt(max_val)}</text>',
+            "</svg>",
+        ]
+        return "".join(parties)
+
+    def radar(self, valeurs, taille=(4, 4), titre=None):
+        labels, donnees, angles = _axes_radar(valeurs)
+        cote = taille[1] * PIXELS_PAR_POUCE
+        largeur = taille[0] * PIXELS_PAR_POUCE * 1.5  # place pour les libellés latéraux
+        cx, cy, rayon = largeur / 2, cote / 2, cote / 2 - 60
+        r_max = _rayon_max(donnees)
+        # Angle 0 à droite, sens trigonométrique (comme l'axe polaire matplotlib)
+        point = lambda a, r: (cx + rayon * r / r_max * np.cos(a), cy - rayon * r / r_max * np.sin(a))
+
+        parties = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_fmt(largeur)} {_fmt(cote)}" '
+            f'width="100%" font-family="sans-serif" font-size="12">',
+            f'<rect width="100%" height="100%" fill="{COULEUR_FOND}"/>',
+            f'<circle cx="{_fmt(cx)}" cy="{_fmt(cy)}" r="{_fmt(rayon)}" fill="white" stroke="#bbb"/>',
+        ]
+        for fraction in (0.25, 0.5, 0.75):
+            parties.append(f'<circle cx="{_fmt(cx)}" cy="{_fmt(cy)}" r="{_fmt(rayon * fraction)}" fill="none" stroke="#ddd"/>')
+        n = len(labels)
+        for i, (label, angle) in enumerate(zip(labels, angles)):
+            x_bord, y_bord = point(angle, r_max)
+            x_texte, y_texte = point(angle, r_max * 1.18)
+            ancre = "middle" if abs(np.cos(angle)) < 0.3 else ("start" if np.cos(angle) > 0 else "end")
+            x0, y0 = point(angle, donnees[i])
+            x1, y1 = point(angles[(i + 1) % n], donnees[(i + 1) % n])
+            parties += [
+                f'<line x1="{_fmt(cx)}" y1="{_fmt(cy)}" x2="{_fmt(x_bord)}" y2="{_fmt(y_bord)}" stroke="#ddd"/>',
+                f'<polygon points="{_fmt(cx)},{_fmt(cy)} {_fmt(x0)},{_fmt(y0)} {_fmt(x1)},{_fmt(y1)}" '
+                f'fill="{COULEURS_PROFILS.get(label, "#999")}" fill-opacity="0.25"/>',
+                f'<text x="{_fmt(x_texte)}" y="{_fmt(y_texte)}" text-anchor="{ancre}" dominant-baseline="middle">{_echapper(label)}</text>',
+            ]
+        contour = " ".join(f"{_fmt(px)},{_fmt(py)}" for px, py in (point(a, r) for a, r in zip(angles, donnees)))
+        parties.append(f'<polygon points="{contour}" fill="none" stroke="#444" stroke-width="2"/>')
+        if titre:
+            parties.append(f'<text x="{_fmt(cx)}" y="18" text-anchor="middle" font-size="16">{_echapper(titre)}</text>')
+        parties.append("</svg>")
+        return "".join(parties)
+
+    def afficher(self, graphique):
+        st.markdown(f"<div>{graphique}</div>", unsafe_allow_html=True)
+
+    def sauvegarder(self, graphique, nom_fichier):
+        with open(nom_fichier, "w", encoding="utf-8") as f:
+            f.write(graphique)
+
+class RenduPlotly:
+    nom = "plotly"
+
+    def jauge(self, nom, valeur, min_val, max_val, bornes_abs=[], custom_colors=None, taille=(5, 0.6)):
+        import plotly.graph_objects as go
+
+        fig = go.Figure()
+        for start, end, couleur in calculer_zones(min_val, max_val, bornes_abs, custom_colors):
+            fig.add_trace(go.Bar(
+                x=[end - start], base=[start], y=[0], orientation="h",
+                marker=dict(color=couleur, line=dict(color="white", width=1)),
+                hoverinfo="skip", showlegend=False
+            ))
+        fig.add_vline(x=valeur, line_color=COULEUR_VALEUR, line_width=1.5)
+        fig.add_annotation(
+            x=valeur, y=-0.6, text=f"<b>{valeur:.0f}</b>", showarrow=False,
+            yanchor="top", font=dict(size=14, color=COULEUR_VALEUR)
+        )
+        fig.update_layout(
+            title=dict(text=nom, x=0, font=dict(size=17)),
+            height=int(taille[1] * PIXELS_PAR_POUCE) + 90,
+            margin=dict(l=10, r=10, t=30, b=10),
+            paper_bgcolor=COULEUR_FOND, plot_bgcolor=COULEUR_JAUGE, barmode="overlay",
+            xaxis=dict(range=[min_val, max_val], tickvals=[min_val, max_val], showgrid=False),
+            yaxis=dict(visible=False, range=[-1, 0.5]),
+        )
+        return fig
+
+    def radar(self, valeurs, taille=(4, 4), titre=None):
+        import plotly.graph_objects as go
+
+        labels, donnees, _ = _axes_radar(valeurs)
+        fig = go.Figure()
+        n = len(labels)
+        for i, label in enumerate(labels):
+            fig.add_trace(go.Scatterpolar(
+                r=[0, donnees[i], donnees[(i + 1) % n], 0],
+                theta=[label, label, labels[(i + 1) % n], labels[(i + 1) % n]],
+                fill="toself", fillcolor=COULEURS_PROFILS.get(label, "#999"), opacity=0.25,
+                line=dict(width=0), hoverinfo="skip", showlegend=False
+            ))
+        fig.add_trace(go.Scatterpolar(
+            r=donnees + donnees[:1], theta=labels + labels[:1],
+            line=dict(color="#444", width=2), showlegend=False
+        ))
+        fig.update_layout(
+            title=dict(text=titre or "", x=0.5),
+            height=int(taille[1] * PIXELS_PAR_POUCE),
+            margin=dict(l=60, r=60, t=40, b=40),
+            paper_bgcolor=COULEUR_FOND,
+            polar=dict(radialaxis=dict(range=[0, _rayon_max(donnees)]), angularaxis=dict(direction="counterclockwise", rotation=0)),
+        )
+        return fig
+
+    def afficher(self, graphique):
+        st.plotly_chart(graphique, config={"displayModeBar": False})
+
+    def sauvegarder(self, graphique, nom_fichier):
+        graphique.write_html(nom_fichier, include_plotlyjs="cdn")
+
+BACKENDS_RENDU = {rendu.nom: rendu for rendu in (RenduMatplotlib(), RenduSVG(), RenduPlotly())}
+if BACKEND_RENDU not in BACKENDS_RENDU:
+    print(f"⚠️ {VARIABLE_RENDU}={BACKEND_RENDU} inconnu : moteur {BACKEND_RENDU_DEFAUT} utilisé")
+    BACKEND_RENDU = BACKEND_RENDU_DEFAUT
+
+def backend_rendu(nom=None):
+    return BACKENDS_RENDU[nom or BACKEND_RENDU]
+
+def definir_backend_rendu(nom):
+    global BACKEND_RENDU
+    if nom not in BACKENDS_RENDU:
+        raise ValueError(f"Moteur de rendu inconnu : {nom} (attendus : {', '.join(BACKENDS_RENDU)})")
+    BACKEND_RENDU = nom
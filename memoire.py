@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Mémoire par session et par processus ---
+# À la fin d'un rerun, au plus toutes les INTERVALLE_MESURE secondes par session,
+# l'application estime la taille de st.session_state (taille profonde : DataFrame et
+# tableaux numpy compris) et la consigne dans un registre du processus, lu par la page
+# d'exploitation. Au-delà du budget par session (OPTIMEYES_BUDGET_SESSION_MO, 32 Mo
+# par défaut), les objets dérivés déclarés retirables sont retirés de la session,
+# puis un avertissement est écrit si le budget reste dépassé.
+# Les données partagées (base locale, caches de figures et d'exports) sont tenues
+# une fois par processus (st.cache_resource), jamais copiées dans une session.
+
+VARIABLE_BUDGET = "OPTIMEYES_BUDGET_SESSION_MO"
+BUDGET_SESSION_DEFAUT_MO = 32
+DUREE_SESSION_INACTIVE = 3600  # registre purgé des sessions muettes depuis 1 h
+INTERVALLE_MESURE = 30.0  # secondes entre deux parcours profonds d'une même session
+PROFONDEUR_MAX = 6
+ECHANTILLON_CONTENEUR = 1000  # au-delà, taille extrapolée depuis les premiers éléments
+CLES_AFFICHEES = 5
+
+_verrou = threading.Lock()
+_sessions = {}  # id de session -> {"page", "octets", "cles", "evictions", "vu_le", "mesure_le"}
+
+def budget_session():
+    try:
+        return int(float(os.environ.get(VARIABLE_BUDGET, BUDGET_SESSION_DEFAUT_MO)) * 1024 * 1024)
+    except ValueError:
+        return BUDGET_SESSION_DEFAUT_MO * 1024 * 1024
+
+# --- Taille profonde d'un objet ---
+def taille_objet(obj, _vus=None, _profondeur=0):
+    vus = set() if _vus is None else _vus
+    if id(obj) in vus:
+        return 0
+    vus.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        utilise = obj.memory_usage(deep=True)
+        return int(utilise.sum()) if isinstance(utilise, pd.Series) else int(utilise)
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+    taille = sys.getsizeof(obj)
+    if _profondeur >= PROFONDEUR_MAX or isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+        return taille
+    if isinstance(obj, dict):
+        elements = [e for paire in obj.items() for e in paire]
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        elements = list(obj)
+    elif hasattr(obj, "__dict__"):
+        elements = [vars(obj)]
+    elif hasattr(obj, "__slots__"):
+        elements = [getattr(obj, nom) for nom in obj.__slots__ if hasattr(obj, nom)]
+    else:
+        return taille
+    if len(elements) > ECHANTILLON_CONTENEUR:
+        echantillon = sum(taille_objet(e, vus, _profondeur + 1) for e in elements[:ECHANTILLON_CONTENEUR])
+        return taille + echantillon * len(elements) // ECHANTILLON_CONTENEUR
+    return taille + sum(taille_objet(e, vus, _profondeur + 1) for e in elements)
+
+def taille_session(etat):
+    # {clé: octets}, du plus lourd au plus léger
+    tailles = {}
+    for cle in list(etat.keys()):
+        try:
+            tailles[str(cle)] = taille_objet(etat[cle])
+        except Exception:  # clé retirée entre-temps, objet exotique
+            continue
+    return dict(sorted(tailles.items(), key=lambda paire: paire[1], reverse=True))
+
+# --- Contrôle du budget ---
+def controler_session(id_session, etat, page=None, evictables=(), forcer=False):
+    # evictables : clés dérivées, recalculées par l'application si absentes (par ordre de préférence)
+    maintenant = time.time()
+    with _verrou:
+        precedent = _sessions.get(id_session)
+        if precedent is not None and not forcer and maintenant - precedent["mesure_le"] < INTERVALLE_MESURE:
+            # Mesure récente : seuls la page et l'heure du rerun sont notées
+            precedent["page"], precedent["vu_le"] = page, maintenant
+            return precedent["octets"], []
+    tailles = taille_session(etat)
+    total = sum(tailles.values())
+    budget = budget_session()
+    evictions = []
+    for cle in evictables:
+        if total <= budget:
+            break
+        if cle in tailles and cle in etat:
+            del etat[cle]
+            total -= tailles.pop(cle)
+            evictions.append(cle)
+    if total > budget:
+        print(f"⚠️ Session {id_session} : {total / 1e6:.1f} Mo en mémoire (budget {budget / 1e6:.0f} Mo)")
+    with _verrou:
+        precedent = _sessions.get(id_session, {})
+        _sessions[id_session] = {
+            "page": page,
+            "octets": total,
+            "cles": dict(list(tailles.items())[:CLES_AFFICHEES]),
+            "evictions": precedent.get("evictions", 0) + len(evictions),
+            "vu_le": maintenant,
+            "mesure_le": maintenant,
+        }
+        for autre in [s for s, infos in _sessions.items() if maintenant - infos["vu_le"] > DUREE_SESSION_INACTIVE]:
+            del _sessions[autre]
+    return total, evictions
+
+def sessions():
+    with _verrou:
+        return {id_session: dict(infos) for id_session, infos in _sessions.items()}
+
+# --- Processus ---
+def memoire_processus():
+    # {"rss": octets, "pic": octets} ; /proc sous Linux, sinon resource (pic seulement)
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            valeurs = dict(ligne.split(":", 1) for ligne in f if ligne.startswith(("VmRSS", "VmHWM")))
+        return {"rss": int(valeurs["VmRSS"].split()[0]) * 1024, "pic": int(valeurs["VmHWM"].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        import resource
+
+        pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        pic *= 1 if sys.platform == "darwin" else 1024  # octets sous macOS, Ko ailleurs
+        return {"rss": None, "pic": pic}
@@ -0,0 +1,117 @@
+import json
+import time
+
+import streamlit as st
+import pandas as pd
+from administration import exiger_cle_admin
+from base_donnees import BaseDonnees, FICHIER_BASE
+from configuration import RegleNumerique, lire_seuils, regles_notation
+from profilage import (
+    INDICATEURS_NOTES, INDICATEURS_PROFILS, POIDS_PROFILS, SEUILS_COHERENCE,
+    calibrer, matrice_cohorte
+)
+
+# --- Bac à sable de calibrage des poids de profil ---
+# Masquée de la barre latérale, protégée par clé : voir administration.py.
+# La matrice des notes de la cohorte est calculée une fois par version de la base ;
+# chaque modification des poids ou des seuils renote toute la cohorte
+# (produit matriciel) et compare au modèle actuel. Rien n'est enregistré : les poids
+# retenus se reportent dans POIDS_PROFILS, puis python -m renotation.
+COLONNES_COHORTE = INDICATEURS_NOTES + ["GO", "NOGO", "Stereopsie_activee"]
+ORDRE_COHERENCE = ["Très bonne", "Moyenne", "Faible"]
+
+@st.cache_resource
+def base_cohorte():
+    return BaseDonnees(FICHIER_BASE)
+
+@st.cache_resource(max_entries=2)
+def cohorte(version):
+    # Une matrice par version de la base (ajout ou suppression -> recalcul)
+    return matrice_cohorte(base_cohorte().lire_tout(COLONNES_COHORTE))
+
+def comparer(actuel, calibre, ordre):
+    repartition = pd.DataFrame({
+        "Modèle actuel": actuel.value_counts(),
+        "Calibré": calibre.value_counts(),
+    }).reindex(ordre).fillna(0).astype(int)
+    repartition["Écart"] = repartition["Calibré"] - repartition["Modèle actuel"]
+    return repartition
+
+st.set_page_config(page_title="Optimeyes — calibrage", layout="wide")
+
+exiger_cle_admin()
+
+st.title("🎚️ Calibrage des profils")
+
+matrice = cohorte(base_cohorte().version())
+if not matrice.effectif:
+    st.info("Aucun participant enregistré.")
+    st.stop()
+
+# --- Paramètres ---
+st.subheader("Poids par profil")
+poids_actuels = pd.DataFrame(POIDS_PROFILS).reindex(INDICATEURS_PROFILS).fillna(0)
+poids_edites = st.data_editor(poids_actuels, width="stretch", key="poids_profils")
+
+regles = regles_notation()
+seuils, bornes = {}, {}
+with st.expander("📏 Seuils de notation des items numériques (« <x » : x dans la zone supérieure)"):
+    for var in INDICATEURS_NOTES:
+        regle = regles.get(var)
+        if not isinstance(regle, RegleNumerique):
+            continue
+        texte = st.text_input(
+            f"{var} (notes par zone : {' / '.join(map(str, regle.notes))})",
+            value="; ".join(regle.seuils), key=f"bornes_{var}"
+        )
+        try:
+            valeurs = lire_seuils(texte, var)[0]
+        except ValueError as e:
+            st.error(str(e))
+            continue
+        if len(valeurs) != len(regle.bornes):
+            st.error(f"{var} : {len(regle.bornes)} seuils attendus")
+        elif valeurs != regle.bornes:
+            seuils[var], bornes[var] = texte, valeurs
+
+col_s1, col_s2, col_s3 = st.columns(3)
+with col_s1:
+    seuil_tres_bonne = st.number_input("Cohérence « Très bonne » si écart <", value=float(SEUILS_COHERENCE[0]), step=1.0)
+with col_s2:
+    seuil_moyenne = st.number_input("Cohérence « Moyenne » si écart <", value=float(SEUILS_COHERENCE[1]), step=1.0)
+with col_s3:
+    note_go_nogo = st.toggle(
+        "Compter la note GO/NOGO dans les profils", value=False,
+        help="Modèle actuel : GO_NOGO pèse dans le total des poids mais sa note n'est pas comptée."
+    )
+
+# --- Recalcul de toute la cohorte ---
+poids = {profil: {var: float(p) for var, p in colonne.items() if p} for profil, colonne in poids_edites.items()}
+actuel = calibrer(matrice)
+debut = time.perf_counter()
+calibre = calibrer(matrice, poids, bornes, (seuil_tres_bonne, seuil_moyenne), note_go_nogo)
+duree_ms = (time.perf_counter() - debut) * 1000
+
+changes = int((actuel["Profil"] != calibre["Profil"]).sum())
+col_m1, col_m2, col_m3 = st.columns(3)
+col_m1.metric("Participants", matrice.effectif)
+col_m2.metric("Profil dominant modifié", changes, f"{100 * changes / matrice.effectif:.1f} %", delta_color="off")
+col_m3.metric("Recalcul", f"{duree_ms:.1f} ms")
+
+col_g1, col_g2 = st.columns(2)
+with col_g1:
+    st.subheader("Profil dominant")
+    profils = comparer(actuel["Profil"], calibre["Profil"], list(dict.fromkeys(list(POIDS_PROFILS) + list(poids))))
+    st.bar_chart(profils[["Modèle actuel", "Calibré"]], stack=False, sort=False)
+    st.dataframe(profils, width="stretch")
+with col_g2:
+    st.subheader("Cohérence")
+    coherences = comparer(actuel["Coherence"], calibre["Coherence"], ORDRE_COHERENCE)
+    st.bar_chart(coherences[["Modèle actuel", "Calibré"]], stack=False, sort=False)
+    st.dataframe(coherences, width="stretch")
+
+with st.expander("🔀 Passages d'un profil à l'autre (lignes : actuel, colonnes : calibré)"):
+    st.dataframe(pd.crosstab(actuel["Profil"], calibre["Profil"]), width="stretch")
+
+with st.expander("🧾 Paramètres calibrés"):
+    st.code(json.dumps({"POIDS_PROFILS": poids, "Seuils": seuils}, ensure_ascii=False, indent=4), language="json")
@@ -0,0 +1,84 @@
+import streamlit as st
+import pandas as pd
+import memoire
+import traces
+from administration import exiger_cle_admin
+from graphiques import CACHE_FIGURES, figures_pyplot_ouvertes
+
+# --- Page d'exploitation (latences par étape, mémoire) ---
+# Masquée de la barre latérale, protégée par clé : voir administration.py.
+DERNIERES_MESURES = 200
+
+def afficher_latences():
+    histogrammes = traces.histogrammes()
+    if not histogrammes:
+        st.info("Aucune mesure pour l'instant.")
+        return
+
+    # --- Synthèse : percentiles exacts sur le tampon, cumuls depuis le démarrage ---
+    df_mesures = pd.DataFrame(traces.mesures())
+    synthese = pd.DataFrame([
+        {"Étape": nom, "Nombre": h["nombre"], "Erreurs": h["erreurs"], "Moyenne (ms)": 1000 * h["somme_s"] / h["nombre"]}
+        for nom, h in histogrammes.items()
+    ]).set_index("Étape")
+    if not df_mesures.empty:
+        quantiles = df_mesures.groupby("etape")["duree_s"].quantile([0.5, 0.95, 0.99]).unstack() * 1000
+        quantiles.columns = ["p50 (ms)", "p95 (ms)", "p99 (ms)"]
+        synthese = synthese.join(quantiles)
+    st.dataframe(synthese.sort_values("Moyenne (ms)", ascending=False).round(1), width="stretch")
+
+    # --- Histogramme d'une étape ---
+    nom_etape = st.selectbox("Étape", sorted(histogrammes))
+    histogramme = histogrammes[nom_etape]
+    libelles = [f"≤ {seuil * 1000:g} ms" for seuil in histogramme["seuils"]] + [f"> {histogramme['seuils'][-1]:g} s"]
+    st.bar_chart(pd.DataFrame({"Latence": libelles, "Mesures": histogramme["compteurs"]}), x="Latence", y="Mesures", sort=False)
+
+    with st.expander(f"🧾 {DERNIERES_MESURES} dernières mesures"):
+        if not df_mesures.empty:
+            st.dataframe(df_mesures.tail(DERNIERES_MESURES).iloc[::-1], width="stretch")
+
+st.set_page_config(page_title="Optimeyes — exploitation", layout="wide")
+
+exiger_cle_admin()
+
+st.title("⏱️ Latences par étape")
+
+st.toggle("Traces actives", value=traces.actif(), key="traces_actives",
+          on_change=lambda: traces.activer(st.session_state.traces_actives))
+
+afficher_latences()
+
+# --- Exports ---
+col_prom, col_disque = st.columns(2)
+with col_prom:
+    st.download_button("📥 Métriques Prometheus", traces.texte_prometheus(), file_name=traces.FICHIER_PROMETHEUS, mime="text/plain")
+with col_disque:
+    if st.button("💾 Exporter maintenant (JSONL + .prom)"):
+        st.success(f"{traces.exporter()} mesures écrites dans {traces.DOSSIER_METRIQUES}/")
+
+# --- Mémoire : processus, caches partagés, sessions ---
+st.title("🧠 Mémoire")
+processus = memoire.memoire_processus()
+cache = CACHE_FIGURES.statistiques()
+col_rss, col_pic, col_cache, col_figures = st.columns(4)
+col_rss.metric("Processus (RSS)", f"{processus['rss'] / 1e6:.0f} Mo" if processus["rss"] else "—")
+col_pic.metric("Pic du processus", f"{processus['pic'] / 1e6:.0f} Mo")
+col_cache.metric("Cache de figures", f"{cache['octets'] / 1e6:.1f} Mo", f"{cache['entrees']} PNG", delta_color="off")
+col_figures.metric("Figures pyplot ouvertes", figures_pyplot_ouvertes())
+
+sessions = memoire.sessions()
+budget = memoire.budget_session()
+st.caption(f"Budget par session : {budget / 1e6:.0f} Mo ({memoire.VARIABLE_BUDGET}) — {len(sessions)} session(s) active(s)")
+if sessions:
+    st.dataframe(pd.DataFrame([
+        {
+            "Session": id_session[:8],
+            "Page": infos["page"],
+            "Mémoire (Ko)": round(infos["octets"] / 1024, 1),
+            "Part du budget (%)": round(100 * infos["octets"] / budget, 1),
+            "Clés les plus lourdes": ", ".join(f"{cle} ({octets / 1024:.0f} Ko)" for cle, octets in infos["cles"].items()),
+            "Retraits": infos["evictions"],
+            "Dernier rerun": pd.Timestamp(infos["vu_le"], unit="s").strftime("%H:%M:%S"),
+        }
+        for id_session, infos in sorted(sessions.items(), key=lambda paire: paire[1]["octets"], reverse=True)
+    ]), width="stretch", hide_index=True)
@@ -1,39 +1,33 @@
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from googleapiclient.http import MediaIoBaseDownload
+from drive import FICHIER_ID_DRIVE
+from stockage import BackendDrive
+from passeports import IndexPasseports, DepotPasseports, DOSSIER_PASSEPORTS, radar_fiche
+from quantiles import INDICATEURS_COHORTE, COLONNE_TRANCHE, lire_position, valeur_indicateur
+from traces import trace
 
-# --- CONFIGURATION ---
-FICHIER_ID_DRIVE = "TON_ID_DU_FICHIER_XLSX_SUR_DRIVE"
+# --- Passeports pré-calculés à l'enregistrement (une petite lecture par scan) ---
+@st.cache_resource
+def depot_passeports():
+    return DepotPasseports(DOSSIER_PASSEPORTS, [BackendDrive(FICHIER_ID_DRIVE)])
 
-# --- Connexion au Google Drive ---
-def connect_drive():
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["google"],
-        scopes=["https://www.googleapis.com/auth/drive.readonly"]
-    )
-    return build("drive", "v3", credentials=creds)
-
-# --- Télécharger le fichier Excel depuis Drive ---
-@st.cache_data(ttl=60)
-def telecharger_donnees():
-    service = connect_drive()
-    request = service.files().get_media(fileId=FICHIER_ID_DRIVE)
-    buffer = BytesIO()
-    downloader = MediaIoBaseDownload(buffer, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    buffer.seek(0)
-    return pd.read_excel(buffer)
+# --- Index Url_ID -> fiche passeport, pour les enregistrements antérieurs aux artefacts ---
+@st.cache_resource
+def index_passeports():
+    return IndexPasseports(BackendDrive(FICHIER_ID_DRIVE))
 
 # --- Charger données à partir de l'URL ---
+@trace("passeport.charger")
 def charger_profil(url_id):
-    df = telecharger_donnees()
-    ligne = df[df["Url_ID"] == url_id]
-    return ligne
+    artefact = depot_passeports().chercher(url_id)
+    if artefact is None:
+        fiche = index_passeports().chercher(url_id)
+        if fiche is None:
+            return None
+        # Artefact créé au premier scan : les suivants n'utilisent plus l'index
+        depot_passeports().ecrire({**fiche, "Url_ID": url_id})
+        artefact = depot_passeports().chercher(url_id)
+    return artefact
 
 # --- Interface ---
 st.set_page_config(page_title="Passeport Visuel Optimeyes", layout="centered")
@@ -42,24 +36,24 @@ st.image("optimeyes_logo_black.png", width=400)
 st.title("🎫 Passeport Visuo-Cognitif")
 
 # --- Récupérer l'ID de l'URL ---
-params = st.experimental_get_query_params()
-url_id = params.get("id", [None])[0]
+url_id = st.query_params.get("id")
 
 if not url_id:
     st.error("❌ Aucun identifiant de profil fourni dans l'URL.")
     st.stop()
 
 # --- Charger les données ---
-ligne = charger_profil(url_id)
+artefact = charger_profil(url_id)
 
-if ligne.empty:
+if artefact is None:
     st.error("❌ Profil introuvable. Vérifiez votre lien.")
     st.stop()
+fiche = artefact["fiche"]
 
 # --- Affichage des données ---
-profil = ligne.iloc[0].get("Profil", "Profil inconnu")
-score_global = ligne.iloc[0].get("Score_Global", "?")
-coherence = ligne.iloc[0].get("Coherence", "?")
+profil = fiche.get("Profil") or "Profil inconnu"
+score_global = fiche.get("Score_Global", "?")
+coherence = fiche.get("Coherence") or "?"
 
 st.markdown(f"""
 ## 👁️ Profil dominant : **{profil}**
@@ -68,16 +62,30 @@ st.markdown(f"""
 - 🔍 Cohérence subjectif/performance : **{coherence}**
 """)
 
-# --- Option : Radar ou résumé analytique ---
-try:
-    radar = ligne.iloc[0].get("Radar_Analytique", {})
-    if isinstance(radar, str):
-        radar = eval(radar)
-    if isinstance(radar, dict):
-        st.subheader("🔬 Répartition analytique")
-        st.bar_chart(pd.Series(radar))
-except Exception as e:
+# --- Option : Radar ou résumé analytique (séries calculées à l'enregistrement) ---
+radar = artefact.get("radar") or radar_fiche(fiche)
+if radar:
+    st.subheader("🔬 Répartition analytique")
+    st.bar_chart(pd.Series(radar))
+else:
     st.info("Radar non disponible.")
 
+# --- Position dans la cohorte (percentiles calculés à l'enregistrement) ---
+tranche = fiche.get(COLONNE_TRANCHE)
+positions = []
+for indicateur in INDICATEURS_COHORTE:
+    position = artefact.get("positions", {}).get(indicateur)
+    if position is None:
+        continue
+    positions.append({
+        "Indicateur": indicateur,
+        "Valeur": valeur_indicateur(fiche, indicateur),
+        "Tous participants": lire_position(indicateur, position["cohorte"][0]),
+        f"Tranche {tranche or ''}".strip(): lire_position(indicateur, position["tranche"][0]) if position["tranche"] else None,
+    })
+if positions:
+    st.subheader("📊 Votre position parmi les participants")
+    st.dataframe(pd.DataFrame(positions), hide_index=True, width="stretch")
+
 st.markdown("---")
 st.info("Ce résultat est issu de l'expérience Optimeyes VivaTech 2025.")
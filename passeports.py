@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from badges import url_valide
+from profilage import AXES_RADAR, COLONNES_RADAR, COLONNE_RADAR_HISTORIQUE, migrer_radar, radar_depuis_cellule
+from quantiles import INDICATEURS_COHORTE, COLONNE_TRANCHE, valeur_indicateur
+from stockage import PREFIXE_ARTEFACT, decoder_segment
+from traces import trace
+
+# --- Index Url_ID -> fiche passeport ---
+# Seuls les champs affichés sur la page passeport sont conservés.
+# Les nouveaux segments sont lus au fil de l'eau ; le classeur n'est relu que
+# lorsque sa version change (compaction ou suppression de lignes).
+
+CHAMPS_PASSEPORT = ["Profil", "Score_Global", "Coherence", COLONNE_TRANCHE, "Stereopsie_activee"] + COLONNES_RADAR + [
+    indicateur for indicateur in INDICATEURS_COHORTE if indicateur != "Score_Global"
+]
+DELAI_RAFRAICHISSEMENT_MIN = 5.0
+DOSSIER_PASSEPORTS = "passeports_patients"
+VERSION_ARTEFACT = 2  # 2 : positions dans la cohorte, radar en données (plus de SVG)
+
+def fiche_passeport(ligne):
+    if COLONNE_RADAR_HISTORIQUE in ligne and all(pd.isna(ligne.get(colonne)) for colonne in COLONNES_RADAR):
+        ligne = {**ligne, **radar_depuis_cellule(ligne[COLONNE_RADAR_HISTORIQUE])}
+    fiche = {champ: ligne.get(champ) for champ in CHAMPS_PASSEPORT}
+    # Valeurs NaN (cellules vides) -> None
+    return {champ: (None if isinstance(valeur, float) and valeur != valeur else valeur) for champ, valeur in fiche.items()}
+
+def radar_fiche(fiche):
+    # {axe: score} à partir des colonnes Radar_<axe> présentes
+    radar = {axe: fiche.get(f"Radar_{axe}") for axe in AXES_RADAR}
+    return {axe: float(valeur) for axe, valeur in radar.items() if valeur is not None}
+
+class IndexPasseports:
+    def __init__(self, backend, delai_min=DELAI_RAFRAICHISSEMENT_MIN):
+        self.backend = backend
+        self.delai_min = delai_min
+        self.fiches = {}
+        self.segments_lus = set()
+        self.version_classeur = None
+        self.dernier_rafraichissement = 0.0
+        self.relectures_classeur = 0
+        self._verrou = threading.Lock()
+
+    def _indexer(self, lignes):
+        for ligne in lignes:
+            url_id = ligne.get("Url_ID")
+            if isinstance(url_id, str) and url_id:
+                self.fiches[url_id] = fiche_passeport(ligne)
+
+    def _relire_classeur(self):
+        df = migrer_radar(self.backend.lire_classeur())
+        if "Url_ID" in df.columns:
+            colonnes = ["Url_ID"] + [c for c in CHAMPS_PASSEPORT if c in df.columns]
+            df = df[colonnes].astype(object).where(df[colonnes].notna(), None)
+            self._indexer(df.to_dict("records"))
+        self.relectures_classeur += 1
+
+    def rafraichir(self):
+        with self._verrou:
+            version = self.backend.version_classeur()
+            if version != self.version_classeur:
+                self.fiches = {}
+                self.segments_lus = set()
+                self._relire_classeur()
+                self.version_classeur = version
+            segments = set(self.backend.lister_segments())
+            self.segments_lus &= segments
+            for nom in sorted(segments - self.segments_lus):
+                self._indexer(decoder_segment(self.backend.lire_segment(nom)))
+                self.segments_lus.add(nom)
+            self.dernier_rafraichissement = time.time()
+
+    def chercher(self, url_id):
+        fiche = self.fiches.get(url_id)
+        if fiche is None and time.time() - self.dernier_rafraichissement >= self.delai_min:
+            self.rafraichir()
+            fiche = self.fiches.get(url_id)
+        return fiche
+
+# --- Artefacts passeport pré-calculés à l'enregistrement ---
+# Un petit fichier JSON par Url_ID (fiche + séries du graphique analytique + position
+# dans la cohorte), écrit en local au moment de la sauvegarde puis publié sur le Drive par la
+# file d'envoi différé. Servir un passeport = une seule petite lecture, quelle que soit
+# la taille du jeu de données, sans base locale côté passeport.
+
+def nom_artefact(url_id):
+    # None pour un identifiant invalide (l'Url_ID vient de l'URL scannée)
+    if not url_valide(url_id):
+        return None
+    return f"{PREFIXE_ARTEFACT}{url_id}.json"
+
+def _natif(valeur):
+    return valeur.item() if hasattr(valeur, "item") else str(valeur)
+
+def positions_cohorte(fiche, percentile):
+    # {indicateur: {"cohorte": [percentile, effectif], "tranche": [...] ou None}}
+    # percentile : BaseDonnees.percentile (esquisses de la base au moment de l'écriture)
+    tranche = fiche.get(COLONNE_TRANCHE)
+    tranche = tranche if isinstance(tranche, str) and tranche else None
+    positions = {}
+    for indicateur in INDICATEURS_COHORTE:
+        valeur = valeur_indicateur(fiche, indicateur)
+        cohorte = percentile(indicateur, valeur) if valeur is not None else None
+        if cohorte is None:
+            continue
+        par_tranche = percentile(indicateur, valeur, tranche) if tranche else None
+        positions[indicateur] = {"cohorte": list(cohorte), "tranche": list(par_tranche) if par_tranche else None}
+    return positions
+
+def construire_artefact(ligne, percentile=None):
+    fiche = fiche_passeport(ligne)
+    return json.dumps({
+        "version": VERSION_ARTEFACT,
+        "url_id": ligne.get("Url_ID"),
+        "fiche": fiche,
+        "radar": radar_fiche(fiche),
+        "positions": positions_cohorte(fiche, percentile) if percentile is not None else {},
+    }, ensure_ascii=False, default=_natif).encode("utf-8")
+
+class DepotPasseports:
+    def __init__(self, dossier=DOSSIER_PASSEPORTS, backends=(), percentile=None):
+        self.dossier = dossier
+        self.backends = list(backends)  # copies distantes (BackendDrive, BackendLocal)
+        self.percentile = percentile  # BaseDonnees.percentile, si une base est disponible
+
+    def _chemin(self, nom):
+        return os.path.join(self.dossier, nom)
+
+    def _ecrire_local(self, nom, contenu):
+        os.makedirs(self.dossier, exist_ok=True)
+        temporaire = self._chemin(f".{nom}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temporaire, "wb") as f:
+            f.write(contenu)
+        os.replace(temporaire, self._chemin(nom))
+
+    @trace("passeport.ecrire")
+    def ecrire(self, ligne):
+        nom = nom_artefact(ligne.get("Url_ID"))
+        if nom is None:
+            return None
+        contenu = construire_artefact(ligne, self.percentile)
+        self._ecrire_local(nom, contenu)
+        return contenu
+
+    @trace("passeport.publier")
+    def publier(self, lignes):
+        # Copie distante ; lève une exception en cas d'échec (reprise par la file d'envoi)
+        for ligne in lignes:
+            nom = nom_artefact(ligne.get("Url_ID"))
+            if nom is None:
+                continue
+            try:
+                with open(self._chemin(nom), "rb") as f:
+                    contenu = f.read()
+            except FileNotFoundError:
+                contenu = construire_artefact(ligne, self.percentile)
+            for backend in self.backends:
+                backend.ecrire_artefact(nom, contenu)
+
+    def chercher(self, url_id):
+        nom = nom_artefact(url_id)
+        if nom is None:
+            return None
+        try:
+            with open(self._chemin(nom), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            pass
+        for backend in self.backends:
+            try:
+                contenu = backend.lire_artefact(nom)
+            except FileNotFoundError:
+                continue
+            self._ecrire_local(nom, contenu)
+            return json.loads(contenu)
+        return None
+
+    def supprimer(self, url_ids):
+        # Copie locale retirée tout de suite, copies distantes en tâche de fond
+        noms = [nom for nom in map(nom_artefact, url_ids) if nom is not None]
+        for nom in noms:
+            try:
+                os.remove(self._chemin(nom))
+            except FileNotFoundError:
+                pass
+        if self.backends and noms:
+            thread = threading.Thread(target=self._supprimer_distants, args=(noms,), name="suppression-passeports", daemon=True)
+            thread.start()
+            return thread
+        return None
+
+    def _supprimer_distants(self, noms):
+        for nom in noms:
+            for backend in self.backends:
+                try:
+                    backend.supprimer_artefact(nom)
+                except Exception as e:
+                    print(f"❌ Suppression du passeport distant {nom} échouée : {e}")
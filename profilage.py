@@ -0,0 +1,526 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from configuration import FICHIER_ITEMS, RegleNumerique, regle_go_nogo, regle_numerique, regles_notation
+from traces import trace
+
+# --- PARAMETRES ---
+
+commentaires_indicateurs = {
+    "Decision_Visuelle": {
+        3: "Décision très rapide, excellente réactivité.",
+        2: "Décision de vitesse moyenne, correcte dans l’ensemble.",
+        1: "Décision lente, réactivité diminuée.",
+        0: "Donnée absente ou non interprétable sur la capacité décisionnelle.",
+    },
+    "Fatigue_Visuelle": {
+        3: "Très faible fatigue visuelle ressentie.",
+        2: "Fatigue visuelle modérée.",
+        1: "Fatigue visuelle importante signalée.",
+        0: "Fatigue visuelle non renseignée ou incohérente.",
+    },
+    "Sensibilite_Lumineuse": {
+        3: "Aucune sensibilité à la lumière signalée.",
+        2: "Sensibilité occasionnelle à la lumière.",
+        1: "Sensibilité marquée à la lumière.",
+        0: "Aucune donnée disponible sur la sensibilité lumineuse.",
+    },
+    "Vision_Peri": {
+        3: "Vision périphérique jugée bonne.",
+        2: "Vision périphérique moyenne.",
+        1: "Vision périphérique faible.",
+        0: "Évaluation périphérique non renseignée ou invalide.",
+    },
+    "Confort_Visuel": {
+        3: "Très bon confort visuel perçu.",
+        2: "Confort visuel acceptable.",
+        1: "Confort visuel faible ou inconfort.",
+        0: "Absence de réponse sur le confort visuel.",
+    },
+    "Vitesse_Horizontale": {
+        3: "Excellente vitesse visuelle horizontale.",
+        2: "Vitesse correcte avec marge de progression.",
+        1: "Vitesse visuelle lente ou perturbée.",
+        0: "Mesure horizontale non disponible ou inexploitée.",
+    },
+    "Vitesse_Verticale": {
+        3: "Très bonne vitesse visuelle verticale.",
+        2: "Vitesse verticale modérée.",
+        1: "Réduction marquée de la vitesse verticale.",
+        0: "Vitesse verticale non mesurée ou invalide.",
+    },
+    "Vision_Faible_Contraste": {
+        3: "Aucune difficulté détectée en faible contraste.",
+        2: "Légère difficulté avec les contrastes faibles.",
+        1: "Difficulté importante à détecter les faibles contrastes.",
+        0: "Aucune donnée exploitable sur la vision en faible contraste.",
+    },
+    "Stereopsie": {
+        3: "Excellente perception 3D (stéréopsie).",
+        2: "Perception 3D correcte.",
+        1: "Perception 3D altérée ou lente.",
+        0: "Données aberrantes ou interprétation non fiable.",
+    },
+    "GO_NOGO": {
+        3: "Très bon contrôle décisionnel (go/no-go).",
+        2: "Contrôle correct avec vigilance.",
+        1: "Décisions impulsives ou lenteur observée.",
+        0: "Go/No-Go non calculable (valeurs manquantes).",
+    },
+    "GO": {
+        3: "Temps de réaction très rapide.",
+        2: "Temps de réaction correct, mais améliorable.",
+        1: "Temps de réaction lent ou erratique.",
+        0: "Temps de réaction non mesuré.",
+    },
+    "NOGO": {
+        3: "Très bon contrôle inhibiteur (très peu d'erreurs).",
+        2: "Contrôle correct avec quelques erreurs.",
+        1: "Impulsivité marquée ou erreurs fréquentes.",
+        0: "Donnée inhibitrice absente ou invalide.",
+    }
+}
+
+def commenter_indicateur(variable, score):
+    return commentaires_indicateurs.get(variable, {}).get(score, "")
+
+# Fonction de notation selon les valeurs observées (table compilée depuis le CSV)
+def noter(variable, valeur):
+    regle = regles_notation().get(variable)
+    return regle.noter(valeur) if regle is not None else 0
+    
+# --- DIVERS --- #
+
+def noter_go_nogo(go, nogo):
+    # Règle combinée compilée depuis la colonne Cible du CSV ; GO / NOGO absents (None ou NaN) : 0
+    return regle_go_nogo().noter(go, nogo)
+
+# --- PROFILING PONDÉRÉ ---
+INDICATEURS_SUBJECTIFS = [
+    "Decision_Visuelle", "Fatigue_Visuelle",
+    "Sensibilite_Lumineuse", "Vision_Peri", "Confort_Visuel"
+]
+INDICATEURS_PERFORMANCE = ["Vitesse_Horizontale", "Vitesse_Verticale", "Vision_Faible_Contraste"]
+
+POIDS_PROFILS = {
+    "Athlète": {
+        "GO_NOGO": 2,
+        "Vitesse_Horizontale": 2,
+        "Vitesse_Verticale": 2,
+        "Vision_Faible_Contraste": 1,
+        "Stereopsie": 3,
+    },
+    "Pilote": {
+        "GO_NOGO": 2,
+        "Vitesse_Horizontale": 1,
+        "Vitesse_Verticale": 1,
+        "Vision_Faible_Contraste": 1,
+        "Stereopsie": 2
+    },
+    "E-sportif": {
+        "GO_NOGO": 2,
+        "Vitesse_Horizontale": 4,
+        "Vitesse_Verticale": 4,
+        "Vision_Faible_Contraste": 1,
+        "Stereopsie": 2
+    },
+    "Performer cognitif": {
+        "GO_NOGO": 2,
+        "Vitesse_Horizontale": 1,
+        "Vitesse_Verticale": 1,
+        "Vision_Faible_Contraste": 4,
+        "Stereopsie": 1
+    }
+}
+
+# --- VERSION DU MODELE DE NOTATION ---
+# Chaque enregistrement porte la version du modèle qui l'a noté (colonne Version_Modele) :
+# numéro de l'algorithme + empreinte des poids et des règles de notation du CSV
+# (cibles GO/NOGO comprises).
+# Un changement de poids ou de bornes change donc la version ; une modification des
+# formules ci-dessous demande d'incrémenter VERSION_ALGORITHME. Voir renotation.py.
+VERSION_ALGORITHME = 1
+
+@lru_cache(maxsize=4)
+def version_modele(fichier=FICHIER_ITEMS):
+    regles = {
+        item: {"bornes": list(regle.bornes), "notes": list(regle.notes)} if isinstance(regle, RegleNumerique) else regle.table
+        for item, regle in regles_notation(fichier).items()
+    }
+    go_nogo = regle_go_nogo(fichier)
+    regles[go_nogo.item] = {"cibles": [float(c) for c in go_nogo.cibles], "notes": list(go_nogo.notes)}
+    contenu = json.dumps({"poids": POIDS_PROFILS, "regles": regles}, sort_keys=True, ensure_ascii=False)
+    return f"v{VERSION_ALGORITHME}-{hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:8]}"
+
+@trace("profil.scorer")
+def scorer_profil(d):
+    
+    # --- Partie 1 : Scores objectifs (avec pondération de GO_NOGO) ---
+    go = d.get("GO")
+    nogo = d.get("NOGO")
+    go_nogo_score = noter_go_nogo(go, nogo)
+
+    stereopsie_activee = d.get("Stereopsie_activee", True)
+
+    indicateurs_subjectifs = list(INDICATEURS_SUBJECTIFS)
+    score_subjectif_total = sum([noter(var, d.get(var, 0)) for var in indicateurs_subjectifs])
+    indice_subjectif = round((score_subjectif_total / (3 * len(indicateurs_subjectifs))) * 100, 1)
+
+    indicateurs_perf = list(INDICATEURS_PERFORMANCE)
+    if stereopsie_activee:
+        indicateurs_perf.append("Stereopsie")
+
+    score_perf_total = sum([noter(var, d.get(var, 0)) for var in indicateurs_perf]) + (2 * go_nogo_score)
+    total_points_theoriques = (len(indicateurs_perf) + 2) * 3
+    indice_performance = round((score_perf_total / total_points_theoriques) * 100, 1)
+
+    poids_subjectif = 0.4
+    amplification = min(abs(indice_subjectif - indice_performance) / 100, 0.6)
+    poids_performance = 1.0 - poids_subjectif + amplification
+    poids_total = poids_subjectif + poids_performance
+    poids_subjectif /= poids_total
+    poids_performance /= poids_total
+    score_global = round(poids_subjectif * indice_subjectif + poids_performance * indice_performance, 1)
+
+    scores = {}
+
+    for profil, variables in POIDS_PROFILS.items():
+        score = 0
+        total_poids = 0
+        for var, p in variables.items():
+            if var == "Stereopsie" and not stereopsie_activee:
+                continue
+            valeur = go_nogo_score if var == "GO_NOGO" else d.get(var, 0)
+            score += noter(var, valeur) * p
+            total_poids += p
+        scores[profil] = round((score / (3 * total_poids)) * 100, 1) if total_poids else 0
+
+    profil_dominant = max(scores, key=scores.get)
+    score_profil_dominant = scores[profil_dominant]
+
+    ecart = abs(indice_subjectif - indice_performance)
+    coherence = (
+        "Très bonne" if ecart < 10 else
+        "Moyenne" if ecart < 25 else
+        "Faible"
+    )
+    alerte_discordance = ecart >= 25
+    
+    # --- Partie 4 : Score radar analytique (5 axes) ---
+    radar_analytique = {
+        "Vitesse visuelle": round((noter("Vitesse_Horizontale", d.get("Vitesse_Horizontale", 0)) + noter("Vitesse_Verticale", d.get("Vitesse_Verticale", 0))) / 2 * 33.33, 1),
+        "Résolution spatiale": round((noter("Vision_Faible_Contraste", d.get("Vision_Faible_Contraste", 0)) + (noter("Stereopsie", d.get("Stereopsie", 0)) if stereopsie_activee else 0)) / (2 if stereopsie_activee else 1) * 33.33, 1),
+        "Attention périphérique": round(noter("Vision_Peri", d.get("Vision_Peri", 0)) * 33.33, 1),
+        "Engagement décisionnel": round((go_nogo_score + noter("Decision_Visuelle", d.get("Decision_Visuelle", 0))) / 2 * 33.33, 1),
+        "Surcharge visuelle perçue": round((noter("Fatigue_Visuelle", d.get("Fatigue_Visuelle", 0)) + noter("Sensibilite_Lumineuse", d.get("Sensibilite_Lumineuse", 0))) / 2 * 33.33, 1)
+    }
+    
+    # --- Partie 5 : Commentaires par indicateur ---
+    commentaires = {}
+    for var in indicateurs_subjectifs + indicateurs_perf:
+        if var == "Stereopsie" and not stereopsie_activee:
+            continue
+        score = noter(var, d.get(var, 0))
+        commentaires[var] = commentaires_indicateurs.get(var, {}).get(score, "Interprétation non disponible.")
+    commentaires["GO_NOGO"] = commentaires_indicateurs.get("GO_NOGO", {}).get(go_nogo_score, "Interprétation non disponible.")
+    commentaires["GO"] = commentaires_indicateurs.get("GO", {}).get(noter("GO", go), "Interprétation non disponible.")
+    commentaires["NOGO"] = commentaires_indicateurs.get("NOGO", {}).get(noter("NOGO", nogo), "Interprétation non disponible.")
+    # GO/NOGO séparément car combiné
+
+    return {
+        "profil": profil_dominant,
+        "scores": scores,
+        "score_profil_dominant": score_profil_dominant,
+        "indice_subjectif": indice_subjectif,
+        "indice_performance": indice_performance,
+        "score_global": score_global,
+        "coherence": coherence,
+        "radar_analytique": radar_analytique,
+        "alerte_discordance": alerte_discordance,
+        "commentaires": commentaires
+    }
+
+
+# --- PROFILING EN LOT (vectorisé) ---
+# Même table de règles que noter() / scorer_profil(), appliquée colonne par colonne
+# (np.searchsorted pour les items numériques, dictionnaire pour les items à choix).
+
+AXES_RADAR = [
+    "Vitesse visuelle",
+    "Résolution spatiale",
+    "Attention périphérique",
+    "Engagement décisionnel",
+    "Surcharge visuelle perçue",
+]
+COLONNES_RADAR = [f"Radar_{axe}" for axe in AXES_RADAR]
+
+# --- Ancien format : dict Python dans une seule cellule "Radar_Analytique" ---
+# Lu sans eval : une expression régulière par axe, accepte "{'axe': 12.5}",
+# du JSON ou des valeurs numpy ("np.float64(12.5)").
+COLONNE_RADAR_HISTORIQUE = "Radar_Analytique"
+MOTIFS_RADAR = {
+    axe: re.compile(
+        rf"""['"]{re.escape(axe)}['"]\s*:\s*(?:np\.float64\()?\s*(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|nan)"""
+    )
+    for axe in AXES_RADAR
+}
+
+def radar_depuis_cellule(cellule):
+    # {Radar_<axe>: valeur} pour une cellule isolée (dict ou texte)
+    if isinstance(cellule, dict):
+        return {f"Radar_{axe}": pd.to_numeric(cellule.get(axe), errors="coerce") for axe in AXES_RADAR}
+    texte = str(cellule)
+    valeurs = {}
+    for axe, motif in MOTIFS_RADAR.items():
+        trouve = motif.search(texte)
+        valeurs[f"Radar_{axe}"] = float(trouve.group(1)) if trouve else np.nan
+    return valeurs
+
+def migrer_radar(df):
+    # Colonne "Radar_Analytique" remplacée par les colonnes Radar_<axe> typées (vectorisé)
+    if COLONNE_RADAR_HISTORIQUE not in df.columns:
+        return df
+    cellules = df[COLONNE_RADAR_HISTORIQUE]
+    df = df.drop(columns=[COLONNE_RADAR_HISTORIQUE])
+    textes = cellules.map(
+        lambda c: json.dumps(c) if isinstance(c, dict) else c, na_action="ignore"
+    ).astype("string")
+    for axe, colonne in zip(AXES_RADAR, COLONNES_RADAR):
+        valeurs = pd.to_numeric(textes.str.extract(MOTIFS_RADAR[axe].pattern, expand=False), errors="coerce")
+        valeurs = pd.Series(valeurs.to_numpy(dtype=float, na_value=np.nan), index=df.index)
+        df[colonne] = pd.to_numeric(df[colonne], errors="coerce").fillna(valeurs) if colonne in df.columns else valeurs
+    return df
+
+def _colonne_numerique(df, variable, defaut=0):
+    # Renvoie (valeurs, est_nombre) : est_nombre marque les valeurs numériques
+    n = len(df)
+    if variable not in df.columns:
+        return np.full(n, float(defaut)), np.ones(n, dtype=bool)
+    colonne = df[variable]
+    if pd.api.types.is_numeric_dtype(colonne):
+        return colonne.to_numpy(dtype=float, na_value=np.nan), np.ones(n, dtype=bool)
+    numeriques = colonne.map(lambda v: isinstance(v, (int, float, np.integer, np.floating))).to_numpy(dtype=bool)
+    valeurs = pd.to_numeric(colonne.where(numeriques), errors="coerce").to_numpy(dtype=float)
+    return valeurs, numeriques
+
+def noter_colonne(df, variable):
+    regle = regles_notation().get(variable)
+    if regle is None:
+        return np.zeros(len(df), dtype=np.int64)
+    if not hasattr(regle, "noter_tableau"):
+        if variable not in df.columns:
+            return np.zeros(len(df), dtype=np.int64)
+        return regle.noter_serie(df[variable])
+    valeurs, est_valide = _colonne_numerique(df, variable)
+    return regle.noter_tableau(valeurs, est_valide).astype(np.int64)
+
+def _noter_go_nogo_colonnes(df):
+    colonnes = [_colonne_numerique(df, item, defaut=np.nan) for item in regle_go_nogo().composantes]
+    return regle_go_nogo().noter_tableaux(colonnes).astype(np.int64)
+
+def _arrondir(valeurs, decimales=1):
+    # round() Python sur les valeurs distinctes : résultat identique au calcul ligne par ligne
+    valeurs = np.asarray(valeurs, dtype=float)
+    codes, uniques = pd.factorize(valeurs.ravel())
+    return np.array([round(float(u), decimales) for u in uniques])[codes].reshape(valeurs.shape)
+
+def _stereopsie_activee(df):
+    if "Stereopsie_activee" not in df.columns:
+        return np.ones(len(df), dtype=bool)
+    if pd.api.types.is_numeric_dtype(df["Stereopsie_activee"]):
+        # Une valeur manquante (NaN) est « vraie », comme dans scorer_profil()
+        return df["Stereopsie_activee"].to_numpy(dtype=float, na_value=np.nan) != 0
+    return df["Stereopsie_activee"].map(bool).to_numpy(dtype=bool)
+
+@trace("profil.scorer_lot")
+def scorer_profil_batch(df):
+    n = len(df)
+    index = df.index
+    stereopsie_activee = _stereopsie_activee(df)
+
+    notes = {var: noter_colonne(df, var) for var in INDICATEURS_SUBJECTIFS + INDICATEURS_PERFORMANCE + ["Stereopsie", "GO", "NOGO"]}
+    go_nogo_score = _noter_go_nogo_colonnes(df)
+    note_stereo = np.where(stereopsie_activee, notes["Stereopsie"], 0)
+
+    # --- Indices subjectif / performance ---
+    score_subjectif_total = sum(notes[var] for var in INDICATEURS_SUBJECTIFS)
+    indice_subjectif = _arrondir((score_subjectif_total / (3 * len(INDICATEURS_SUBJECTIFS))) * 100)
+
+    score_perf_total = sum(notes[var] for var in INDICATEURS_PERFORMANCE) + note_stereo + (2 * go_nogo_score)
+    total_points_theoriques = (len(INDICATEURS_PERFORMANCE) + stereopsie_activee.astype(np.int64) + 2) * 3
+    indice_performance = _arrondir((score_perf_total / total_points_theoriques) * 100)
+
+    poids_subjectif = 0.4
+    amplification = np.minimum(np.abs(indice_subjectif - indice_performance) / 100, 0.6)
+    poids_performance = 1.0 - poids_subjectif + amplification
+    poids_total = poids_subjectif + poids_performance
+    poids_subjectif = poids_subjectif / poids_total
+    poids_performance = poids_performance / poids_total
+    score_global = _arrondir(poids_subjectif * indice_subjectif + poids_performance * indice_performance)
+
+    # --- Scores par profil ---
+    scores = {}
+    for profil, variables in POIDS_PROFILS.items():
+        score = np.zeros(n, dtype=np.int64)
+        total_poids = np.zeros(n, dtype=np.int64)
+        for var, p in variables.items():
+            # noter("GO_NOGO", ...) vaut 0 : seul le poids est compté
+            note = 0 if var == "GO_NOGO" else note_stereo if var == "Stereopsie" else notes[var]
+            actif = stereopsie_activee if var == "Stereopsie" else True
+            score = score + np.where(actif, note * p, 0)
+            total_poids = total_poids + np.where(actif, p, 0)
+        scores[profil] = _arrondir((score / (3 * total_poids)) * 100)
+
+    matrice_scores = np.column_stack(list(scores.values()))
+    noms_profils = np.array(list(scores.keys()), dtype=object)
+    rang_dominant = np.argmax(matrice_scores, axis=1)
+    profil_dominant = noms_profils[rang_dominant]
+    score_profil_dominant = matrice_scores[np.arange(n), rang_dominant]
+
+    ecart = np.abs(indice_subjectif - indice_performance)
+    coherence = np.select([ecart < 10, ecart < 25], ["Très bonne", "Moyenne"], "Faible").astype(object)
+
+    # --- Radar analytique (5 axes) ---
+    radar = {
+        "Vitesse visuelle": _arrondir((notes["Vitesse_Horizontale"] + notes["Vitesse_Verticale"]) / 2 * 33.33),
+        "Résolution spatiale": _arrondir((notes["Vision_Faible_Contraste"] + note_stereo) / np.where(stereopsie_activee, 2, 1) * 33.33),
+        "Attention périphérique": _arrondir(notes["Vision_Peri"] * 33.33),
+        "Engagement décisionnel": _arrondir((go_nogo_score + notes["Decision_Visuelle"]) / 2 * 33.33),
+        "Surcharge visuelle perçue": _arrondir((notes["Fatigue_Visuelle"] + notes["Sensibilite_Lumineuse"]) / 2 * 33.33),
+    }
+
+    resultat = pd.DataFrame({
+        "Profil": profil_dominant,
+        "Score_Profil_Dominant": score_profil_dominant,
+        "Indice_Subjectif": indice_subjectif,
+        "indice_Performance": indice_performance,
+        "Score_Global": score_global,
+        "Coherence": coherence,
+        "Alerte_Discordance": ecart >= 25,
+    }, index=index)
+    for profil, valeurs in scores.items():
+        resultat[f"Score_{profil}"] = valeurs
+    for axe in AXES_RADAR:
+        resultat[f"Radar_{axe}"] = radar[axe]
+
+    # --- Clés de commentaires (note utilisée dans commentaires_indicateurs) ---
+    for var in INDICATEURS_SUBJECTIFS + INDICATEURS_PERFORMANCE:
+        resultat[f"Commentaire_{var}"] = pd.array(notes[var], dtype="Int8")
+    resultat["Commentaire_Stereopsie"] = pd.array(notes["Stereopsie"], dtype="Int8")
+    resultat.loc[~stereopsie_activee, "Commentaire_Stereopsie"] = pd.NA
+    resultat["Commentaire_GO_NOGO"] = pd.array(go_nogo_score, dtype="Int8")
+    # GO / NOGO absents : d.get() renvoie None dans scorer_profil(), et non 0
+    for var in ["GO", "NOGO"]:
+        note = notes[var] if var in df.columns else np.zeros(n, dtype=np.int64)
+        resultat[f"Commentaire_{var}"] = pd.array(note, dtype="Int8")
+    return resultat
+
+def resultat_depuis_batch(ligne):
+    # Reconstruit le dictionnaire de scorer_profil() à partir d'une ligne de scorer_profil_batch()
+    commentaires = {}
+    for var in INDICATEURS_SUBJECTIFS + INDICATEURS_PERFORMANCE + ["Stereopsie", "GO_NOGO", "GO", "NOGO"]:
+        cle = ligne[f"Commentaire_{var}"]
+        if pd.isna(cle):
+            continue
+        commentaires[var] = commentaires_indicateurs.get(var, {}).get(int(cle), "Interprétation non disponible.")
+
+    return {
+        "profil": ligne["Profil"],
+        "scores": {profil: float(ligne[f"Score_{profil}"]) for profil in POIDS_PROFILS},
+        "score_profil_dominant": float(ligne["Score_Profil_Dominant"]),
+        "indice_subjectif": float(ligne["Indice_Subjectif"]),
+        "indice_performance": float(ligne["indice_Performance"]),
+        "score_global": float(ligne["Score_Global"]),
+        "coherence": ligne["Coherence"],
+        "radar_analytique": {axe: float(ligne[f"Radar_{axe}"]) for axe in AXES_RADAR},
+        "alerte_discordance": bool(ligne["Alerte_Discordance"]),
+        "commentaires": commentaires,
+    }
+
+# --- CALIBRATION (bac à sable des poids, pages/calibrage.py) ---
+# Les notes par indicateur ne dépendent que des bornes : elles sont calculées une fois
+# pour toute la cohorte (matrice participants × indicateurs). Les scores de profil de
+# tous les participants pour un jeu de poids sont alors un produit matriciel ;
+# seules les colonnes dont les bornes changent sont renotées.
+
+INDICATEURS_PROFILS = list(dict.fromkeys(var for variables in POIDS_PROFILS.values() for var in variables))
+INDICATEURS_NOTES = INDICATEURS_SUBJECTIFS + INDICATEURS_PERFORMANCE + ["Stereopsie"]
+SEUILS_COHERENCE = (10, 25)
+
+@dataclass(frozen=True)
+class MatriceCohorte:
+    notes: dict            # indicateur -> notes (règles du CSV), "GO_NOGO" compris
+    valeurs: dict          # indicateur numérique -> (valeurs, est_valide), pour renoter avec d'autres bornes
+    stereopsie_activee: np.ndarray
+
+    @property
+    def effectif(self):
+        return len(self.stereopsie_activee)
+
+@trace("calibration.matrice")
+def matrice_cohorte(df):
+    regles = regles_notation()
+    notes = {var: noter_colonne(df, var) for var in INDICATEURS_NOTES}
+    notes["GO_NOGO"] = _noter_go_nogo_colonnes(df)
+    valeurs = {
+        var: _colonne_numerique(df, var) for var in INDICATEURS_NOTES
+        if isinstance(regles.get(var), RegleNumerique)
+    }
+    return MatriceCohorte(notes, valeurs, _stereopsie_activee(df))
+
+def _renoter(matrice, var, bornes):
+    # bornes : résultat de configuration.lire_seuils (« <x » déjà converti)
+    regle = regles_notation()[var]
+    bornes = tuple(sorted(float(borne) for borne in bornes))
+    if len(bornes) != len(regle.bornes):
+        raise ValueError(f"{var} : {len(regle.bornes)} seuils attendus (reçu {len(bornes)})")
+    essai = regle_numerique(var, bornes, regle.notes, regle.seuils)
+    return essai.noter_tableau(*matrice.valeurs[var]).astype(np.int64)
+
+@trace("calibration.calibrer")
+def calibrer(matrice, poids=POIDS_PROFILS, bornes=None, seuils_coherence=SEUILS_COHERENCE, note_go_nogo=False):
+    # poids : {profil: {indicateur: poids}} ; bornes : {indicateur numérique: [bornes]}
+    # note_go_nogo=False reproduit scorer_profil : GO_NOGO pèse dans le total mais sa note vaut 0
+    notes = dict(matrice.notes)
+    for var, valeurs_bornes in (bornes or {}).items():
+        notes[var] = _renoter(matrice, var, valeurs_bornes)
+    stereo = matrice.stereopsie_activee
+    note_stereo = np.where(stereo, notes["Stereopsie"], 0)
+
+    # --- Indices et cohérence (dépendent des bornes, pas des poids) ---
+    indice_subjectif = _arrondir(sum(notes[var] for var in INDICATEURS_SUBJECTIFS) / (3 * len(INDICATEURS_SUBJECTIFS)) * 100)
+    score_perf_total = sum(notes[var] for var in INDICATEURS_PERFORMANCE) + note_stereo + 2 * notes["GO_NOGO"]
+    indice_performance = _arrondir(score_perf_total / ((len(INDICATEURS_PERFORMANCE) + stereo.astype(np.int64) + 2) * 3) * 100)
+    ecart = np.abs(indice_subjectif - indice_performance)
+    coherence = np.select([ecart < seuils_coherence[0], ecart < seuils_coherence[1]], ["Très bonne", "Moyenne"], "Faible")
+
+    # --- Scores de profil : (notes × poids) / (présence × poids) ---
+    profils = list(poids)
+    matrice_poids = np.array([[poids[profil].get(var, 0) for profil in profils] for var in INDICATEURS_PROFILS], dtype=float)
+    colonnes_notes = {**notes, "Stereopsie": note_stereo}
+    if not note_go_nogo:
+        colonnes_notes["GO_NOGO"] = np.zeros(matrice.effectif, dtype=np.int64)
+    matrice_notes = np.column_stack([colonnes_notes[var] for var in INDICATEURS_PROFILS]).astype(float)
+    presence = np.ones_like(matrice_notes)
+    presence[:, INDICATEURS_PROFILS.index("Stereopsie")] = stereo
+    total_poids = presence @ matrice_poids
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(total_poids > 0, _arrondir((matrice_notes @ matrice_poids) / (3 * total_poids) * 100), 0.0)
+    rang_dominant = np.argmax(scores, axis=1)
+
+    resultat = pd.DataFrame({
+        "Profil": np.array(profils, dtype=object)[rang_dominant],
+        "Score_Profil_Dominant": scores[np.arange(matrice.effectif), rang_dominant],
+        "Indice_Subjectif": indice_subjectif,
+        "indice_Performance": indice_performance,
+        "Coherence": coherence.astype(object),
+    })
+    for rang, profil in enumerate(profils):
+        resultat[f"Score_{profil}"] = scores[:, rang]
+    return resultat
@@ -0,0 +1,194 @@
+import json
+import math
+
+import numpy as np
+
+# --- Esquisses de quantiles (t-digest) ---
+# Résumé compact et fusionnable d'une distribution : quelques centaines de
+# centroïdes (moyenne, poids), plus fins aux extrémités qu'au centre.
+# Permet de situer une valeur dans la cohorte (percentile) en temps constant,
+# sans relire les données. Mise à jour incrémentale : ajouter() puis, au besoin,
+# fusionner() deux esquisses (par exemple deux processus).
+
+COMPRESSION = 200
+TAILLE_TAMPON = 2000
+
+INDICATEURS_COHORTE = [
+    "Vitesse_Horizontale",
+    "Vitesse_Verticale",
+    "GO",
+    "NOGO",
+    "Stereopsie",
+    "Vision_Faible_Contraste",
+    "Score_Global",
+]
+COLONNE_TRANCHE = "Age"
+EFFECTIF_MIN_COHORTE = 10
+
+# Sens de lecture d'un percentile : plus haut = mieux, plus bas = mieux (temps, erreurs,
+# secondes d'arc), ou zone optimale au milieu (vitesses) où la valeur est seulement située.
+MIEUX_HAUT, MIEUX_BAS, ZONE_OPTIMALE = "haut", "bas", "zone"
+SENS_INDICATEURS = {
+    "Vitesse_Horizontale": ZONE_OPTIMALE,
+    "Vitesse_Verticale": ZONE_OPTIMALE,
+    "GO": MIEUX_BAS,
+    "NOGO": MIEUX_BAS,
+    "Stereopsie": MIEUX_BAS,
+    "Vision_Faible_Contraste": MIEUX_BAS,
+    "Score_Global": MIEUX_HAUT,
+}
+
+class EsquisseQuantiles:
+    __slots__ = ("compression", "moyennes", "poids", "minimum", "maximum", "_tampon", "_taille_tampon")
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.moyennes = np.empty(0)
+        self.poids = np.empty(0)
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self._tampon = []
+        self._taille_tampon = 0
+
+    @property
+    def effectif(self):
+        return float(self.poids.sum()) + sum(float(p.sum()) for _, p in self._tampon)
+
+    def _ajouter_centroides(self, moyennes, poids):
+        if not len(moyennes):
+            return
+        self.minimum = min(self.minimum, float(moyennes.min()))
+        self.maximum = max(self.maximum, float(moyennes.max()))
+        self._tampon.append((moyennes, poids))
+        self._taille_tampon += len(moyennes)
+        if self._taille_tampon >= TAILLE_TAMPON:
+            self._compresser()
+
+    def ajouter(self, valeurs):
+        valeurs = np.asarray(valeurs, dtype=float).ravel()
+        valeurs = valeurs[np.isfinite(valeurs)]
+        self._ajouter_centroides(valeurs, np.ones(len(valeurs)))
+        return self
+
+    def fusionner(self, autre):
+        autre._compresser()
+        self._ajouter_centroides(autre.moyennes, autre.poids)
+        self.minimum = min(self.minimum, autre.minimum)
+        self.maximum = max(self.maximum, autre.maximum)
+        return self
+
+    def _compresser(self):
+        if not self._tampon:
+            return
+        moyennes = np.concatenate([self.moyennes] + [m for m, _ in self._tampon])
+        poids = np.concatenate([self.poids] + [p for _, p in self._tampon])
+        self._tampon, self._taille_tampon = [], 0
+        # Valeurs identiques cumulées ; peu de valeurs distinctes -> conservées telles quelles
+        moyennes, inverse = np.unique(moyennes, return_inverse=True)
+        poids = np.bincount(inverse, weights=poids)
+        if len(moyennes) <= self.compression:
+            self.moyennes, self.poids = moyennes, poids
+            return
+
+        # Regroupement par pas de la fonction d'échelle k1 (arcsin) : centroïdes
+        # larges au centre de la distribution, unitaires aux extrémités
+        total = poids.sum()
+        q = (np.cumsum(poids) - poids / 2) / total
+        groupes = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+        debuts = np.concatenate([[0], np.flatnonzero(np.diff(groupes)) + 1])
+        self.poids = np.add.reduceat(poids, debuts)
+        self.moyennes = np.add.reduceat(moyennes * poids, debuts) / self.poids
+
+    def _points(self):
+        # (valeurs, poids cumulés) : centre de chaque centroïde (rang moyen des ex æquo),
+        # bornés par le minimum (0) et le maximum (total) observés
+        self._compresser()
+        total = float(self.poids.sum())
+        x, y = self.moyennes, np.cumsum(self.poids) - self.poids / 2
+        if total and x[0] > self.minimum:
+            x, y = np.concatenate([[self.minimum], x]), np.concatenate([[0.0], y])
+        if total and x[-1] < self.maximum:
+            x, y = np.concatenate([x, [self.maximum]]), np.concatenate([y, [total]])
+        return x, y, total
+
+    def rang(self, valeur):
+        # Fraction de la cohorte en dessous de valeur, dans [0 ; 1]
+        x, y, total = self._points()
+        if not total:
+            return None
+        if valeur < self.minimum:
+            return 0.0
+        if valeur > self.maximum:
+            return 1.0
+        return float(np.interp(valeur, x, y)) / total
+
+    def quantile(self, q):
+        x, y, total = self._points()
+        if not total:
+            return None
+        return float(np.interp(q * total, y, x))
+
+    # --- Persistance (JSON) ---
+    def en_json(self):
+        self._compresser()
+        return json.dumps({
+            "compression": self.compression,
+            "moyennes": self.moyennes.tolist(),
+            "poids": self.poids.tolist(),
+            "min": self.minimum if self.poids.size else None,
+            "max": self.maximum if self.poids.size else None,
+        })
+
+    @classmethod
+    def depuis_json(cls, texte):
+        donnees = json.loads(texte)
+        esquisse = cls(donnees.get("compression", COMPRESSION))
+        esquisse.moyennes = np.asarray(donnees["moyennes"], dtype=float)
+        esquisse.poids = np.asarray(donnees["poids"], dtype=float)
+        if esquisse.poids.size:
+            esquisse.minimum, esquisse.maximum = donnees["min"], donnees["max"]
+        return esquisse
+
+def lire_position(indicateur, percentile):
+    # « Meilleur que X % » dans le sens de l'indicateur ; zone optimale : position neutre
+    sens = SENS_INDICATEURS.get(indicateur, ZONE_OPTIMALE)
+    if sens == MIEUX_HAUT:
+        return f"Meilleur que {percentile} %"
+    if sens == MIEUX_BAS:
+        return f"Meilleur que {100 - percentile} %"
+    return f"Valeur plus élevée que {percentile} %"
+
+# --- Clés des esquisses : indicateur, et indicateur par tranche d'âge ---
+def cle_esquisse(indicateur, tranche=None):
+    return indicateur if tranche is None else f"{indicateur}|{COLONNE_TRANCHE}={tranche}"
+
+def _actif(valeur):
+    if isinstance(valeur, str):
+        return valeur.strip().lower() in ("true", "vrai", "1", "oui")
+    return not (isinstance(valeur, float) and math.isnan(valeur)) and bool(valeur)
+
+def valeur_indicateur(ligne, indicateur):
+    # Valeur retenue pour la cohorte (stéréopsie désactivée et cases vides ignorées)
+    activee = ligne.get("Stereopsie_activee")
+    if indicateur == "Stereopsie" and activee is not None and not _actif(activee):
+        return None
+    try:
+        valeur = float(ligne.get(indicateur))
+    except (TypeError, ValueError):
+        return None
+    return valeur if math.isfinite(valeur) else None
+
+def valeurs_par_cle(lignes):
+    # {cle: [valeurs]} pour une liste de lignes (dict)
+    valeurs = {}
+    for ligne in lignes:
+        tranche = ligne.get(COLONNE_TRANCHE)
+        tranche = tranche.strip() if isinstance(tranche, str) and tranche.strip() else None
+        for indicateur in INDICATEURS_COHORTE:
+            valeur = valeur_indicateur(ligne, indicateur)
+            if valeur is None:
+                continue
+            valeurs.setdefault(cle_esquisse(indicateur), []).append(valeur)
+            if tranche:
+                valeurs.setdefault(cle_esquisse(indicateur, tranche), []).append(valeur)
+    return valeurs
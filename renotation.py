@@ -0,0 +1,140 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from base_donnees import BaseDonnees, FICHIER_BASE, COLONNE_ID, COLONNES_NOTATION
+from passeports import DepotPasseports, DOSSIER_PASSEPORTS
+from stockage import BackendDrive, creer_journal
+from profilage import scorer_profil_batch, version_modele
+
+# --- Renotation de l'historique ---
+# Quand les poids ou les bornes changent, les colonnes Profil / Score_* / Radar_*
+# des anciens enregistrements ne correspondent plus au modèle courant.
+# Seuls les enregistrements dont Version_Modele diffère de version_modele() sont
+# relus et renotés, par lots, dans un pool de processus (scorer_profil_batch).
+# Chaque lot terminé est rangé dans la table « renotation » : une exécution
+# interrompue reprend là où elle s'était arrêtée. La table principale n'est
+# modifiée qu'à la fin, par une seule écriture, puis les enregistrements concernés
+# sont propagés : passeports locaux réécrits, artefacts publiés sur le Drive et
+# colonnes de notation mises à jour dans le classeur Drive. Si le Drive échoue,
+# l'exécution suivante reprend la propagation avant toute nouvelle renotation.
+# Usage (depuis la racine du dépôt) :
+#   python -m renotation --processus 4
+#   python -m renotation --sans-drive   (base et passeports locaux seulement)
+#   python -m renotation --simulation   (compte seulement les enregistrements à renoter)
+
+IDS_PAR_LOT = 1000
+COLONNES_PROPAGEES = [COLONNE_ID, "Version_Modele"] + COLONNES_NOTATION
+
+_bases = {}  # une connexion par fichier dans chaque processus de calcul
+
+def _base(fichier):
+    if fichier not in _bases:
+        _bases[fichier] = BaseDonnees(fichier)
+    return _bases[fichier]
+
+def _initialiser_processus():
+    # Pas de thread d'export des traces dans les processus de calcul
+    import traces
+
+    traces.activer(False)
+
+def noter_lot(fichier, ids):
+    # Exécuté dans un processus de calcul : lecture du lot, notation vectorisée
+    lignes = _base(fichier).lire_ids(ids)
+    resultat = scorer_profil_batch(lignes)
+    resultat.insert(0, COLONNE_ID, lignes[COLONNE_ID])
+    return resultat[[COLONNE_ID] + COLONNES_NOTATION]
+
+def _lots(ids, taille):
+    return [ids[debut:debut + taille] for debut in range(0, len(ids), taille)]
+
+def _calculer(base, version, ids, processus, taille_lot, progression):
+    lots = _lots(ids, taille_lot)
+    processus = processus or os.cpu_count() or 1
+    if processus == 1 or len(lots) <= 1:
+        resultats = (noter_lot(base.fichier, lot) for lot in lots)
+        executeur = None
+    else:
+        contexte_spawn = multiprocessing.get_context("spawn")
+        executeur = ProcessPoolExecutor(
+            max_workers=min(processus, len(lots)), mp_context=contexte_spawn, initializer=_initialiser_processus
+        )
+        resultats = executeur.map(noter_lot, [base.fichier] * len(lots), lots)
+    try:
+        ranges = 0
+        for resultat in resultats:
+            ranges += base.ranger_renotation(version, resultat)
+            progression(ranges, len(ids))
+        return ranges
+    finally:
+        if executeur is not None:
+            executeur.shutdown(cancel_futures=True)
+
+def _propager(base, ids, depot=None, journal=None):
+    # Passeports réécrits puis publiés (depot.backends), lignes du classeur mises à jour
+    # en une seule réécriture (journal). Lève une exception si le Drive échoue.
+    reecrits = 0
+    notations = []
+    for lot in _lots(ids, IDS_PAR_LOT):
+        lignes = base.lire_ids(lot)
+        if depot is not None:
+            fiches = lignes.to_dict("records")
+            reecrits += sum(depot.ecrire(ligne) is not None for ligne in fiches)
+            depot.publier(fiches)
+        if journal is not None:
+            notations += lignes[COLONNES_PROPAGEES].astype(object).where(lignes[COLONNES_PROPAGEES].notna(), None).to_dict("records")
+    if journal is not None and notations:
+        journal.mettre_a_jour(notations)
+    return reecrits
+
+def renoter(base, processus=None, taille_lot=IDS_PAR_LOT, depot=None, journal=None, progression=lambda fait, total: None):
+    version = version_modele()
+    # Renotation précédente appliquée mais non propagée : on termine d'abord
+    passeports = _propager(base, base.ids_appliques(), depot, journal) if base.ids_appliques() else 0
+    base.terminer_renotation()
+
+    ids = base.ids_a_renoter(version)
+    repris = base.nombre_renotes(version)
+    calcules = _calculer(base, version, ids, processus, taille_lot, progression) if ids else 0
+    modifies = base.appliquer_renotation(version)
+    passeports += _propager(base, base.ids_appliques(), depot, journal)
+    base.terminer_renotation()
+    return {"version": version, "calcules": calcules, "repris": repris, "modifies": modifies, "passeports": passeports}
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Renote les enregistrements notés par une ancienne version du modèle")
+    parser.add_argument("--processus", type=int, default=None, help="processus de calcul (défaut : un par cœur)")
+    parser.add_argument("--taille-lot", type=int, default=IDS_PAR_LOT)
+    parser.add_argument("--base", default=FICHIER_BASE)
+    parser.add_argument("--passeports", default=DOSSIER_PASSEPORTS)
+    parser.add_argument("--sans-passeports", action="store_true", help="ne réécrit pas les passeports")
+    parser.add_argument("--sans-drive", action="store_true", help="ne publie ni passeports ni lignes sur le Drive")
+    parser.add_argument("--simulation", action="store_true", help="affiche le nombre d'enregistrements à renoter")
+    args = parser.parse_args(arguments)
+
+    base = BaseDonnees(args.base)
+    version = version_modele()
+    if args.simulation:
+        print(f"🔎 Modèle {version} : {len(base.ids_a_renoter(version))} enregistrement(s) à renoter, "
+              f"{base.nombre_renotes(version)} déjà calculé(s)")
+        return 0
+
+    debut = time.perf_counter()
+    distants = [] if args.sans_drive else [BackendDrive()]
+    depot = None if args.sans_passeports else DepotPasseports(args.passeports, distants, base.percentile)
+    journal = None if args.sans_drive else creer_journal(distants[0])
+    rapport = renoter(
+        base, args.processus, args.taille_lot, depot, journal,
+        progression=lambda fait, total: print(f"   {fait} / {total}", flush=True)
+    )
+    print(f"✅ Modèle {rapport['version']} : {rapport['modifies']} enregistrement(s) mis à jour "
+          f"({rapport['calcules']} calculés, {rapport['repris']} repris d'une exécution interrompue), "
+          f"{rapport['passeports']} passeport(s) réécrit(s) en {time.perf_counter() - debut:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
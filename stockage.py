@@ -0,0 +1,476 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from profilage import migrer_radar
+from traces import trace
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- PARAMETRES ---
+# "segments" : chaque enregistrement est ajouté dans un petit segment JSONL immuable,
+#              fusionné dans le classeur Excel uniquement lors de la compaction.
+# "classeur" : ancien fonctionnement (téléchargement, concaténation, réécriture complète).
+MODE_STOCKAGE = "segments"
+PREFIXE_SEGMENT = "optimeyes_segment_"
+PREFIXE_ARTEFACT = "optimeyes_passeport_"
+SEUIL_COMPACTION = 50
+COLONNE_ID = "Id_Enregistrement"
+TENTATIVES_CONFLIT = 8
+DELAI_CONFLIT_S = 0.05
+SANS_CONTROLE = object()  # ecrire_classeur() sans vérification de version
+
+# --- ECRITURES CONCURRENTES ---
+# Toute réécriture du classeur est une lecture-modification-écriture conditionnelle :
+# elle est refusée (ConflitVersion) si le classeur a changé depuis sa lecture,
+# puis recommencée sur une copie fraîche. Les écrivains d'un même backend sont en
+# plus sérialisés (verrou de fichier en local, verrou du processus pour Drive).
+
+class ConflitVersion(Exception):
+    pass
+
+COMPTEURS_ECRITURE = {"ecritures": 0, "conflits": 0}
+_verrou_compteurs = threading.Lock()
+
+def _compter(cle):
+    with _verrou_compteurs:
+        COMPTEURS_ECRITURE[cle] += 1
+
+def compteurs_ecriture():
+    with _verrou_compteurs:
+        return dict(COMPTEURS_ECRITURE)
+
+@contextmanager
+def verrou_fichier(chemin):
+    # Verrou exclusif entre processus (et entre threads : un descripteur par acquisition)
+    with open(chemin, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+_verrous_processus = {}
+_verrou_registre = threading.Lock()
+
+def verrou_processus(cle):
+    with _verrou_registre:
+        return _verrous_processus.setdefault(cle, threading.Lock())
+
+def modifier_classeur(backend, modifier, tentatives=TENTATIVES_CONFLIT):
+    # modifier(df_classeur) -> (df à écrire ou None, suite) ; suite() n'est appelée
+    # qu'une fois l'écriture acceptée (ex. suppression des segments fusionnés).
+    for tentative in range(tentatives):
+        with backend.verrou():
+            df_classeur, version = backend.lire_classeur_versionne()
+            df, suite = modifier(df_classeur)
+            try:
+                if df is not None:
+                    backend.ecrire_classeur(df, version)
+                    _compter("ecritures")
+            except ConflitVersion:
+                _compter("conflits")
+            else:
+                return suite() if suite is not None else None
+        time.sleep(DELAI_CONFLIT_S * 2 ** tentative * random.uniform(0.5, 1.5))
+    raise ConflitVersion(f"Classeur modifié en continu : abandon après {tentatives} tentatives")
+
+def nom_segment():
+    horodatage = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return f"{PREFIXE_SEGMENT}{horodatage}_{uuid.uuid4().hex[:8]}.jsonl"
+
+def encoder_segment(lignes):
+    return "".join(
+        json.dumps(ligne, ensure_ascii=False, default=str) + "\n" for ligne in lignes
+    ).encode("utf-8")
+
+def decoder_segment(contenu):
+    return [json.loads(l) for l in contenu.decode("utf-8").splitlines() if l.strip()]
+
+# --- BACKENDS ---
+# Un backend sait écrire / lister / lire / supprimer des segments,
+# lire / réécrire le classeur consolidé, et stocker de petits artefacts par nom
+# (passeports pré-calculés, voir passeports.DepotPasseports).
+
+class BackendLocal:
+    def __init__(self, fichier_classeur, dossier_segments):
+        self.fichier_classeur = fichier_classeur
+        self.dossier_segments = dossier_segments
+
+    def ecrire_segment(self, nom, contenu):
+        os.makedirs(self.dossier_segments, exist_ok=True)
+        chemin = os.path.join(self.dossier_segments, nom)
+        with open(chemin + ".tmp", "wb") as f:
+            f.write(contenu)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(chemin + ".tmp", chemin)
+
+    def lister_segments(self):
+        if not os.path.isdir(self.dossier_segments):
+            return []
+        return sorted(
+            nom for nom in os.listdir(self.dossier_segments)
+            if nom.startswith(PREFIXE_SEGMENT) and nom.endswith(".jsonl")
+        )
+
+    def lire_segment(self, nom):
+        # FileNotFoundError si le segment a été retiré entre-temps
+        with open(os.path.join(self.dossier_segments, nom), "rb") as f:
+            return f.read()
+
+    def supprimer_segment(self, nom):
+        try:
+            os.remove(os.path.join(self.dossier_segments, nom))
+        except FileNotFoundError:
+            pass
+
+    def ecrire_artefact(self, nom, contenu):
+        self.ecrire_segment(nom, contenu)
+
+    def lire_artefact(self, nom):
+        return self.lire_segment(nom)
+
+    def supprimer_artefact(self, nom):
+        self.supprimer_segment(nom)
+
+    @trace("classeur.lire_local")
+    def lire_classeur(self):
+        try:
+            return pd.read_excel(self.fichier_classeur)
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    def lire_classeur_versionne(self):
+        version = self.version_classeur()
+        return self.lire_classeur(), version
+
+    @trace("classeur.ecrire_local")
+    def ecrire_classeur(self, df, version_attendue=SANS_CONTROLE):
+        if version_attendue is not SANS_CONTROLE and self.version_classeur() != version_attendue:
+            raise ConflitVersion(self.fichier_classeur)
+        # Écriture dans un fichier temporaire puis renommage atomique
+        temporaire = f"{self.fichier_classeur}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temporaire, "wb") as f:
+                df.to_excel(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporaire, self.fichier_classeur)
+        finally:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+
+    def version_classeur(self):
+        # Le renommage atomique change l'inode à chaque écriture
+        try:
+            infos = os.stat(self.fichier_classeur)
+        except FileNotFoundError:
+            return None
+        return (infos.st_ino, infos.st_mtime_ns, infos.st_size)
+
+    def verrou(self):
+        dossier = os.path.dirname(os.path.abspath(self.fichier_classeur))
+        os.makedirs(dossier, exist_ok=True)
+        return verrou_fichier(self.fichier_classeur + ".lock")
+
+class BackendDrive:
+    def __init__(self, fichier_id=None):
+        import drive
+        self.drive = drive
+        self.fichier_id = fichier_id or drive.FICHIER_ID_DRIVE
+        self._dossier_id = None
+        self._ids_segments = {}
+        self._ids_artefacts = {}
+
+    @property
+    def dossier_id(self):
+        if self._dossier_id is None:
+            self._dossier_id = self.drive.dossier_parent(self.fichier_id)
+        return self._dossier_id
+
+    @trace("drive.ecrire_segment")
+    def ecrire_segment(self, nom, contenu):
+        self._ids_segments[nom] = self.drive.creer_fichier(nom, contenu, self.dossier_id)
+
+    def lister_segments(self):
+        fichiers = self.drive.lister_fichiers(self.dossier_id, PREFIXE_SEGMENT)
+        self._ids_segments = {f["name"]: f["id"] for f in fichiers}
+        return sorted(self._ids_segments)
+
+    def lire_segment(self, nom):
+        if nom not in self._ids_segments:
+            self.lister_segments()
+        return self.drive.telecharger_octets(self._ids_segments[nom])
+
+    def supprimer_segment(self, nom):
+        fichier_id = self._ids_segments.pop(nom, None)
+        if fichier_id:
+            self.drive.supprimer_fichier(fichier_id)
+
+    def ecrire_artefact(self, nom, contenu):
+        fichier_id = self._ids_artefacts.get(nom) or self._chercher_artefact(nom)
+        if fichier_id:
+            self.drive.remplacer_fichier(fichier_id, contenu)
+        else:
+            self._ids_artefacts[nom] = self.drive.creer_fichier(nom, contenu, self.dossier_id)
+
+    def _chercher_artefact(self, nom):
+        # Recherche par nom exact dans le dossier : coût indépendant du nombre de lignes
+        for fichier in self.drive.lister_fichiers(self.dossier_id, nom):
+            if fichier["name"] == nom:
+                self._ids_artefacts[nom] = fichier["id"]
+                return fichier["id"]
+        return None
+
+    def lire_artefact(self, nom):
+        fichier_id = self._ids_artefacts.get(nom) or self._chercher_artefact(nom)
+        if fichier_id is None:
+            raise FileNotFoundError(nom)
+        try:
+            return self.drive.telecharger_octets(fichier_id)
+        except FileNotFoundError:
+            self._ids_artefacts.pop(nom, None)
+            raise
+
+    def supprimer_artefact(self, nom):
+        fichier_id = self._ids_artefacts.pop(nom, None) or self._chercher_artefact(nom)
+        self._ids_artefacts.pop(nom, None)
+        if fichier_id:
+            self.drive.supprimer_fichier(fichier_id)
+
+    @trace("classeur.lire_drive")
+    def lire_classeur(self):
+        # Une erreur réseau doit remonter : la compaction ne doit jamais réécrire
+        # le classeur à partir d'une copie vide.
+        contenu = self.drive.telecharger_octets(self.fichier_id)
+        if not contenu:
+            return pd.DataFrame()
+        return pd.read_excel(BytesIO(contenu))
+
+    def lire_classeur_versionne(self):
+        # Version lue avant le contenu : un changement intercalé fera échouer l'écriture
+        version = self.version_classeur()
+        return self.lire_classeur(), version
+
+    @trace("classeur.ecrire_drive")
+    def ecrire_classeur(self, df, version_attendue=SANS_CONTROLE):
+        # Drive v3 n'offre pas de mise à jour conditionnelle : la révision est revérifiée
+        # juste avant l'envoi. La fenêtre restante est couverte par la suppression
+        # différée des segments (voir JournalSegments.compacter).
+        if version_attendue is not SANS_CONTROLE and self.version_classeur() != version_attendue:
+            raise ConflitVersion(self.fichier_id)
+        self.drive.ecraser_fichier_excel(df, self.fichier_id)
+
+    def version_classeur(self):
+        return self.drive.version_fichier(self.fichier_id)
+
+    def verrou(self):
+        return verrou_processus(("drive", self.fichier_id))
+
+# --- JOURNAUX ---
+
+class JournalSegments:
+    def __init__(self, backend, seuil_compaction=SEUIL_COMPACTION):
+        self.backend = backend
+        self.seuil_compaction = seuil_compaction
+        self._ajouts_depuis_compaction = 0
+
+    @trace("journal.ajouter")
+    def ajouter(self, lignes):
+        lignes = [dict(ligne) for ligne in lignes]
+        for ligne in lignes:
+            ligne.setdefault(COLONNE_ID, uuid.uuid4().hex)
+        nom = nom_segment()
+        self.backend.ecrire_segment(nom, encoder_segment(lignes))
+        self._ajouts_depuis_compaction += 1
+        if self._ajouts_depuis_compaction >= self.seuil_compaction:
+            self.compacter()
+        return nom
+
+    def _segments(self, noms):
+        # Un segment retiré entre la liste et la lecture a été fusionné par un autre écrivain
+        segments = {}
+        for nom in noms:
+            try:
+                segments[nom] = decoder_segment(self.backend.lire_segment(nom))
+            except FileNotFoundError:
+                pass
+        return segments
+
+    def _lire_segments(self, noms):
+        return pd.DataFrame([ligne for lignes in self._segments(noms).values() for ligne in lignes])
+
+    def lire_tout(self):
+        # Relu si le classeur a changé pendant la lecture des segments
+        for _ in range(TENTATIVES_CONFLIT):
+            df_classeur, version = self.backend.lire_classeur_versionne()
+            df_segments = self._lire_segments(self.backend.lister_segments())
+            if self.backend.version_classeur() == version:
+                break
+        return _fusionner(df_classeur, df_segments)
+
+    def compaction_necessaire(self):
+        return len(self.backend.lister_segments()) >= self.seuil_compaction
+
+    @trace("journal.compacter")
+    def compacter(self, force=False):
+        noms = self.backend.lister_segments()
+        if not noms or (not force and len(noms) < self.seuil_compaction):
+            return 0
+
+        def fusionner(df_classeur):
+            segments = self._segments(self.backend.lister_segments())
+            # Un segment n'est retiré que lorsque ses lignes sont présentes dans le classeur
+            # relu (fusion confirmée) ; les autres sont fusionnés et retirés au passage suivant.
+            ids_classeur = set(df_classeur[COLONNE_ID].dropna()) if COLONNE_ID in df_classeur.columns else set()
+            confirmes = [
+                nom for nom, lignes in segments.items()
+                if all(ligne.get(COLONNE_ID) in ids_classeur for ligne in lignes)
+            ]
+            nouveaux = [ligne for nom, lignes in segments.items() if nom not in confirmes for ligne in lignes]
+            df = _fusionner(df_classeur, pd.DataFrame(nouveaux)) if nouveaux else None
+
+            def retirer():
+                for nom in confirmes:
+                    self.backend.supprimer_segment(nom)
+                return len(segments)
+            return df, retirer
+
+        fusionnes = modifier_classeur(self.backend, fusionner)
+        self._ajouts_depuis_compaction = 0
+        return fusionnes
+
+    @trace("journal.supprimer")
+    def supprimer(self, ids):
+        # Suppression par Id_Enregistrement sur une copie fraîche : les lignes ajoutées
+        # depuis l'affichage sont conservées.
+        ids = set(ids)
+
+        def retirer_lignes(df_classeur):
+            segments = self._segments(self.backend.lister_segments())
+            df = _fusionner(df_classeur, pd.DataFrame([ligne for lignes in segments.values() for ligne in lignes]))
+            if COLONNE_ID in df.columns:
+                df = df[~df[COLONNE_ID].isin(ids)].reset_index(drop=True)
+
+            def retirer_segments():
+                for nom in segments:
+                    self.backend.supprimer_segment(nom)
+            return df, retirer_segments
+
+        modifier_classeur(self.backend, retirer_lignes)
+
+    @trace("journal.mettre_a_jour")
+    def mettre_a_jour(self, lignes):
+        # Champs remplacés par Id_Enregistrement sur une copie fraîche (segments fusionnés au passage)
+        lignes = list(lignes)
+
+        def remplacer(df_classeur):
+            segments = self._segments(self.backend.lister_segments())
+            df = _fusionner(df_classeur, pd.DataFrame([ligne for lignes_segment in segments.values() for ligne in lignes_segment]))
+
+            def retirer_segments():
+                for nom in segments:
+                    self.backend.supprimer_segment(nom)
+            return _remplacer_champs(df, lignes), retirer_segments
+
+        modifier_classeur(self.backend, remplacer)
+
+class ClasseurDirect:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def ajouter(self, lignes):
+        lignes = list(lignes)
+        modifier_classeur(
+            self.backend,
+            lambda df: (pd.concat([df, pd.DataFrame(lignes)], ignore_index=True), None)
+        )
+
+    def lire_tout(self):
+        return _completer_ids(self.backend.lire_classeur())
+
+    def compaction_necessaire(self):
+        return False
+
+    def compacter(self, force=False):
+        return 0
+
+    def supprimer(self, ids):
+        ids = set(ids)
+
+        def retirer_lignes(df_classeur):
+            df = _completer_ids(df_classeur)
+            if COLONNE_ID in df.columns:
+                df = df[~df[COLONNE_ID].isin(ids)].reset_index(drop=True)
+            return df, None
+
+        modifier_classeur(self.backend, retirer_lignes)
+
+    def mettre_a_jour(self, lignes):
+        lignes = list(lignes)
+        modifier_classeur(self.backend, lambda df: (_remplacer_champs(_completer_ids(df), lignes), None))
+
+def _remplacer_champs(df, lignes):
+    # Lignes de même Id_Enregistrement : champs fournis remplacés, autres champs conservés
+    nouvelles = pd.DataFrame(lignes)
+    if df.empty or nouvelles.empty or COLONNE_ID not in df.columns:
+        return df
+    nouvelles = nouvelles.drop_duplicates(COLONNE_ID, keep="last").set_index(COLONNE_ID)
+    colonnes = list(df.columns) + [c for c in nouvelles.columns if c not in df.columns]
+    df = df.set_index(COLONNE_ID)
+    df = nouvelles.reindex(df.index).combine_first(df).reset_index()
+    return df[colonnes]
+
+def _completer_ids(df):
+    # Lignes antérieures aux identifiants : identifiant stable dérivé du contenu
+    # (rang ajouté pour les doublons exacts), enregistré à la prochaine réécriture.
+    if df.empty:
+        return df
+    if COLONNE_ID not in df.columns:
+        df = df.assign(**{COLONNE_ID: np.nan})
+    manquants = df[COLONNE_ID].isna()
+    if not manquants.any():
+        return df
+    empreintes = pd.util.hash_pandas_object(df.loc[manquants].drop(columns=[COLONNE_ID]), index=False)
+    rangs = empreintes.groupby(empreintes).cumcount()
+    df = df.copy()
+    df[COLONNE_ID] = df[COLONNE_ID].astype(object)
+    df.loc[manquants, COLONNE_ID] = [f"ancien_{e:016x}_{r}" for e, r in zip(empreintes, rangs)]
+    return df
+
+def _fusionner(df_classeur, df_segments):
+    # Ancien radar (dict dans une cellule) migré vers les colonnes typées à la réécriture
+    df_classeur = migrer_radar(_completer_ids(df_classeur))
+    if df_segments.empty:
+        return df_classeur
+    df = pd.concat([df_classeur, migrer_radar(df_segments)], ignore_index=True)
+    if COLONNE_ID in df.columns:
+        sans_id = df[COLONNE_ID].isna()
+        df = df[sans_id | ~df[COLONNE_ID].duplicated(keep="first")].reset_index(drop=True)
+    return df
+
+def creer_journal(backend, mode=MODE_STOCKAGE):
+    if mode == "segments":
+        return JournalSegments(backend)
+    return ClasseurDirect(backend)
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Traces des étapes (rerun, sauvegarde, Drive, rendu) ---
+# Chaque étape instrumentée produit une mesure (nom, durée, succès, étape parente),
+# conservée dans un tampon circulaire du processus et cumulée dans des histogrammes
+# de latence. Un thread de fond exporte les mesures dans un JSONL tournant et écrit
+# les histogrammes au format texte Prometheus (fichier, et port HTTP en option).
+# Désactivé (OPTIMEYES_TRACES=0), une étape ne coûte qu'un test de booléen.
+
+VARIABLE_TRACES = "OPTIMEYES_TRACES"
+VARIABLE_PORT = "OPTIMEYES_PORT_METRIQUES"
+DOSSIER_METRIQUES = "metriques"
+FICHIER_JSONL = "traces.jsonl"
+FICHIER_PROMETHEUS = "optimeyes.prom"
+TAILLE_TAMPON = 5000
+TAILLE_JSONL_MAX = 5 * 1024 * 1024
+FICHIERS_JSONL_CONSERVES = 3
+INTERVALLE_EXPORT = 5.0
+SEUILS_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_actif = os.environ.get(VARIABLE_TRACES, "1").strip() not in ("", "0")
+_verrou = threading.Lock()
+_tampon = deque(maxlen=TAILLE_TAMPON)
+_a_exporter = deque(maxlen=TAILLE_TAMPON)  # en attente d'export disque
+_histogrammes = {}  # nom -> [compteurs par seuil (+inf en dernier), somme, erreurs]
+_pile = threading.local()
+_exportateur = None
+_serveur = None
+
+def actif():
+    return _actif
+
+def activer(etat=True):
+    global _actif
+    _actif = bool(etat)
+
+class _Etape:
+    __slots__ = ("nom", "attributs", "debut", "parent")
+
+    def __init__(self, nom, attributs):
+        self.nom = nom
+        self.attributs = attributs
+
+    def __enter__(self):
+        pile = getattr(_pile, "noms", None)
+        if pile is None:
+            pile = _pile.noms = []
+        self.parent = pile[-1] if pile else None
+        pile.append(self.nom)
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, type_exc, exc, tb):
+        duree = time.perf_counter() - self.debut
+        _pile.noms.pop()
+        _enregistrer(self.nom, duree, _succes(type_exc), self.parent, self.attributs)
+        return False
+
+def _succes(type_exc):
+    # st.rerun() / st.stop() interrompent le script par exception : pas une erreur
+    return type_exc is None or any(classe.__name__ == "ScriptControlException" for classe in type_exc.__mro__)
+
+_ETAPE_NULLE = nullcontext()
+
+def etape(nom, **attributs):
+    # with etape("base.ajouter", lignes=3): ...
+    return _Etape(nom, attributs) if _actif else _ETAPE_NULLE
+
+def trace(nom):
+    # Décorateur : la fonction entière est une étape
+    def decorer(fonction):
+        @wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if not _actif:
+                return fonction(*args, **kwargs)
+            with _Etape(nom, {}):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorer
+
+def _enregistrer(nom, duree, ok, parent, attributs):
+    mesure = {
+        "horodatage": round(time.time(), 3),
+        "etape": nom,
+        "duree_s": round(duree, 6),
+        "ok": ok,
+        "parent": parent,
+        "thread": threading.current_thread().name,
+    }
+    if attributs:
+        mesure["attributs"] = attributs
+    with _verrou:
+        _tampon.append(mesure)
+        _a_exporter.append(mesure)
+        histogramme = _histogrammes.get(nom)
+        if histogramme is None:
+            histogramme = _histogrammes[nom] = [[0] * (len(SEUILS_LATENCE) + 1), 0.0, 0]
+        compteurs = histogramme[0]
+        for i, seuil in enumerate(SEUILS_LATENCE):
+            if duree <= seuil:
+                compteurs[i] += 1
+                break
+        else:
+            compteurs[-1] += 1
+        histogramme[1] += duree
+        histogramme[2] += 0 if ok else 1
+    _demarrer_exportateur()
+
+# --- Lecture (page d'administration) ---
+def mesures(etape_nom=None):
+    with _verrou:
+        return [m for m in _tampon if etape_nom is None or m["etape"] == etape_nom]
+
+def histogrammes():
+    # {nom: {"seuils": [...], "compteurs": [...] (non cumulés, +inf en dernier), "somme_s", "nombre", "erreurs"}}
+    with _verrou:
+        return {
+            nom: {
+                "seuils": list(SEUILS_LATENCE),
+                "compteurs": list(compteurs),
+                "somme_s": somme,
+                "nombre": sum(compteurs),
+                "erreurs": erreurs,
+            }
+            for nom, (compteurs, somme, erreurs) in _histogrammes.items()
+        }
+
+def vider():
+    with _verrou:
+        _tampon.clear()
+        _a_exporter.clear()
+        _histogrammes.clear()
+
+# --- Export Prometheus (format texte) ---
+def _echapper(texte):
+    return texte.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def texte_prometheus():
+    lignes = [
+        "# HELP optimeyes_etape_duree_secondes Durée des étapes instrumentées",
+        "# TYPE optimeyes_etape_duree_secondes histogram",
+    ]
+    erreurs = [
+        "# HELP optimeyes_etape_erreurs_total Étapes terminées par une exception",
+        "# TYPE optimeyes_etape_erreurs_total counter",
+    ]
+    for nom, histogramme in sorted(histogrammes().items()):
+        etiquette = f'etape="{_echapper(nom)}"'
+        cumul = 0
+        for seuil, compteur in zip(histogramme["seuils"] + ["+Inf"], histogramme["compteurs"]):
+            cumul += compteur
+            lignes.append(f'optimeyes_etape_duree_secondes_bucket{{{etiquette},le="{seuil}"}} {cumul}')
+        lignes.append(f"optimeyes_etape_duree_secondes_sum{{{etiquette}}} {histogramme['somme_s']:.6f}")
+        lignes.append(f"optimeyes_etape_duree_secondes_count{{{etiquette}}} {histogramme['nombre']}")
+        erreurs.append(f"optimeyes_etape_erreurs_total{{{etiquette}}} {histogramme['erreurs']}")
+    return "\n".join(lignes + erreurs) + "\n"
+
+# --- Export disque (JSONL tournant + fichier Prometheus), en tâche de fond ---
+def _tourner(chemin):
+    if not os.path.exists(chemin) or os.path.getsize(chemin) < TAILLE_JSONL_MAX:
+        return
+    for i in range(FICHIERS_JSONL_CONSERVES - 1, 0, -1):
+        if os.path.exists(f"{chemin}.{i}"):
+            os.replace(f"{chemin}.{i}", f"{chemin}.{i + 1}")
+    os.replace(chemin, f"{chemin}.1")
+    if os.path.exists(f"{chemin}.{FICHIERS_JSONL_CONSERVES}"):
+        os.remove(f"{chemin}.{FICHIERS_JSONL_CONSERVES}")
+
+def exporter(dossier=DOSSIER_METRIQUES):
+    with _verrou:
+        lot = list(_a_exporter)
+        _a_exporter.clear()
+    os.makedirs(dossier, exist_ok=True)
+    if lot:
+        chemin = os.path.join(dossier, FICHIER_JSONL)
+        _tourner(chemin)
+        with open(chemin, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(m, ensure_ascii=False, default=str) + "\n" for m in lot))
+    # Fichier Prometheus remplacé d'un bloc (collecteur « textfile » de node_exporter)
+    chemin_prom = os.path.join(dossier, FICHIER_PROMETHEUS)
+    with open(chemin_prom + ".tmp", "w", encoding="utf-8") as f:
+        f.write(texte_prometheus())
+    os.replace(chemin_prom + ".tmp", chemin_prom)
+    return len(lot)
+
+def _boucle_export():
+    while True:
+        time.sleep(INTERVALLE_EXPORT)
+        try:
+            exporter()
+        except Exception as e:
+            print(f"❌ Export des traces échoué : {e}")
+
+def _demarrer_exportateur():
+    global _exportateur
+    if _exportateur is not None:
+        return
+    with _verrou:
+        if _exportateur is None:
+            _exportateur = threading.Thread(target=_boucle_export, name="export-traces", daemon=True)
+            _exportateur.start()
+    port = os.environ.get(VARIABLE_PORT, "").strip()
+    if port:
+        servir_prometheus(int(port))
+
+# --- Point d'accès HTTP /metrics (OPTIMEYES_PORT_METRIQUES) ---
+class _GestionnaireMetriques(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        contenu = texte_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(contenu)))
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def log_message(self, *args):
+        pass
+
+def servir_prometheus(port, hote="127.0.0.1"):
+    # Un serveur par processus ; port déjà pris (autre processus Streamlit) -> ignoré
+    global _serveur
+    with _verrou:
+        if _serveur is not None:
+            return _serveur
+        try:
+            _serveur = ThreadingHTTPServer((hote, port), _GestionnaireMetriques)
+        except OSError as e:
+            print(f"⚠️ Port métriques {port} indisponible : {e}")
+            _serveur = False
+            return None
+    threading.Thread(target=_serveur.serve_forever, name="metriques-http", daemon=True).start()
+    return _serveur